@@ -0,0 +1,54 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Measures how fast utils.execCmd collects large outputs of a child.
+#
+#   python benchmarks/asyncproc_throughput.py --sizes 1 10 50
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from glustercli import utils
+
+
+def run(sizeMB, repeat):
+    cmd = ["/bin/sh", "-c", "head -c %d /dev/zero" % (sizeMB * 1024 * 1024)]
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        rc, out, err = utils.execCmd(cmd)
+        elapsed = time.time() - start
+        assert len(out) == sizeMB * 1024 * 1024
+        best = elapsed if best is None else min(best, elapsed)
+    return sizeMB / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50],
+                        help='output sizes in MB')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print("%4d MB: %8.1f MB/s" % (size, run(size, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Measures the CPU time the calling process burns while waiting for a child
+# started through utils.execCmd.
+#
+#   python benchmarks/asyncproc_wait.py --calls 10 --duration 0.5
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from glustercli import utils
+
+
+# the first child keeps its pipes open until it exits, the second one closes
+# them early like a daemonizing command would do
+_CASES = {'pipes-open': "sleep %s; echo done",
+          'pipes-closed': "exec >/dev/null 2>&1 </dev/null; sleep %s"}
+
+
+def _cpuTime():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(case, calls, duration):
+    cmd = ["/bin/sh", "-c", _CASES[case] % duration]
+    wallStart = time.time()
+    cpuStart = _cpuTime()
+    for i in range(calls):
+        utils.execCmd(cmd)
+    cpu = _cpuTime() - cpuStart
+    wall = time.time() - wallStart
+    return {'case': case,
+            'calls': calls,
+            'wallPerCall': wall / calls,
+            'cpuPerCall': cpu / calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=0.5,
+                        help='seconds each child runs')
+    args = parser.parse_args()
+
+    pidfd = utils.pidfdOpen(os.getpid())
+    if pidfd is not None:
+        os.close(pidfd)
+    print("pidfd: %s" % ('no' if pidfd is None else 'yes'))
+    for case in sorted(_CASES):
+        r = run(case, args.calls, args.duration)
+        print("%(case)-14s calls=%(calls)d wall/call=%(wallPerCall).3fs "
+              "cpu/call=%(cpuPerCall).6fs" % r)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Time to apply a batch of volume set calls issued by several processes at
+# once, against benchmarks/fakegluster.py holding a glusterd-like
+# transaction lock: every process retrying GlusterBusy on its own, then all
+# of them going through the broker.
+#
+#   python benchmarks/broker_batch.py --changes 500 --processes 4
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+
+from glustercli import broker
+from glustercli import cli
+from glustercli import utils
+
+
+def _worker(mode, socketPath, first, count, threads):
+    if mode == 'broker':
+        cli.enableBroker(socketPath)
+    cli.enableBusyRetry(deadline=600, initialDelay=0.05, maxDelay=1)
+
+    def run(keys):
+        for i in keys:
+            cli.volumeSet('vol0', 'option%d' % i, 'on')
+
+    keys = list(range(first, first + count))
+    workers = [threading.Thread(target=run, args=(keys[i::threads],))
+               for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    print(cli.busyRetryStats()['retries'])
+
+
+def _run(mode, args, socketPath):
+    per = args.changes // args.processes
+    start = time.time()
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                               '--worker', mode, '--socket', socketPath,
+                               '--first', str(i * per), '--count', str(per),
+                               '--threads', str(args.threads),
+                               '--gluster', args.gluster],
+                              stdout=subprocess.PIPE)
+             for i in range(args.processes)]
+    retries = sum(int(p.communicate()[0]) for p in procs)
+    return time.time() - start, retries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--changes', type=int, default=500)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--txn-time', default='0.02')
+    parser.add_argument('--gluster', default=os.path.join(_here,
+                                                          'fakegluster.py'))
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--socket', help=argparse.SUPPRESS)
+    parser.add_argument('--first', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--count', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    cli._glusterCommandPath = utils.CommandPath("gluster", args.gluster)
+    if args.worker:
+        _worker(args.worker, args.socket, args.first, args.count,
+                args.threads)
+        return
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['FAKE_GLUSTER_TXN_LOCK'] = os.path.join(tmpdir, 'txn.lock')
+    os.environ['FAKE_GLUSTER_TXN_TIME'] = args.txn_time
+    socketPath = os.path.join(tmpdir, 'broker.sock')
+
+    elapsed, retries = _run('retry', args, socketPath)
+    print("busy retry: %6.2fs, %d retries" % (elapsed, retries))
+
+    b = broker.Broker(socketPath, args.gluster)
+    b.start()
+    try:
+        elapsed, retries = _run('broker', args, socketPath)
+    finally:
+        b.stop()
+    print("broker:     %6.2fs, %d retries, %d transactions" %
+          (elapsed, retries, b.stats['transactions']))
+
+
+if __name__ == '__main__':
+    main()
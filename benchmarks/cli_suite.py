@@ -0,0 +1,198 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Measures latency, CPU time and peak memory of the cli.py query functions
+# against benchmarks/fakegluster.py, for every combination of the given
+# scales (VOLUMESxBRICKSxCLIENTS).  Every case runs in its own process so
+# that its peak RSS is not hidden by the cases before it.  Results are
+# written as JSON; --compare prints the change of the median latency
+# against an earlier result file.
+#
+#   python benchmarks/cli_suite.py --scale 1x2x1 --scale 20x32x16 \
+#       --calls 20 --output results.json
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+
+from glustercli import cli
+from glustercli import utils
+
+VOLUME = 'vol0'
+
+CASES = [
+    ('volumeInfo', lambda: cli.volumeInfo()),
+    ('volumeStatus', lambda: cli.volumeStatus(VOLUME)),
+    ('volumeStatus.detail', lambda: cli.volumeStatus(VOLUME,
+                                                     option='detail')),
+    ('volumeStatus.clients', lambda: cli.volumeStatus(VOLUME,
+                                                      option='clients')),
+    ('volumeStatus.mem', lambda: cli.volumeStatus(VOLUME, option='mem')),
+    ('volumeProfileInfo', lambda: cli.volumeProfileInfo(VOLUME)),
+    ('volumeProfileInfo.nfs', lambda: cli.volumeProfileInfo(VOLUME,
+                                                            nfs=True)),
+    ('volumeGeoRepStatus', lambda: cli.volumeGeoRepStatus()),
+    ('volumeGeoRepStatus.detail', lambda: cli.volumeGeoRepStatus(
+        detail=True)),
+    ('volumeTasks', lambda: cli.volumeTasks()),
+    ('peerStatus', lambda: cli.peerStatus()),
+    ('clusterSnapshot', lambda: cli.clusterSnapshot()),
+]
+
+
+def _parseScale(value):
+    try:
+        volumes, bricks, clients = [int(n) for n in value.split('x')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected VOLUMESxBRICKSxCLIENTS")
+    return volumes, bricks, clients
+
+
+def _cpu(usage):
+    return usage.ru_utime + usage.ru_stime
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def runCase(name, calls):
+    func = dict(CASES)[name]
+    baseRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func()
+
+    latency = []
+    cpu = 0.0
+    childCpu = 0.0
+    for i in range(calls):
+        selfBefore = resource.getrusage(resource.RUSAGE_SELF)
+        childBefore = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.time()
+        func()
+        latency.append(time.time() - start)
+        cpu += _cpu(resource.getrusage(resource.RUSAGE_SELF)) - \
+            _cpu(selfBefore)
+        childCpu += _cpu(resource.getrusage(resource.RUSAGE_CHILDREN)) - \
+            _cpu(childBefore)
+
+    peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'calls': calls,
+            'latencyMs': {'min': min(latency) * 1000,
+                          'median': _percentile(latency, 0.5) * 1000,
+                          'p90': _percentile(latency, 0.9) * 1000,
+                          'max': max(latency) * 1000,
+                          'mean': sum(latency) / calls * 1000},
+            'cpuMsPerCall': cpu / calls * 1000,
+            'childCpuMsPerCall': childCpu / calls * 1000,
+            'peakRssKb': peakRss,
+            'rssGrowthKb': peakRss - baseRss}
+
+
+def _spawnCase(name, scale, calls, gluster):
+    volumes, bricks, clients = scale
+    env = dict(os.environ)
+    env['FAKE_GLUSTER_VOLUMES'] = str(volumes)
+    env['FAKE_GLUSTER_BRICKS'] = str(bricks)
+    env['FAKE_GLUSTER_CLIENTS'] = str(clients)
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                   '--run-case', name,
+                                   '--calls', str(calls),
+                                   '--gluster', gluster], env=env)
+    result = json.loads(out.decode('utf-8'))
+    result.update({'case': name,
+                   'volumes': volumes,
+                   'bricks': bricks,
+                   'clients': clients})
+    return result
+
+
+def _key(result):
+    return '%s@%dx%dx%d' % (result['case'], result['volumes'],
+                            result['bricks'], result['clients'])
+
+
+def _report(results, baseline=None):
+    previous = {}
+    if baseline:
+        previous = dict((_key(r), r) for r in baseline['results'])
+    print("%-38s %10s %10s %10s %10s %10s" %
+          ('case', 'median ms', 'p90 ms', 'cpu ms', 'child ms', 'peak KiB'))
+    for r in results:
+        line = "%-38s %10.2f %10.2f %10.2f %10.2f %10d" % (
+            _key(r), r['latencyMs']['median'], r['latencyMs']['p90'],
+            r['cpuMsPerCall'], r['childCpuMsPerCall'], r['peakRssKb'])
+        old = previous.get(_key(r))
+        if old:
+            line += " %+6.1f%%" % ((r['latencyMs']['median'] /
+                                    old['latencyMs']['median'] - 1) * 100)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=_parseScale, action='append',
+                        help="VOLUMESxBRICKSxCLIENTS, may be repeated "
+                             "(default: 1x2x1 and 10x16x8)")
+    parser.add_argument('--calls', type=int, default=10)
+    parser.add_argument('--case', action='append',
+                        choices=[name for name, func in CASES],
+                        help="run only this case, may be repeated")
+    parser.add_argument('--gluster', default=os.path.join(_here,
+                                                          'fakegluster.py'))
+    parser.add_argument('--output', help="write the results to this file")
+    parser.add_argument('--compare', help="an earlier --output file")
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    cli._glusterCommandPath = utils.CommandPath("gluster", args.gluster)
+
+    if args.run_case:
+        print(json.dumps(runCase(args.run_case, args.calls)))
+        return
+
+    scales = args.scale or [(1, 2, 1), (10, 16, 8)]
+    names = args.case or [name for name, func in CASES]
+    results = []
+    for scale in scales:
+        for name in names:
+            results.append(_spawnCase(name, scale, args.calls,
+                                      args.gluster))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _report(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'timestamp': time.time(),
+                       'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'gluster': args.gluster,
+                       'results': results}, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
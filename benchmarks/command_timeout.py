@@ -0,0 +1,129 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# What is left behind by cli.volumeStatusMany() over --volumes volumes
+# when every gluster command hangs (FAKE_GLUSTER_HANG, see
+# benchmarks/fakegluster.py) and the calls are stopped by the
+# execConcurrently() timeout, by
+# cli.enableCommandTimeout() or by a utils.CancelToken cancelled from a
+# timer thread: time to return, gluster children and worker threads still
+# alive when it returns and --settle seconds later, and the stopped command
+# counts.  --ignore-term makes the children ignore SIGTERM so they are
+# killed after --kill-delay seconds.
+#
+#   python benchmarks/command_timeout.py --volumes 16 --timeout 0.5
+
+from __future__ import print_function
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+
+from glustercli import cli
+from glustercli import utils
+
+
+def _children():
+    count = 0
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open('/proc/%s/stat' % pid) as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (IOError, IndexError, ValueError):
+            continue
+        if ppid == os.getpid():
+            count += 1
+    return count
+
+
+def _executorTimeout(names, args):
+    return cli.volumeStatusMany(names, maxWorkers=args.workers,
+                                timeout=args.timeout)
+
+
+def _commandTimeout(names, args):
+    cli.enableCommandTimeout(args.timeout)
+    try:
+        return cli.volumeStatusMany(names, maxWorkers=args.workers)
+    finally:
+        cli.disableCommandTimeout()
+
+
+def _cancelToken(names, args):
+    token = utils.CancelToken()
+    timer = threading.Timer(args.timeout, token.cancel)
+    timer.start()
+    with utils.cancelOn(token):
+        return cli.volumeStatusMany(names, maxWorkers=args.workers)
+
+
+MODES = [('execConcurrently', _executorTimeout),
+         ('commandTimeout', _commandTimeout),
+         ('CancelToken', _cancelToken)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--volumes', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--timeout', type=float, default=0.5)
+    parser.add_argument('--hang', type=float, default=30)
+    parser.add_argument('--settle', type=float, default=1)
+    parser.add_argument('--ignore-term', action='store_true')
+    parser.add_argument('--kill-delay', type=float, default=0.5)
+    args = parser.parse_args()
+
+    # execCmd warns about every stopped command
+    logging.basicConfig(level=logging.ERROR)
+    cli._glusterCommandPath = utils.CommandPath(
+        "gluster", os.path.join(_here, 'fakegluster.py'))
+    os.environ['FAKE_GLUSTER_HANG'] = str(args.hang)
+    if args.ignore_term:
+        os.environ['FAKE_GLUSTER_IGNORE_TERM'] = '1'
+    utils.KILL_DELAY = args.kill_delay
+    names = ['vol%d' % i for i in range(args.volumes)]
+    baseThreads = threading.active_count()
+
+    print("%-18s %8s %10s %10s %10s %10s" % (
+        'stopped by', 'ms', 'children', 'threads', 'children', 'threads'))
+    print("%-18s %8s %21s %21s" % ('', '', 'on return',
+                                   'after %gs' % args.settle))
+    for name, run in MODES:
+        start = time.time()
+        results = run(names, args)
+        elapsed = time.time() - start
+        onReturn = (_children(), threading.active_count() - baseThreads)
+        time.sleep(args.settle)
+        settled = (_children(), threading.active_count() - baseThreads)
+        if not all(isinstance(r, Exception) for r in results.values()):
+            raise AssertionError("a hung command returned")
+        print("%-18s %8.1f %10d %10d %10d %10d" % (
+            (name, elapsed * 1000) + onReturn + settled))
+
+    print()
+    for command, counts in sorted(cli.stoppedCommandStats().items()):
+        print("%s: %s" % (command, counts))
+
+
+if __name__ == '__main__':
+    main()
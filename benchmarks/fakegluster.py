@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A stand-in for /usr/sbin/gluster which replays the XML replies recorded in
+# benchmarks/fixtures, scaled to the number of volumes, bricks (one per
+# host) and clients set through FAKE_GLUSTER_VOLUMES, FAKE_GLUSTER_BRICKS and
+# FAKE_GLUSTER_CLIENTS.  FAKE_GLUSTER_FIXTURES points to another fixture
+# directory.  Without a command on the command line it behaves like the
+# interactive gluster shell.
+#
+# When FAKE_GLUSTER_TXN_LOCK names a file, commands other than queries take
+# it like glusterd takes its cluster lock: if it is held the command fails
+# with "Another transaction is in progress", otherwise the command holds it
+# for FAKE_GLUSTER_TXN_TIME seconds.  volume status takes it too, glusterd
+# locks the volumes for it.
+#
+# Commands with --remote-host=HOST take FAKE_GLUSTER_REMOTE_DELAY seconds
+# more, the round trip to HOST, and fail like the gluster CLI does when
+# it cannot connect to glusterd if HOST is in the comma separated
+# FAKE_GLUSTER_DOWN_HOSTS.
+#
+# FAKE_GLUSTER_HANG makes commands sleep that many seconds first, like a
+# glusterd stuck on a hung brick; with FAKE_GLUSTER_IGNORE_TERM they also
+# ignore SIGTERM.
+#
+# In a fixture an element with a repeat="volumes|bricks|clients|peers"
+# attribute is emitted once per volume, brick, client or peer, and text and
+# attributes are expanded with str.format() using the current indexes
+# (v, b, c, p), the counts and a few derived values, see _context().  Commands
+# without a fixture get an empty successful reply.
+
+import fcntl
+import os
+import signal
+import sys
+import time
+import xml.etree.ElementTree as etree
+
+PROMPT = "gluster> "
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'fixtures')
+
+_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_EMPTY = ('<cliOutput><opRet>0</opRet><opErrno>0</opErrno><opErrstr/>'
+          '</cliOutput>')
+
+_BUSY = ('<cliOutput><opRet>-1</opRet><opErrno>30800</opErrno><opErrstr>'
+         'Another transaction is in progress. Please try again after '
+         'sometime.</opErrstr></cliOutput>')
+_QUERIES = ('info', 'profile', 'help')
+
+_INDEXES = {'volumes': 'v', 'bricks': 'b', 'clients': 'c', 'peers': 'p'}
+
+
+def _route(words):
+    """
+    Returns the fixture name for a command and the volumes it asks for, or
+    None for all the volumes.
+    """
+    if words[:2] == ['volume', 'info']:
+        return 'volume_info', words[2:3] or None
+    if words[:2] == ['volume', 'status']:
+        volumeName = words[2] if len(words) > 2 else 'all'
+        options = [w for w in words[3:] if ':' not in w]
+        return ('_'.join(['volume', 'status'] + options),
+                None if volumeName == 'all' else [volumeName])
+    if words[:2] == ['volume', 'profile'] and len(words) > 3:
+        return '_'.join(['volume', 'profile'] + words[3:]), words[2:3]
+    if words[:2] == ['volume', 'geo-replication'] and 'status' in words:
+        volumeName = words[2]
+        return ('volume_geo-replication_status',
+                None if volumeName == 'status' else [volumeName])
+    return '_'.join(words), None
+
+
+def _context(ctx):
+    b = ctx.get('b', 0)
+    c = ctx.get('c', 0)
+    ctx['pid'] = 10000 + b
+    ctx['c256'] = c // 250
+    ctx['c1'] = c % 250 + 1
+    ctx['cport'] = 1000 + b % 24
+    ctx['bytesRead'] = (b + 1) * (c + 1) * 4096
+    ctx['bytesWrite'] = (b + 1) * (c + 1) * 8192
+    return ctx
+
+
+def _format(text, ctx):
+    if text and '{' in text:
+        return text.format(**ctx)
+    return text
+
+
+def _render(el, ctx, counts, volumeNames):
+    new = etree.Element(el.tag, dict((k, _format(v, ctx))
+                                     for k, v in el.attrib.items()
+                                     if k != 'repeat'))
+    new.text = _format(el.text, ctx)
+    new.tail = el.tail
+    for child in el:
+        repeat = child.get('repeat')
+        if repeat is None:
+            new.append(_render(child, ctx, counts, volumeNames))
+            continue
+        for i in range(counts[repeat]):
+            childCtx = dict(ctx)
+            childCtx[_INDEXES[repeat]] = i
+            if repeat == 'volumes':
+                childCtx['volume'] = volumeNames[i]
+            elif repeat == 'peers':
+                childCtx['p'] = i + 1
+            new.append(_render(child, _context(childCtx), counts,
+                               volumeNames))
+    return new
+
+
+def _tostring(el):
+    if sys.version_info[0] >= 3:
+        return etree.tostring(el, encoding='unicode')
+    return etree.tostring(el)
+
+
+def render(name, volumeNames, volumes, bricks, clients,
+           fixturesDir=FIXTURES_DIR):
+    path = os.path.join(fixturesDir, name + '.xml')
+    if not os.path.exists(path):
+        return _DECLARATION + _EMPTY + '\n'
+    if volumeNames is None:
+        volumeNames = ['vol%d' % v for v in range(volumes)]
+    counts = {'volumes': len(volumeNames),
+              'bricks': bricks,
+              'clients': clients,
+              'peers': max(bricks - 1, 0)}
+    ctx = dict(counts)
+    ctx['volume'] = volumeNames[0] if volumeNames else ''
+    root = etree.parse(path).getroot()
+    return (_DECLARATION +
+            _tostring(_render(root, _context(ctx), counts, volumeNames)) +
+            '\n')
+
+
+def reply(words, volumes, bricks, clients=1, fixturesDir=FIXTURES_DIR):
+    name, volumeNames = _route(words)
+    return render(name, volumeNames, volumes, bricks, clients, fixturesDir)
+
+
+def _isQuery(words):
+    if words[:2] == ['volume', 'status']:
+        return False
+    return words[:1] in (['peer'], ['system::']) or \
+        words[-1:] == ['status'] or \
+        any(w in _QUERIES for w in words[1:2]) or words[-1:] == ['info']
+
+
+def _transaction(words):
+    """
+    Returns the held lock file of a mutating command, None for queries or
+    when no lock is configured, False when the lock is busy
+    """
+    path = os.environ.get('FAKE_GLUSTER_TXN_LOCK')
+    if not path or _isQuery(words):
+        return None
+    f = open(path, 'a')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError:
+        f.close()
+        return False
+    time.sleep(float(os.environ.get('FAKE_GLUSTER_TXN_TIME', 0.05)))
+    return f
+
+
+def _remoteHost():
+    """
+    Exits like the CLI when glusterd of the --remote-host is down
+    """
+    hosts = [a.split('=', 1)[1] for a in sys.argv[1:]
+             if a.startswith('--remote-host=')]
+    if not hosts:
+        return
+    time.sleep(float(os.environ.get('FAKE_GLUSTER_REMOTE_DELAY', 0)))
+    if hosts[-1] in os.environ.get('FAKE_GLUSTER_DOWN_HOSTS', '').split(','):
+        sys.stderr.write("Connection failed. Please check if gluster "
+                         "daemon is operational.\n")
+        sys.exit(1)
+
+
+def _hang():
+    if os.environ.get('FAKE_GLUSTER_IGNORE_TERM'):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    time.sleep(float(os.environ.get('FAKE_GLUSTER_HANG', 0)))
+
+
+def main():
+    _hang()
+    _remoteHost()
+    volumes = int(os.environ.get('FAKE_GLUSTER_VOLUMES', 1))
+    bricks = int(os.environ.get('FAKE_GLUSTER_BRICKS', 2))
+    clients = int(os.environ.get('FAKE_GLUSTER_CLIENTS', 1))
+    fixturesDir = os.environ.get('FAKE_GLUSTER_FIXTURES', FIXTURES_DIR)
+    words = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if words:
+        if _transaction(words) is False:
+            sys.stdout.write(_DECLARATION + _BUSY + '\n')
+            sys.exit(1)
+        sys.stdout.write(reply(words, volumes, bricks, clients, fixturesDir))
+        return
+
+    replies = {}
+    while True:
+        sys.stdout.write(PROMPT)
+        sys.stdout.flush()
+        line = sys.stdin.readline()
+        if not line:
+            break
+        words = tuple(line.split())
+        if not words:
+            continue
+        if words not in replies:
+            replies[words] = reply(list(words), volumes, bricks, clients,
+                                   fixturesDir)
+        sys.stdout.write(replies[words])
+
+
+if __name__ == '__main__':
+    main()
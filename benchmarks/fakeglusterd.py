@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A stand-in for glusterd answering the get-volume and list-friends calls
+# of the gluster CLI program (see glustercli/glusterd.py) with the data of
+# the volume_info and peer_status fixtures of benchmarks/fakegluster.py, at
+# the same scale, so that both backends of cli.volumeInfo() and
+# cli.peerStatus() return the same results.
+#
+#   python benchmarks/fakeglusterd.py --socket /tmp/glusterd.socket
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+import xdrlib
+import xml.etree.ElementTree as etree
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+
+import fakegluster
+from glustercli import glusterd
+
+# the elements of the XML volume info which are plain dict values
+_VOLUME_KEYS = {'name': 'name', 'id': 'volume_id', 'status': 'status',
+                'type': 'type', 'brickCount': 'brick_count',
+                'distCount': 'dist_count', 'stripeCount': 'stripe_count',
+                'replicaCount': 'replica_count', 'transport': 'transport'}
+
+
+def volumeDict(volumes, bricks, volumeName=None):
+    root = etree.fromstring(fakegluster.render(
+        'volume_info', None if volumeName is None else [volumeName],
+        volumes, bricks, 1))
+    values = {}
+    count = 0
+    for i, el in enumerate(root.findall('volInfo/volumes/volume')):
+        prefix = 'volume%d.' % i
+        for tag, key in _VOLUME_KEYS.items():
+            values[prefix + key] = el.find(tag).text
+        for b, brick in enumerate(el.findall('bricks/brick'), 1):
+            values[prefix + 'brick%d' % b] = brick.text
+            values[prefix + 'brick%d.uuid' % b] = brick.find('hostUuid').text
+        options = el.findall('options/option')
+        values[prefix + 'opt_count'] = len(options)
+        for option in options:
+            values[prefix + 'option.' + option.find('name').text] = \
+                option.find('value').text
+        count += 1
+    values['count'] = count
+    return values
+
+
+def friendsDict(bricks):
+    root = etree.fromstring(fakegluster.render('peer_status', None, 1,
+                                               bricks, 1))
+    values = {}
+    peers = root.findall('peerStatus/peer')
+    for i, el in enumerate(peers, 1):
+        prefix = 'friend%d.' % i
+        values[prefix + 'uuid'] = el.find('uuid').text
+        values[prefix + 'hostname'] = el.find('hostname').text
+        values[prefix + 'port'] = 24007
+        values[prefix + 'stateId'] = el.find('state').text
+        values[prefix + 'state'] = el.find('stateStr').text
+        values[prefix + 'connected'] = el.find('connected').text
+    values['count'] = len(peers)
+    return values
+
+
+class FakeGlusterd(object):
+    def __init__(self, address, volumes=1, bricks=2):
+        self.address = address
+        self.volumes = volumes
+        self.bricks = bricks
+        self.calls = 0
+        self._replies = {}
+        self._sock = None
+
+    def _getVolume(self, u):
+        request = glusterd.unpackDict(u.unpack_opaque())
+        volumeName = request.get('volname')
+        key = ('volume', volumeName)
+        if key not in self._replies:
+            p = xdrlib.Packer()
+            known = ['vol%d' % v for v in range(self.volumes)]
+            if volumeName is not None and volumeName not in known:
+                p.pack_int(-1)
+                p.pack_int(0)
+                p.pack_string('Volume %s does not exist' % volumeName)
+                p.pack_opaque('')
+            else:
+                p.pack_int(0)
+                p.pack_int(0)
+                p.pack_string('')
+                p.pack_opaque(glusterd.packDict(volumeDict(
+                    self.volumes, self.bricks, volumeName)))
+            self._replies[key] = p.get_buffer()
+        return self._replies[key]
+
+    def _listFriends(self, u):
+        if 'friends' not in self._replies:
+            p = xdrlib.Packer()
+            p.pack_int(0)
+            p.pack_int(0)
+            p.pack_opaque(glusterd.packDict(friendsDict(self.bricks)))
+            self._replies['friends'] = p.get_buffer()
+        return self._replies['friends']
+
+    def _reply(self, call):
+        u = xdrlib.Unpacker(call)
+        xid, msgType, rpcVersion, prog, vers, proc = [u.unpack_uint()
+                                                      for i in range(6)]
+        for i in range(2):
+            # credentials and verifier
+            u.unpack_uint()
+            u.unpack_opaque()
+        p = xdrlib.Packer()
+        for value in (xid, 1, 0, 0):
+            p.pack_uint(value)
+        p.pack_opaque('')
+        handlers = {glusterd.PROC_NULL: lambda u: '',
+                    glusterd.PROC_GET_VOLUME: self._getVolume,
+                    glusterd.PROC_LIST_FRIENDS: self._listFriends}
+        if (prog, vers) != (glusterd.GLUSTER_CLI_PROGRAM,
+                            glusterd.GLUSTER_CLI_VERSION):
+            p.pack_uint(1)
+            return p.get_buffer()
+        if proc not in handlers:
+            p.pack_uint(3)
+            return p.get_buffer()
+        self.calls += 1
+        p.pack_uint(0)
+        return p.get_buffer() + handlers[proc](u)
+
+    def _serve(self, conn):
+        try:
+            while True:
+                glusterd.writeRecord(conn, self._reply(
+                    glusterd.readRecord(conn)))
+        except (EOFError, socket.error):
+            pass
+        finally:
+            conn.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, addr = self._sock.accept()
+            except socket.error:
+                return
+            t = threading.Thread(target=self._serve, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def start(self):
+        if isinstance(self.address, tuple):
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        else:
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.address)
+        self._sock.listen(64)
+        t = threading.Thread(target=self._accept)
+        t.daemon = True
+        t.start()
+
+    def stop(self):
+        self._sock.shutdown(socket.SHUT_RDWR)
+        self._sock.close()
+        if not isinstance(self.address, tuple) and \
+                os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--socket', default='/tmp/fakeglusterd.socket')
+    parser.add_argument('--port', type=int,
+                        help="listen on this TCP port instead")
+    args = parser.parse_args()
+
+    address = args.socket
+    if args.port:
+        address = ('127.0.0.1', args.port)
+    server = FakeGlusterd(address,
+                          int(os.environ.get('FAKE_GLUSTER_VOLUMES', 1)),
+                          int(os.environ.get('FAKE_GLUSTER_BRICKS', 2)))
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Latency of cli.volumeInfo() and cli.peerStatus() through the gluster CLI
+# (benchmarks/fakegluster.py) and through the glusterd backend
+# (benchmarks/fakeglusterd.py, run in its own process), checking that both
+# return the same results.  fakegluster.py is a Python script: a real
+# gluster binary starts faster, but still forks, execs and serializes XML.
+#
+#   python benchmarks/glusterd_backend.py --scale 1x2 --scale 20x32
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+
+from glustercli import cli
+from glustercli import identity
+from glustercli import utils
+
+CASES = [
+    ('volumeInfo', lambda: cli.volumeInfo()),
+    ('volumeInfo(vol0)', lambda: cli.volumeInfo('vol0')),
+    ('peerStatus', lambda: cli.peerStatus()),
+]
+
+
+def _parseScale(value):
+    try:
+        volumes, bricks = [int(n) for n in value.split('x')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected VOLUMESxBRICKS")
+    return volumes, bricks
+
+
+def _median(func, calls):
+    latency = []
+    for i in range(calls):
+        start = time.time()
+        result = func()
+        latency.append(time.time() - start)
+    return sorted(latency)[calls // 2], result
+
+
+def _waitFor(path, timeout=10):
+    end = time.time() + timeout
+    while not os.path.exists(path):
+        if time.time() > end:
+            raise RuntimeError("fakeglusterd did not start")
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=_parseScale, action='append',
+                        help="VOLUMESxBRICKS, may be repeated "
+                             "(default: 1x2 and 20x32)")
+    parser.add_argument('--calls', type=int, default=20)
+    args = parser.parse_args()
+
+    cli._glusterCommandPath = utils.CommandPath(
+        "gluster", os.path.join(_here, 'fakegluster.py'))
+    cli._identity = identity.LocalIdentity(peer='localhost', uuid='uuid')
+    socketPath = os.path.join(tempfile.mkdtemp(), 'glusterd.socket')
+
+    print("%-24s %8s %12s %12s %8s" % ('case', 'scale', 'cli ms',
+                                       'glusterd ms', 'speedup'))
+    for volumes, bricks in args.scale or [(1, 2), (20, 32)]:
+        os.environ['FAKE_GLUSTER_VOLUMES'] = str(volumes)
+        os.environ['FAKE_GLUSTER_BRICKS'] = str(bricks)
+        server = subprocess.Popen([sys.executable,
+                                   os.path.join(_here, 'fakeglusterd.py'),
+                                   '--socket', socketPath])
+        try:
+            _waitFor(socketPath)
+            for name, func in CASES:
+                cli.disableGlusterdBackend()
+                cliTime, expected = _median(func, args.calls)
+                cli.enableGlusterdBackend(socketPath)
+                rpcTime, result = _median(func, args.calls)
+                if result != expected:
+                    raise AssertionError("backends disagree on %s" % name)
+                print("%-24s %8s %12.2f %12.2f %7.1fx" % (
+                    name, '%dx%d' % (volumes, bricks), cliTime * 1000,
+                    rpcTime * 1000, cliTime / rpcTime))
+        finally:
+            cli.disableGlusterdBackend()
+            server.terminate()
+            server.wait()
+            if os.path.exists(socketPath):
+                os.unlink(socketPath)
+
+
+if __name__ == '__main__':
+    main()
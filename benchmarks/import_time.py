@@ -0,0 +1,139 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Time to import a module in a fresh interpreter, the median of --runs
+# runs, with the modules taking the most time of their own like
+# `python -X importtime` reports them.  A copy of glustercli is
+# byte-compiled in a temporary directory first, as it is once installed,
+# leaving no .pyc files in the source tree.  Exits with status 1 when the
+# median is over --budget milliseconds, so it guards the cold start of the
+# short scripts calling glustercli.
+#
+#   python benchmarks/import_time.py --module glustercli.cli --budget 10
+
+from __future__ import print_function
+
+import argparse
+import compileall
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+
+
+def _child(module):
+    try:
+        import __builtin__ as builtins
+    except ImportError:
+        import builtins
+
+    realImport = builtins.__import__
+    stack = []
+    selfTimes = {}
+
+    def timedImport(name, *args, **kwargs):
+        if name in sys.modules:
+            return realImport(name, *args, **kwargs)
+        stack.append(0.0)
+        start = time.time()
+        try:
+            return realImport(name, *args, **kwargs)
+        finally:
+            elapsed = time.time() - start
+            children = stack.pop()
+            selfTimes[name] = selfTimes.get(name, 0.0) + elapsed - children
+            if stack:
+                stack[-1] += elapsed
+
+    before = set(sys.modules)
+    builtins.__import__ = timedImport
+    start = time.time()
+    try:
+        __import__(module)
+    finally:
+        total = time.time() - start
+        builtins.__import__ = realImport
+    loaded = sorted(name for name, mod in sys.modules.items()
+                    if mod is not None and name not in before)
+    print(json.dumps({'total': total, 'self': selfTimes, 'loaded': loaded}))
+
+
+def _compiledCopy(tmpdir):
+    path = os.path.join(tmpdir, 'glustercli')
+    shutil.copytree(os.path.join(_here, '..', 'glustercli'), path,
+                    ignore=shutil.ignore_patterns('*.pyc', '__pycache__'))
+    compileall.compile_dir(path, quiet=1)
+    return tmpdir
+
+
+def _run(module, path):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [path] + [p for p in [env.get('PYTHONPATH')] if p])
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                   '--child', module], env=env)
+    return json.loads(out.decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module', default='glustercli.cli')
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=10,
+                        help="fail when the median is over this many ms, "
+                             "0 to only report (default: %(default)s)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child)
+        return 0
+
+    tmpdir = tempfile.mkdtemp(prefix='glustercli-import-')
+    try:
+        path = _compiledCopy(tmpdir)
+        runs = [_run(args.module, path) for i in range(args.runs)]
+    finally:
+        shutil.rmtree(tmpdir)
+    totals = sorted(r['total'] * 1000 for r in runs)
+    median = totals[len(totals) // 2]
+
+    selfTimes = {}
+    for r in runs:
+        for name, seconds in r['self'].items():
+            selfTimes.setdefault(name, []).append(seconds * 1000)
+    print("%-32s %10s" % ('module', 'self ms'))
+    ranked = sorted(selfTimes.items(),
+                    key=lambda item: -sorted(item[1])[len(item[1]) // 2])
+    for name, times in ranked[:args.top]:
+        print("%-32s %10.2f" % (name, sorted(times)[len(times) // 2]))
+    print()
+    print("import %s: median %.2fms, min %.2fms, %d modules loaded" %
+          (args.module, median, totals[0], len(runs[0]['loaded'])))
+
+    if args.budget and median > args.budget:
+        print("over the %.2fms budget" % args.budget)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
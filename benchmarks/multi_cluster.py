@@ -0,0 +1,110 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Time to poll --pools trusted pools through benchmarks/fakegluster.py
+# with --remote-host, one pool after the other and with a ClusterScheduler,
+# checking that both give the same results.  The first peer of every
+# --down-every'th pool is down, so its calls fail over to the second one;
+# --delay stands for the round trip to the remote glusterd and its own
+# work, which is what polling many pools waits on; the start-up of
+# fakegluster.py itself is CPU time and does not overlap on one CPU.
+#
+#   python benchmarks/multi_cluster.py --pools 30 --workers 8
+
+import argparse
+import os
+import sys
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+
+from glustercli import cli
+from glustercli import cluster
+from glustercli import utils
+
+QUERIES = {
+    'volumeInfo': cli.volumeInfo,
+    'peerStatus': cli.peerStatus,
+    'clusterSnapshot': lambda: cli.clusterSnapshot(
+        sections=['volumeInfo', 'peerStatus']),
+}
+
+
+def _clusters(pools, downEvery):
+    clusters = []
+    down = []
+    for i in range(pools):
+        hosts = ['pool%d-node%d' % (i, n) for n in range(3)]
+        if downEvery and i % downEvery == 0:
+            down.append(hosts[0])
+        clusters.append(cluster.Cluster(hosts, name='pool%d' % i))
+    return clusters, down
+
+
+def _comparable(result):
+    if isinstance(result, dict) and 'age' in result:
+        result = dict(result, age=None)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pools', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--down-every', type=int, default=5,
+                        help="0 to keep every peer up")
+    parser.add_argument('--delay', type=float, default=0.2,
+                        help="seconds a remote glusterd takes to answer")
+    parser.add_argument('--query', choices=sorted(QUERIES),
+                        default='volumeInfo')
+    args = parser.parse_args()
+
+    cli._glusterCommandPath = utils.CommandPath(
+        "gluster", os.path.join(_here, 'fakegluster.py'))
+    os.environ['FAKE_GLUSTER_REMOTE_DELAY'] = str(args.delay)
+    query = QUERIES[args.query]
+
+    clusters, down = _clusters(args.pools, args.down_every)
+    os.environ['FAKE_GLUSTER_DOWN_HOSTS'] = ','.join(down)
+    start = time.time()
+    expected = dict((c.name, c.call(query)) for c in clusters)
+    serialTime = time.time() - start
+    serialFailovers = sum(c.failovers for c in clusters)
+
+    clusters, down = _clusters(args.pools, args.down_every)
+    scheduler = cluster.ClusterScheduler(clusters, args.workers)
+    start = time.time()
+    results = scheduler.call(query)
+    concurrentTime = time.time() - start
+
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            raise result
+        if _comparable(result) != _comparable(expected[name]):
+            raise AssertionError("results of %s differ" % name)
+
+    print("%d pools, %d down peers, %s" %
+          (args.pools, len(down), args.query))
+    print("%-12s %10s %10s" % ('', 'ms', 'failovers'))
+    print("%-12s %10.1f %10d" % ('serial', serialTime * 1000,
+                                 serialFailovers))
+    print("%-12s %10.1f %10d" % ('scheduler', concurrentTime * 1000,
+                                 sum(c.failovers for c in clusters)))
+    print("speedup %.1fx" % (serialTime / concurrentTime))
+
+
+if __name__ == '__main__':
+    main()
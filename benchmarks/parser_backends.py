@@ -0,0 +1,89 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Time to parse the fixture replies, tree building included, with every
+# available XML backend, at several numbers of bricks per volume.  The
+# results of the backends are checked to be equal.
+#
+#   python benchmarks/parser_backends.py --bricks 10,100,1000
+
+import argparse
+import os
+import sys
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+
+import fakegluster
+from glustercli import cli
+from glustercli import identity
+from glustercli import xmlparser
+
+CASES = [
+    ('volume_status', lambda tree: cli._parseVolumeStatusAll(tree)),
+    ('volume_status_detail',
+     lambda tree: cli._parseVolumeStatusDetailAll(tree)),
+    ('volume_status_clients',
+     lambda tree: cli._parseVolumeStatusClients(tree)),
+    ('volume_profile_info',
+     lambda tree: cli._parseVolumeProfileInfo(tree, False)),
+    ('volume_geo-replication_status',
+     lambda tree: cli._parseGeoRepStatus(tree, True)),
+]
+
+
+def _time(out, parse, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = parse(xmlparser.fromstring(out))
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bricks', default='10,100,1000')
+    parser.add_argument('--volumes', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # no name resolution in the measured loops
+    cli._identity = identity.LocalIdentity(peer='localhost', uuid='uuid')
+    backends = xmlparser.available()
+    print("%-30s %6s %8s " % ('reply', 'bricks', 'KiB') +
+          ' '.join('%10s' % name for name in backends))
+    for bricks in [int(b) for b in args.bricks.split(',')]:
+        for name, parse in CASES:
+            out = fakegluster.render(name, None, args.volumes, bricks,
+                                     args.clients)
+            times = []
+            results = []
+            for backend in backends:
+                xmlparser.use(backend)
+                elapsed, result = _time(out, parse, args.repeat)
+                times.append(elapsed)
+                results.append(result)
+            if any(r != results[0] for r in results[1:]):
+                raise AssertionError("backends disagree on %s" % name)
+            print("%-30s %6d %8d " % (name, bricks, len(out) // 1024) +
+                  ' '.join('%9.2fms' % (t * 1000) for t in times))
+
+
+if __name__ == '__main__':
+    main()
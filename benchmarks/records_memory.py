@@ -0,0 +1,111 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Compares the memory held by parsed volume status and profile results in
+# the dict and typed formats.
+#
+#   python benchmarks/records_memory.py --bricks 500
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from glustercli import cli
+from glustercli import identity
+from glustercli import xmlparser
+
+_FOPS = ('WRITE', 'READ', 'LOOKUP', 'STAT', 'FSYNC', 'OPEN', 'CREATE')
+
+
+def _statusXml(bricks):
+    xml = ['<cliOutput><volStatus><volumes><volume><volName>vol0</volName>']
+    for b in range(bricks):
+        xml.append('<node><hostname>host%d</hostname><path>/bricks/b%d'
+                   '</path><peerid>%036d</peerid><status>1</status>'
+                   '<port>%d</port><pid>%d</pid></node>'
+                   % (b, b, b, 49152 + b, 1000 + b))
+    xml.append('</volume></volumes></volStatus></cliOutput>')
+    return ''.join(xml)
+
+
+def _statsXml(tag):
+    xml = ['<%s><blockStats>' % tag]
+    for size in (512, 4096, 131072):
+        xml.append('<block><size>%d</size><reads>12345</reads>'
+                   '<writes>54321</writes></block>' % size)
+    xml.append('</blockStats><fopStats>')
+    for fop in _FOPS:
+        xml.append('<fop><name>%s</name><hits>1234567</hits>'
+                   '<avgLatency>123.456789</avgLatency>'
+                   '<minLatency>1.000000</minLatency>'
+                   '<maxLatency>98765.432100</maxLatency></fop>' % fop)
+    xml.append('</fopStats><duration>3600</duration><totalRead>123456789'
+               '</totalRead><totalWrite>987654321</totalWrite></%s>' % tag)
+    return ''.join(xml)
+
+
+def _profileXml(bricks):
+    xml = ['<cliOutput><volProfile><volname>vol0</volname>']
+    for b in range(bricks):
+        xml.append('<brick><brickName>host%d:/bricks/b%d</brickName>%s%s'
+                   '</brick>' % (b, b, _statsXml('cumulativeStats'),
+                                 _statsXml('intervalStats')))
+    xml.append('</volProfile></cliOutput>')
+    return ''.join(xml)
+
+
+def deepSize(obj, seen=None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deepSize(k, seen) + deepSize(v, seen)
+                    for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deepSize(v, seen) for v in obj)
+    else:
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if hasattr(obj, name):
+                    size += deepSize(getattr(obj, name), seen)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bricks', type=int, default=500)
+    args = parser.parse_args()
+
+    cli._identity = identity.LocalIdentity(peer='localhost', uuid='uuid')
+    statusTree = xmlparser.fromstring(_statusXml(args.bricks))
+    profileTree = xmlparser.fromstring(_profileXml(args.bricks))
+    for name, parse in (('status', lambda typed: cli._parseVolumeStatus(
+                            statusTree, typed)['bricks']),
+                        ('profile', lambda typed: cli._parseVolumeProfileInfo(
+                            profileTree, False, typed)['bricks'])):
+        dictSize = deepSize(parse(False))
+        typedSize = deepSize(parse(True))
+        print("%-8s dict=%d B/brick typed=%d B/brick (%.0f%%)"
+              % (name, dictSize / args.bricks, typedSize / args.bricks,
+                 100.0 * typedSize / dictSize))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Compares calls per second of volumeInfo() through one-shot gluster
+# processes and through the session pool, using benchmarks/fakegluster.py.
+#
+#   python benchmarks/session_pool.py --calls 200 --threads 4
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+
+from glustercli import cli
+from glustercli import utils
+
+
+def _run(calls, threads):
+    def worker(n):
+        for i in range(n):
+            cli.volumeInfo()
+
+    workers = [threading.Thread(target=worker, args=(calls // threads,))
+               for i in range(threads)]
+    start = time.time()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return (calls // threads * threads) / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--gluster', default=os.path.join(_here,
+                                                          'fakegluster.py'))
+    args = parser.parse_args()
+
+    cli._glusterCommandPath = utils.CommandPath("gluster", args.gluster)
+
+    print("one-shot: %.1f calls/s" % _run(args.calls, args.threads))
+    cli.enableSessionPool(size=args.threads)
+    try:
+        print("pooled:   %.1f calls/s" % _run(args.calls, args.threads))
+    finally:
+        cli.disableSessionPool()
+
+
+if __name__ == '__main__':
+    main()
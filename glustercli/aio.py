@@ -0,0 +1,318 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# asyncio flavour of the cli module.  Every function returns a future
+# which resolves to exactly what its counterpart in cli returns.  The gluster
+# commands run as asyncio subprocess transports, so many queries can be in
+# flight on a single event loop thread.  Cancelling a future kills its
+# gluster process.
+
+try:
+    import asyncio
+except ImportError:
+    import trollius as asyncio
+import subprocess
+
+import cli
+import utils
+import xmlparser
+
+
+class _GlusterProtocol(asyncio.SubprocessProtocol):
+    def __init__(self, future):
+        self._future = future
+        self._transport = None
+        self._out = []
+        self._err = []
+        self._openPipes = set([1, 2])
+        self._exited = False
+
+    def connection_made(self, transport):
+        self._transport = transport
+        stdin = transport.get_pipe_transport(0)
+        if stdin is not None:
+            stdin.close()
+        self._future.add_done_callback(self._onDone)
+
+    def _onDone(self, future):
+        if future.cancelled() and not self._exited:
+            self._transport.kill()
+
+    def pipe_data_received(self, fd, data):
+        if fd == 1:
+            self._out.append(data)
+        else:
+            self._err.append(data)
+
+    def pipe_connection_lost(self, fd, exc):
+        self._openPipes.discard(fd)
+        self._checkDone()
+
+    def process_exited(self):
+        self._exited = True
+        self._checkDone()
+
+    def _checkDone(self):
+        if not self._exited or self._openPipes:
+            return
+        rc = self._transport.get_returncode()
+        self._transport.close()
+        if not self._future.done():
+            self._future.set_result((rc,
+                                     _text(b''.join(self._out)),
+                                     _text(b''.join(self._err))))
+
+
+def _text(data):
+    if isinstance(data, str):
+        return data
+    return data.decode('utf-8', 'replace')
+
+
+def _then(future, func, loop):
+    """
+    Returns a future which resolves to func(future.result())
+    """
+    result = asyncio.Future(loop=loop)
+
+    def done(f):
+        if result.done():
+            return
+        if f.cancelled():
+            result.cancel()
+            return
+        if f.exception() is not None:
+            result.set_exception(f.exception())
+            return
+        try:
+            result.set_result(func(f.result()))
+        except Exception as e:
+            result.set_exception(e)
+
+    future.add_done_callback(done)
+    result.add_done_callback(lambda r: r.cancelled() and future.cancel())
+    return result
+
+
+def _all(futures, loop):
+    """
+    Returns a future which resolves to the list of the results of futures,
+    or fails with the first of them which fails
+    """
+    result = asyncio.Future(loop=loop)
+
+    def done(f):
+        if result.done():
+            return
+        if f.cancelled():
+            result.cancel()
+            return
+        if f.exception() is not None:
+            result.set_exception(f.exception())
+            return
+        if all(other.done() for other in futures):
+            result.set_result([other.result() for other in futures])
+
+    for future in futures:
+        future.add_done_callback(done)
+    result.add_done_callback(
+        lambda r: r.cancelled() and [f.cancel() for f in futures])
+    return result
+
+
+def _execCmd(cmd, loop):
+    loop = loop or asyncio.get_event_loop()
+    future = asyncio.Future(loop=loop)
+
+    def spawned(task):
+        if not task.cancelled() and task.exception() is not None:
+            if not future.done():
+                future.set_exception(task.exception())
+
+    task = asyncio.ensure_future(
+        loop.subprocess_exec(lambda: _GlusterProtocol(future), *cmd,
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE),
+        loop=loop)
+    task.add_done_callback(spawned)
+    return future, loop
+
+
+def _execGluster(cmd, loop, parse):
+    future, loop = _execCmd(cmd, loop)
+
+    def getResult(result):
+        rc, out, err = result
+        if rc:
+            raise utils.CmdExecFailed(cmd, rc, out, err)
+        cli._throwIfBusy(cmd, rc, out, err)
+        return parse(rc, out, err)
+
+    return _then(future, getResult, loop)
+
+
+def _execGlusterXml(cmd, loop, parse, *args):
+    cmd.append('--xml')
+    future, loop = _execCmd(cmd, loop)
+
+    def getResult(result):
+        rc, out, err = result
+        # like utils.execCmd() in cli, before looking at the reply
+        if rc:
+            raise utils.CmdExecFailed(cmd, rc, out, err)
+        xmltree = cli._getXmlTree(cmd, rc, out, err)
+        try:
+            return parse(xmltree, *args)
+        except cli._etreeExceptions:
+            raise cli.GlusterXMLError(cmd, xmlparser.tostring(xmltree))
+
+    return _then(future, getResult, loop)
+
+
+def _lookupLocalPeer():
+    return cli._getLocalPeer(), cli._getLocalPeerUUID()
+
+
+def _execGlusterXmlWithPeer(cmd, loop, parse, *args):
+    """
+    _execGlusterXml() for the parsers needing the local peer, which is
+    called as parse(xmltree, peer, uuid, *args).  Resolving the peer may
+    block on DNS and reading its uuid may run gluster, so both run in the
+    default executor while the command runs.
+    """
+    loop = loop or asyncio.get_event_loop()
+    lookup = loop.run_in_executor(None,
+                                  cli._withCallerContext(_lookupLocalPeer))
+    parse = cli._withCallerContext(parse)
+    tree = _execGlusterXml(cmd, loop, lambda xmltree: xmltree)
+
+    def getResult(results):
+        xmltree, (peer, uuid) = results
+        try:
+            return parse(xmltree, peer, uuid, *args)
+        except cli._etreeExceptions:
+            raise cli.GlusterXMLError(cmd, xmlparser.tostring(xmltree))
+
+    return _then(_all([tree, lookup], loop), getResult, loop)
+
+
+def _true(xmltree):
+    return True
+
+
+def volumeInfo(volumeName=None, remoteServer=None, loop=None):
+    if remoteServer:
+        with cli.remoteHost(remoteServer):
+            return volumeInfo(volumeName, loop=loop)
+
+    command = cli._getGlusterVolCmd() + ["info"]
+    if volumeName:
+        command.append(volumeName)
+
+    return _execGlusterXml(command, loop, cli._parseVolumeInfo)
+
+
+_volumeStatusParsers = {'detail': cli._parseVolumeStatusDetail,
+                        'clients': cli._parseVolumeStatusClients,
+                        'mem': cli._parseVolumeStatusMem}
+
+
+def volumeStatus(volumeName, brick=None, option=None, loop=None):
+    command = cli._getGlusterVolCmd() + ["status", volumeName]
+    if brick:
+        command.append(brick)
+    if option:
+        command.append(option)
+
+    if option in _volumeStatusParsers:
+        return _execGlusterXml(command, loop, _volumeStatusParsers[option])
+    # the brick of NFS and self-heal daemons is the local peer
+    return _execGlusterXmlWithPeer(
+        command, loop, lambda xmltree, peer, uuid: cli._parseVolumeStatus(
+            xmltree, hostname=peer))
+
+
+def volumeTasks(volumeName="all", loop=None):
+    command = cli._getGlusterVolCmd() + ["status", volumeName, "tasks"]
+
+    return _execGlusterXml(command, loop, cli._parseVolumeTasks)
+
+
+def peerStatus(loop=None):
+    command = cli._getGlusterPeerCmd() + ["status"]
+
+    return _execGlusterXmlWithPeer(command, loop, cli._parsePeerStatus,
+                                   cli.HostStatus.CONNECTED)
+
+
+def volumeGeoRepStatus(volumeName=None, remoteHost=None,
+                       remoteVolumeName=None, detail=False, loop=None):
+    command = cli._getGlusterVolGeoRepCmd()
+    if volumeName:
+        command.append(volumeName)
+    if remoteHost and remoteVolumeName:
+        command.append("%s::%s" % (remoteHost, remoteVolumeName))
+    command.append("status")
+    if detail:
+        command.append("detail")
+
+    return _execGlusterXml(command, loop, cli._parseGeoRepStatus, detail)
+
+
+def _parseSnapshotCreate(xmltree):
+    return {'uuid': xmltree.find('snapCreate/snapshot/uuid').text}
+
+
+def snapshotCreate(volumeName, snapName, snapDescription=None, force=False,
+                   loop=None):
+    command = cli._getGlusterSnapshotCmd() + ["create", snapName, volumeName]
+
+    if snapDescription:
+        command += ['description', snapDescription]
+    if force:
+        command.append('force')
+
+    return _execGlusterXml(command, loop, _parseSnapshotCreate)
+
+
+def snapshotDelete(volumeName=None, snapName=None, loop=None):
+    command = cli._getGlusterSnapshotCmd() + ["delete"]
+    if snapName:
+        command.append(snapName)
+    elif volumeName:
+        command += ["volume", volumeName]
+
+    # xml output not used because of BZ:1161416 in gluster cli
+    return _execGluster(command, loop, lambda rc, out, err: True)
+
+
+def snapshotActivate(snapName, force=False, loop=None):
+    command = cli._getGlusterSnapshotCmd() + ["activate", snapName]
+    if force:
+        command.append('force')
+
+    return _execGlusterXml(command, loop, _true)
+
+
+def snapshotDeactivate(snapName, loop=None):
+    command = cli._getGlusterSnapshotCmd() + ["deactivate", snapName]
+
+    return _execGlusterXml(command, loop, _true)
+
+
+def snapshotRestore(snapName, loop=None):
+    command = cli._getGlusterSnapshotCmd() + ["restore", snapName]
+
+    return _execGlusterXml(command, loop, cli._parseRestoredSnapshot)
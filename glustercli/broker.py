@@ -0,0 +1,367 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A local daemon running the gluster commands of every process on the node
+# one at a time, since glusterd only runs one transaction at a time anyway.
+# Clients send one JSON object per line on a Unix socket:
+#
+#   {"args": ["--mode=script", "volume", "set", "vol0", "k", "v", "--xml"],
+#    "timeout": 120}
+#
+# and get {"rc": ..., "out": ..., "err": ...} or {"error": ...} back, with
+# "timeout" and "killed" added when the optional timeout stopped the
+# command.  `volume set` requests waiting one after the other for the same
+# volume and timeout are run as a single `volume set VOLUME k1 v1 k2 v2
+# ...` transaction, and busy replies are retried.
+#
+#   python -m glustercli.broker --socket /var/run/glustercli.sock
+
+import argparse
+import collections
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+import retry
+import utils
+
+logger = logging.getLogger('glustercli')
+
+DEFAULT_SOCKET = '/var/run/glustercli-broker.sock'
+_TRANS_IN_PROGRESS = "another transaction is in progress"
+# options which change more than themselves are never merged
+_UNMERGEABLE_OPTIONS = ('group',)
+
+
+class BrokerError(Exception):
+    pass
+
+
+class _Busy(Exception):
+    def __init__(self, result):
+        self.result = result
+
+
+def _reply(result):
+    rc, out, err = result
+    # JSON strings are unicode, gluster may print any bytes
+    return {'rc': rc, 'out': out.decode('utf-8', 'replace'),
+            'err': err.decode('utf-8', 'replace')}
+
+
+class _Request(object):
+    __slots__ = ('args', 'timeout', 'result', 'done')
+
+    def __init__(self, args, timeout=None):
+        self.args = args
+        self.timeout = timeout
+        self.result = None
+        self.done = threading.Event()
+
+
+def _volumeSet(args):
+    """
+    Returns (options, volumeName, [(key, value), ...]) for a volume set
+    command which may be merged with others, None otherwise.
+    """
+    options = [a for a in args if a.startswith('--')]
+    words = [a for a in args if not a.startswith('--')]
+    if words[:2] != ['volume', 'set'] or len(words) < 5 or \
+            not len(words) % 2:
+        return None
+    pairs = zip(words[3::2], words[4::2])
+    for key, value in pairs:
+        if key in _UNMERGEABLE_OPTIONS:
+            return None
+    return options, words[2], pairs
+
+
+class Broker(object):
+    """
+    Serves `socketPath` and runs the received commands with `glusterPath`
+    in arrival order.  A `volume set` waits up to `mergeWindow` seconds for
+    more sets of the same volume to merge with.
+    """
+    def __init__(self, socketPath=DEFAULT_SOCKET,
+                 glusterPath='/usr/sbin/gluster', mergeWindow=0.01,
+                 busyDeadline=60, mode=0o600):
+        self.socketPath = socketPath
+        self.glusterPath = glusterPath
+        self.mergeWindow = mergeWindow
+        self.mode = mode
+        self._retry = retry.BusyRetry(lambda e: isinstance(e, _Busy),
+                                      busyDeadline)
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._sock = None
+        self._threads = []
+        self.stats = {'requests': 0, 'transactions': 0, 'merged': 0}
+
+    def _run(self, args, timeout=None):
+        def run():
+            result = utils.execCmd([self.glusterPath] + args,
+                                   throwException=False, timeout=timeout)
+            rc, out, err = result
+            if _TRANS_IN_PROGRESS in (out + err).lower():
+                raise _Busy(result)
+            return _reply(result)
+
+        self.stats['transactions'] += 1
+        try:
+            return self._retry.call(run)
+        except _Busy as e:
+            return _reply(e.result)
+        except utils.CmdTimeout as e:
+            result = _reply((e.rc, e.out, e.err))
+            result.update(timeout=e.timeout, killed=e.killed)
+            return result
+
+    def _takeBatch(self):
+        """
+        Returns the next request and the ones merged with it, called with
+        the condition held
+        """
+        request = self._pending.popleft()
+        first = _volumeSet(request.args)
+        if first is None:
+            return [request], request.args, request.timeout
+        options, volumeName, pairs = first
+        batch = [request]
+        keys = set(key for key, value in pairs)
+        extra = []
+        end = time.time() + self.mergeWindow
+        while not self._stopped:
+            if not self._pending:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+                continue
+            other = _volumeSet(self._pending[0].args)
+            if other is None or other[:2] != (options, volumeName) or \
+                    self._pending[0].timeout != request.timeout:
+                break
+            otherKeys = set(key for key, value in other[2])
+            if keys & otherKeys:
+                # the order of one transaction's options is not defined
+                break
+            keys |= otherKeys
+            for key, value in other[2]:
+                extra += [key, value]
+            batch.append(self._pending.popleft())
+        args = request.args
+        last = max(i for i, a in enumerate(args) if not a.startswith('--'))
+        return (batch, args[:last + 1] + extra + args[last + 1:],
+                request.timeout)
+
+    def _execute(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                batch, args, timeout = self._takeBatch()
+
+            try:
+                result = self._run(args, timeout)
+                if result['rc'] != 0 and len(batch) > 1 and \
+                        'timeout' not in result:
+                    # tell every caller how its own change went
+                    for request in batch:
+                        request.result = self._run(request.args, timeout)
+                        request.done.set()
+                    continue
+                self.stats['merged'] += len(batch) - 1
+            except Exception as e:
+                logger.exception("broker failed to run %s", args)
+                result = {'error': str(e)}
+            for request in batch:
+                request.result = result
+                request.done.set()
+
+    def submit(self, args, timeout=None):
+        request = _Request(args, timeout)
+        with self._cond:
+            if self._stopped:
+                raise BrokerError("broker stopped")
+            self.stats['requests'] += 1
+            self._pending.append(request)
+            self._cond.notify_all()
+        request.done.wait()
+        return request.result
+
+    def _serve(self, conn):
+        try:
+            f = conn.makefile('rb')
+            for line in f:
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise TypeError("request is not an object")
+                    args = request['args']
+                    if not isinstance(args, list):
+                        raise TypeError("args is not a list")
+                    args = [unicode(a).encode('utf-8') for a in args]
+                    timeout = request.get('timeout')
+                    if timeout is not None:
+                        timeout = float(timeout)
+                except (ValueError, KeyError, TypeError) as e:
+                    # ValueError covers bad JSON and UnicodeError too
+                    logger.warn("broker got a bad request: %s", e)
+                    reply = {'error': 'bad request: %s' % e}
+                else:
+                    reply = self.submit(args, timeout)
+                conn.sendall(json.dumps(reply) + '\n')
+        except (socket.error, BrokerError) as e:
+            logger.debug("broker connection closed: %s", e)
+        finally:
+            conn.close()
+
+    def _accept(self):
+        while not self._stopped:
+            try:
+                conn, addr = self._sock.accept()
+            except socket.error:
+                if self._stopped:
+                    return
+                raise
+            t = threading.Thread(target=self._serve, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def start(self):
+        if os.path.exists(self.socketPath):
+            os.unlink(self.socketPath)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socketPath)
+        os.chmod(self.socketPath, self.mode)
+        self._sock.listen(128)
+        for target in (self._execute, self._accept):
+            t = threading.Thread(target=target)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            pending = list(self._pending)
+            self._pending.clear()
+        for request in pending:
+            request.result = {'error': 'broker stopped'}
+            request.done.set()
+        if self._sock is not None:
+            self._sock.shutdown(socket.SHUT_RDWR)
+            self._sock.close()
+            self._sock = None
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        if os.path.exists(self.socketPath):
+            os.unlink(self.socketPath)
+
+
+class BrokerClient(object):
+    """
+    Runs commands through a Broker.  Like utils.execCmd, execCmd() returns
+    (rc, out, err), raises CmdExecFailed when rc is not 0 and CmdTimeout
+    when the broker stopped the command after `timeout` seconds.  Only
+    when the broker cannot be connected to is the command run directly;
+    once the request is sent a lost reply raises BrokerError, as the
+    broker may have run the command already.  The `timeout` of the client
+    bounds each socket operation, queueing in the broker included.
+    """
+    def __init__(self, socketPath=DEFAULT_SOCKET, timeout=None):
+        self.socketPath = socketPath
+        self.timeout = timeout
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socketPath)
+        except socket.error:
+            sock.close()
+            raise
+        return sock
+
+    def _request(self, sock, request):
+        try:
+            sock.sendall(json.dumps(request) + '\n')
+            f = sock.makefile('rb')
+            line = f.readline()
+        except socket.error as e:
+            raise BrokerError("broker request failed: %s" % e)
+        finally:
+            sock.close()
+        if not line:
+            raise BrokerError("broker closed the connection")
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            raise BrokerError("bad broker reply: %s" % e)
+
+    def execCmd(self, cmd, timeout=None):
+        try:
+            sock = self._connect()
+        except socket.error as e:
+            logger.warn("gluster broker unavailable, running %s directly: "
+                        "%s", cmd, e)
+            return utils.execCmd(cmd, timeout=timeout)
+        request = {'args': cmd[1:]}
+        if timeout is not None:
+            request['timeout'] = timeout
+        reply = self._request(sock, request)
+        if 'error' in reply:
+            raise BrokerError(reply['error'])
+        rc = reply['rc']
+        out = reply['out'].encode('utf-8')
+        err = reply['err'].encode('utf-8')
+        if 'timeout' in reply:
+            raise utils.CmdTimeout(cmd, rc, out, err, reply['timeout'],
+                                   reply['killed'])
+        if rc:
+            raise utils.CmdExecFailed(cmd, rc, out, err)
+        return rc, out, err
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serialize gluster commands of local processes")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--gluster', default='/usr/sbin/gluster')
+    parser.add_argument('--merge-window', type=float, default=0.01)
+    parser.add_argument('--busy-deadline', type=float, default=60)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    broker = Broker(args.socket, args.gluster, args.merge_window,
+                    args.busy_deadline)
+    broker.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        broker.stop()
+
+
+if __name__ == '__main__':
+    main()
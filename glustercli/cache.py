@@ -0,0 +1,96 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import time
+
+
+class TTLCache(object):
+    """
+    A size bounded LRU cache whose entries also expire after a per entry
+    time to live.  Keys are (name, args) tuples; statistics are kept per
+    name.  Every invalidation of a name bumps its generation, so that a
+    reply read before it is not stored after it, see put().
+    """
+    def __init__(self, maxSize=256):
+        self.maxSize = maxSize
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._generations = collections.defaultdict(int)
+        self._stats = collections.defaultdict(
+            lambda: {'hits': 0, 'misses': 0, 'evictions': 0,
+                     'invalidations': 0})
+
+    def get(self, key):
+        """
+        Returns (True, value) on a hit and (False, None) on a miss
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > time.time():
+                    self._entries[key] = entry
+                    self._stats[key[0]]['hits'] += 1
+                    return True, value
+            self._stats[key[0]]['misses'] += 1
+            return False, None
+
+    def generation(self, name):
+        with self._lock:
+            return self._generations[name]
+
+    def put(self, key, value, ttl=None, generation=None):
+        """
+        Stores value unless `generation`, taken from generation() before
+        value was read, is no longer the one of the name of key
+        """
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            # make sure the name shows up in stats()
+            self._stats[key[0]]
+            if generation is not None and \
+                    generation != self._generations[key[0]]:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.maxSize:
+                oldKey, oldEntry = self._entries.popitem(last=False)
+                self._stats[oldKey[0]]['evictions'] += 1
+
+    def invalidate(self, name, match=None):
+        """
+        Drops the entries of `name` whose args satisfy match(args), or all
+        of them when no `match` is given.
+        """
+        with self._lock:
+            self._generations[name] += 1
+            for key in list(self._entries):
+                if key[0] == name and (match is None or match(key[1])):
+                    del self._entries[key]
+                    self._stats[name]['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict((name, dict(s, size=0))
+                         for name, s in self._stats.items())
+            for key in self._entries:
+                stats[key[0]]['size'] += 1
+            return stats
@@ -13,62 +13,78 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import xml.etree.cElementTree as etree
-import ethtool
-import socket
+import collections
+import copy
+import functools
 import logging
-
+import threading
+import time
+
+import cache
+import identity
+import instrument
+import pool
+import records
+import retry
+import topology
 import utils
+import xmlparser
 
 logger = logging.getLogger('glustercli')
 
-if hasattr(etree, 'ParseError'):
-    _etreeExceptions = (etree.ParseError, AttributeError, ValueError)
-else:
-    _etreeExceptions = (SyntaxError, AttributeError, ValueError)
+# besides parse errors, what missing or empty elements raise in the parsers
+_etreeExceptions = xmlparser.ParseError + (AttributeError, IndexError,
+                                           ValueError)
 
 _glusterCommandPath = utils.CommandPath("gluster",
                                         "/usr/sbin/gluster",
                                         )
 _TRANS_IN_PROGRESS = "another transaction is in progress"
-_peerUUID = ''
-_peer = ''
+_CONNECTION_FAILED = "connection failed"
+_sessionPool = None
+_busyRetry = None
+_brokerClient = None
+_glusterdClient = None
+_cache = None
+# state of the current thread: the remoteHost stack and the commandTimeout
+_local = threading.local()
+_remotePeerUUIDs = {}
+# seconds a command may run, None means forever
+_commandTimeout = None
+_stoppedCommands = collections.defaultdict(
+    lambda: {'timeouts': 0, 'cancelled': 0, 'killed': 0})
+_stoppedCommandsLock = threading.Lock()
+# seconds a cached reply stays valid, None means until invalidated
+_cacheTTLs = {'volumeInfo': 30,
+              'peerStatus': 30,
+              'volumeSetHelpXml': None}
 
 
 def _getLocalPeer():
-    global _peer
-
-    if _peer:
-        return _peer
+    host = currentRemoteHost()
+    if host is not None:
+        # the node answering is the one replies call localhost
+        return host
+    return _identity.peer()
 
-    fqdn = socket.getfqdn()
-    ip = socket.gethostbyname(fqdn)
-    if not ip.startswith('127.'):
-        _peer = ip
-        return ip
 
-    for dev in ethtool.get_active_devices():
-        try:
-            ip = ethtool.get_ipaddr(dev)
-            if not ip.startswith('127.'):
-                _peer = ip
-                return ip
-        except IOError as e:
-            logger.warn('failed to get ipaddr for device %s: %s' % (dev, e))
-
-    return fqdn
+def _getGlusterCmd():
+    host = currentRemoteHost()
+    if host is None:
+        return [_glusterCommandPath.cmd]
+    return [_glusterCommandPath.cmd, "--remote-host=%s" % host]
 
 
 def _getGlusterVolCmd():
-    return [_glusterCommandPath.cmd, "--mode=script", "volume"]
+    return _getGlusterCmd() + ["--mode=script", "volume"]
 
 
 def _getGlusterPeerCmd():
-    return [_glusterCommandPath.cmd, "--mode=script", "peer"]
+    return _getGlusterCmd() + ["--mode=script", "peer"]
 
 
 def _getGlusterSystemCmd():
-    return [_glusterCommandPath.cmd, "system::"]
+    return _getGlusterCmd() + ["system::"]
 
 
 def _getGlusterVolGeoRepCmd():
@@ -76,7 +92,7 @@ def _getGlusterVolGeoRepCmd():
 
 
 def _getGlusterSnapshotCmd():
-    return [_glusterCommandPath.cmd, "--mode=script", "snapshot"]
+    return _getGlusterCmd() + ["--mode=script", "snapshot"]
 
 
 class BrickStatus:
@@ -109,6 +125,15 @@ class TaskType:
     REMOVE_BRICK = 'REMOVE_BRICK'
 
 
+class ResultFormat:
+    # plain dicts holding strings
+    DICT = 'dict'
+    # records.* objects holding numbers
+    TYPED = 'typed'
+    # columnar.profileColumns() tables, volumeProfileInfo() only
+    COLUMNAR = 'columnar'
+
+
 class GlusterXMLError(Exception):
     message = "XML error"
 
@@ -128,33 +153,527 @@ class GlusterBusy(utils.CmdExecFailed):
     message = "gluster busy"
 
 
+def _errorText(e):
+    # GlusterCmdFailed has no output and maybe no opErrstr
+    return '%s%s' % (e.out or '', e.err or '')
+
+
+def _isBusy(e):
+    # gluster exits non zero when busy, which execCmd reports first
+    if isinstance(e, GlusterBusy):
+        return True
+    if isinstance(e, utils.CmdExecFailed):
+        return _TRANS_IN_PROGRESS in _errorText(e).lower()
+    return False
+
+
+def isUnreachable(e):
+    """
+    Tells if e comes from a command glusterd never got, the CLI could not
+    connect to it, or from a query which timed out
+    """
+    if isinstance(e, utils.CmdTimeout):
+        return _isReadOnlyCmd(e.cmd)
+    if isinstance(e, utils.CmdExecFailed):
+        return _CONNECTION_FAILED in _errorText(e).lower()
+    return False
+
+
 def _throwIfBusy(cmd, rc, out, err):
     o = out + err
     if _TRANS_IN_PROGRESS in o.lower():
         raise GlusterBusy(cmd, rc, out, err)
 
 
+def enableSessionPool(size=4, maxCalls=1000, timeout=120):
+    """
+    Run read-only XML queries through `size` long running gluster CLI
+    processes instead of spawning a new one for every call.
+    """
+    global _sessionPool
+
+    disableSessionPool()
+    _sessionPool = pool.GlusterSessionPool(_glusterCommandPath.cmd, size,
+                                           maxCalls, timeout)
+
+
+def disableSessionPool():
+    global _sessionPool
+
+    if _sessionPool is not None:
+        _sessionPool.close()
+        _sessionPool = None
+
+
+def enableBroker(socketPath=None, timeout=None):
+    """
+    Send mutating commands to the broker daemon listening on `socketPath`
+    (see glustercli.broker, broker.DEFAULT_SOCKET by default) which runs
+    the commands of all the local processes one at a time and merges
+    consecutive volume sets.
+    """
+    global _brokerClient
+    import broker
+
+    _brokerClient = broker.BrokerClient(socketPath or broker.DEFAULT_SOCKET,
+                                        timeout)
+
+
+def disableBroker():
+    global _brokerClient
+
+    _brokerClient = None
+
+
+def enableLocalIdentityRefresh(interval=300, netlink=True, resolveTimeout=5):
+    """
+    Resolve the local peer address now and again every `interval` seconds
+    and, with `netlink`, whenever a local address changes.  Callers wait
+    at most `resolveTimeout` seconds for the first resolution.
+    """
+    global _identity
+
+    disableLocalIdentityRefresh()
+    _identity = identity.LocalIdentity(resolveTimeout,
+                                       uuidFallback=_cliPeerUUID)
+    _identity.start(interval, netlink)
+
+
+def disableLocalIdentityRefresh():
+    _identity.stop()
+
+
+def refreshLocalIdentity():
+    """
+    Re-resolves the local peer address and uuid, the previous ones are
+    used until the new address is known.
+    """
+    _identity.refresh()
+
+
+def enableGlusterdBackend(address=None, timeout=30):
+    """
+    Answer volumeInfo() and peerStatus() by calling glusterd directly at
+    `address`, its Unix socket (glusterd.DEFAULT_SOCKET by default) or a
+    (host, port) tuple, instead of running the gluster CLI.  Other
+    functions keep using the CLI, and so do these ones whenever glusterd
+    cannot be reached or answers a dict they cannot decode.
+    """
+    global _glusterdClient
+    import glusterd
+
+    disableGlusterdBackend()
+    _glusterdClient = glusterd.GlusterdClient(
+        address or glusterd.DEFAULT_SOCKET, timeout)
+
+
+def disableGlusterdBackend():
+    global _glusterdClient
+
+    if _glusterdClient is not None:
+        _glusterdClient.close()
+        _glusterdClient = None
+
+
+def _execGlusterd(cmd, call):
+    """
+    Returns the dict of call(client) run on the glusterd backend in place
+    of cmd, None when glusterd cannot be reached
+    """
+    import glusterd
+
+    name = _commandName(cmd)
+    with instrument.measureCommand(name, name):
+        try:
+            return _runCmd(cmd, lambda: _execGlusterdOnce(cmd, call))
+        except glusterd.RpcError as e:
+            logger.warn("glusterd backend failed, running %s with the CLI: "
+                        "%s", cmd, e)
+            return None
+
+
+def _execGlusterdOnce(cmd, call):
+    start = time.time()
+    rv, errNo, msg, values = call(_glusterdClient)
+    instrument.add('wall', time.time() - start)
+    _throwIfBusy(cmd, rv, '', msg)
+    _throwIfOpFailed(cmd, rv, errNo, msg)
+    return values
+
+
+def _execMutatingCmd(cmd):
+    if _brokerClient is not None and not _isReadOnlyCmd(cmd):
+        return _brokerClient.execCmd(cmd, timeout=_currentCommandTimeout())
+    return utils.execCmd(cmd, timeout=_currentCommandTimeout())
+
+
+def enableBusyRetry(deadline=60, initialDelay=0.5, maxDelay=10,
+                    multiplier=2, jitter=0.5):
+    """
+    Retry commands failing with GlusterBusy, sleeping between attempts an
+    exponentially growing delay randomly shortened by up to `jitter`, for
+    at most `deadline` seconds per call.  Mutating commands are also run
+    one at a time, in order.  Streamed replies are not retried.
+    """
+    global _busyRetry
+
+    _busyRetry = retry.BusyRetry(_isBusy, deadline, initialDelay, maxDelay,
+                                 multiplier, jitter)
+
+
+def disableBusyRetry():
+    global _busyRetry
+
+    _busyRetry = None
+
+
+def busyRetryStats():
+    if _busyRetry is None:
+        return {}
+    return _busyRetry.stats()
+
+
+class busyDeadline(object):
+    """
+    Context manager changing the busy retry deadline of the calls made in
+    its block by the current thread:
+
+      with cli.busyDeadline(5):
+          cli.volumeSet(...)
+    """
+    def __init__(self, deadline):
+        self.deadline = deadline
+
+    def __enter__(self):
+        if _busyRetry is not None:
+            self._retry = _busyRetry
+            self._previous = _busyRetry.setDeadline(self.deadline)
+
+    def __exit__(self, excType, excValue, tb):
+        if getattr(self, '_retry', None) is not None:
+            self._retry.setDeadline(self._previous)
+
+
+class remoteHost(object):
+    """
+    Context manager running the gluster commands of the current thread
+    against the glusterd of `host` (--remote-host), None meaning the local
+    one:
+
+      with cli.remoteHost('node1.example.com') as remote:
+          cli.volumeStatus(...)
+
+    The node answering takes the place of the local peer in the replies.
+    `unreachable` keeps the last error of a command which could not connect
+    to glusterd, including the ones of functions reporting errors in their
+    result like clusterSnapshot().
+    """
+    def __init__(self, host):
+        self.host = host
+        self.unreachable = None
+
+    def __enter__(self):
+        _remoteStack().append(self)
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        _remoteStack().pop()
+
+
+def _remoteStack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def _currentRemote():
+    stack = _remoteStack()
+    if stack:
+        return stack[-1]
+    return None
+
+
+def currentRemoteHost():
+    remote = _currentRemote()
+    if remote is None:
+        return None
+    return remote.host
+
+
+def enableCommandTimeout(timeout=120):
+    """
+    Stop gluster commands still running after `timeout` seconds, with
+    SIGTERM then SIGKILL, raising utils.CmdTimeout; commandTimeout()
+    changes it for a block.  Commands sent to the broker are stopped by the
+    broker after the same timeout, once their turn comes; the session pool
+    and the glusterd backend have their own timeouts and streamed replies
+    have none.  From another thread, utils.cancelOn() cancels the commands
+    a block runs itself, not the ones sent to the broker.
+    """
+    global _commandTimeout
+
+    _commandTimeout = timeout
+
+
+def disableCommandTimeout():
+    global _commandTimeout
+
+    _commandTimeout = None
+
+
+class commandTimeout(object):
+    """
+    Context manager changing the timeout of the gluster commands run in its
+    block by the current thread, None restoring the default one:
+
+      with cli.commandTimeout(10):
+          cli.volumeStatus(...)
+    """
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def __enter__(self):
+        self._previous = getattr(_local, 'timeout', None)
+        _local.timeout = self.timeout
+
+    def __exit__(self, excType, excValue, tb):
+        _local.timeout = self._previous
+
+
+def _currentCommandTimeout():
+    timeout = getattr(_local, 'timeout', None)
+    if timeout is None:
+        return _commandTimeout
+    return timeout
+
+
+def stoppedCommandStats():
+    """
+    Returns {command: {'timeouts': n, 'cancelled': n, 'killed': n}} of the
+    gluster commands stopped so far, killed counting the ones SIGTERM did
+    not stop
+    """
+    with _stoppedCommandsLock:
+        return dict((name, dict(counts))
+                    for name, counts in _stoppedCommands.items())
+
+
+def _countStopped(cmd, e):
+    if isinstance(e, utils.CmdTimeout):
+        key = 'timeouts'
+    elif isinstance(e, utils.CmdCancelled):
+        key = 'cancelled'
+    else:
+        return
+    with _stoppedCommandsLock:
+        counts = _stoppedCommands[_commandName(cmd)]
+        counts[key] += 1
+        if e.killed:
+            counts['killed'] += 1
+
+
+def _withCallerContext(func):
+    """
+    Returns func running under the remote host and command timeout of the
+    calling thread, for the worker threads of utils.execConcurrently()
+    """
+    remote = _currentRemote()
+    timeout = getattr(_local, 'timeout', None)
+    if remote is None and timeout is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        with commandTimeout(timeout):
+            if remote is None:
+                return func(*args, **kwargs)
+            with remote:
+                return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _runCmd(cmd, func):
+    try:
+        if _busyRetry is None:
+            return func()
+        return _busyRetry.call(func, not _isReadOnlyCmd(cmd))
+    except utils.CmdExecFailed as e:
+        _countStopped(cmd, e)
+        remote = _currentRemote()
+        if remote is not None and isUnreachable(e):
+            remote.unreachable = e
+        raise
+
+
+def enableCache(maxSize=256, ttls=None):
+    """
+    Cache the replies of volumeInfo(), peerStatus() and volumeSetHelpXml().
+    `ttls` overrides the time to live of these functions.  Calls changing
+    volumes or peers drop the entries they affect.
+    """
+    global _cache
+
+    if ttls:
+        _cacheTTLs.update(ttls)
+    _cache = cache.TTLCache(maxSize)
+
+
+def disableCache():
+    global _cache
+
+    _cache = None
+
+
+def cacheStats():
+    if _cache is None:
+        return {}
+    return _cache.stats()
+
+
+def _callArgs(func, args, kwargs):
+    # inspect pulls in tokenize, import it with the first cache use
+    import inspect
+
+    return inspect.getcallargs(func, *args, **kwargs)
+
+
+def _cached(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _cache is None:
+            return func(*args, **kwargs)
+
+        callArgs = _callArgs(func, args, kwargs)
+        key = (name, tuple(sorted(callArgs.items())), currentRemoteHost())
+        found, value = _cache.get(key)
+        if not found:
+            # an invalidation while func runs makes value stale
+            generation = _cache.generation(name)
+            value = func(*args, **kwargs)
+            _cache.put(key, value, _cacheTTLs.get(name), generation)
+        # callers are free to modify what they get
+        return copy.deepcopy(value)
+
+    return wrapper
+
+
+def _invalidate(names, volumeName=None):
+    """
+    Drops the cached replies of the functions in `names`, only the entries
+    of volumeName and the ones covering all volumes when it is given
+    """
+    if _cache is None:
+        return
+    match = None
+    if volumeName:
+        def match(callArgs):
+            return dict(callArgs).get('volumeName') in (None, volumeName)
+
+    for name in names:
+        _cache.invalidate(name, match)
+
+
+def _invalidates(*names):
+    """
+    Drops the cached replies of the functions in `names` after the
+    decorated call.  When the call has a volumeName only the entries of
+    that volume and the ones covering all volumes are dropped.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if _cache is not None:
+                    _invalidate(names, _callArgs(func, args,
+                                                 kwargs).get('volumeName'))
+
+        return wrapper
+
+    return decorator
+
+
+def _isReadOnlyCmd(cmd):
+    args = [a for a in cmd[1:] if not a.startswith('--')]
+    if len(args) < 2:
+        return False
+    if args[0] == 'peer':
+        return args[1] == 'status'
+    if args[0] == 'system::':
+        return args[1:3] == ['uuid', 'get']
+    if args[0] == 'snapshot':
+        return args[1] in ('list', 'info', 'status')
+    if args[0] != 'volume':
+        return False
+    if args[1] in ('info', 'status'):
+        return True
+    if args[1] == 'set':
+        return args[2:3] in (['help'], ['help-xml'])
+    if args[1] in ('rebalance', 'remove-brick', 'replace-brick'):
+        return args[-1] == 'status'
+    if args[1] == 'profile':
+        return args[3:4] == ['info']
+    if args[1] == 'geo-replication':
+        return 'status' in args[-2:] or args[-1] == 'config'
+    return False
+
+
+def _commandName(cmd):
+    return ' '.join([w for w in cmd[1:] if not w.startswith('-')][:2])
+
+
 def _execGluster(cmd):
-    rc, out, err = utils.execCmd(cmd)
+    name = _commandName(cmd)
+    with instrument.measureCommand(name, name):
+        return _runCmd(cmd, lambda: _execGlusterOnce(cmd))
+
+
+def _execGlusterOnce(cmd):
+    rc, out, err = _execMutatingCmd(cmd)
     _throwIfBusy(cmd, rc, out, err)
     return rc, out, err
 
 
 def _execGlusterXml(cmd):
     cmd.append('--xml')
-    rc, out, err = utils.execCmd(cmd)
+    name = _commandName(cmd)
+    with instrument.measureCommand(name, name):
+        return _runCmd(cmd, lambda: _execGlusterXmlOnce(cmd))
+
+
+def _execGlusterXmlOnce(cmd):
+    if _sessionPool is not None and _isReadOnlyCmd(cmd):
+        rc, out, err = _sessionPool.execCmd(cmd)
+    else:
+        rc, out, err = _execMutatingCmd(cmd)
+    return _getXmlTree(cmd, rc, out, err)
+
+
+def _getXmlTree(cmd, rc, out, err):
     _throwIfBusy(cmd, rc, out, err)
 
     try:
-        tree = etree.fromstring(out)
+        start = time.time()
+        tree = xmlparser.fromstring(out)
+        instrument.add('parse', time.time() - start)
         rv = int(tree.find('opRet').text)
         msg = tree.find('opErrstr').text
         errNo = int(tree.find('opErrno').text)
     except _etreeExceptions:
         raise GlusterXMLError(cmd, out)
 
+    _throwIfOpFailed(cmd, rv, errNo, msg)
+    return tree
+
+
+def _throwIfOpFailed(cmd, rv, errNo, msg):
     if rv == 0:
-        return tree
+        return
 
     if errNo != 0:
         rv = errNo
@@ -162,154 +681,399 @@ def _execGlusterXml(cmd):
     raise GlusterCmdFailed(cmd, rv, err=msg)
 
 
-def _getLocalPeerUUID():
-    global _peerUUID
-
-    if _peerUUID:
-        return _peerUUID
-
+class _StreamHead(object):
+    """
+    File-like wrapper remembering the first bytes read from `stream`, to
+    report unparsable replies.
+    """
+    def __init__(self, stream, size=4096):
+        self._stream = stream
+        self._size = size
+        self.head = ''
+        self.bytes = 0
+
+    def read(self, length=-1):
+        data = self._stream.read(length)
+        self.bytes += len(data)
+        if len(self.head) < self._size:
+            self.head += data[:self._size - len(self.head)]
+        return data
+
+
+def _iterGlusterXml(cmd, paths):
+    """
+    Runs cmd with --xml and yields (path, element) for every element found
+    at one of `paths` while the reply is being read.  Yielded elements are
+    removed from the tree once the consumer moves on.
+    """
+    cmd.append('--xml')
+    start = time.time()
+    proc = utils.execCmd(cmd, sync=False)
+    proc.stdin.close()
+    proc.blocking = True
+    stdout = _StreamHead(proc.stdout)
+    depths = set(path.count('/') + 1 for path in paths)
+    op = {}
+    try:
+        try:
+            tags = []
+            parents = []
+            for event, el in xmlparser.iterparse(stdout, ('start', 'end')):
+                if event == 'start':
+                    tags.append(el.tag)
+                    parents.append(el)
+                    continue
+
+                parents.pop()
+                if len(tags) == 2 and el.tag in ('opRet', 'opErrno',
+                                                 'opErrstr'):
+                    op[el.tag] = el.text
+                    if len(op) == 3:
+                        rv = int(op['opRet'])
+                        msg = op['opErrstr'] or ''
+                        _throwIfBusy(cmd, rv, '', msg)
+                        _throwIfOpFailed(cmd, rv, int(op['opErrno']), msg)
+                elif len(tags) - 1 in depths:
+                    path = '/'.join(tags[1:])
+                    if path in paths:
+                        yield path, el
+                        parents[-1].remove(el)
+                tags.pop()
+        except _etreeExceptions:
+            proc.wait()
+            err = "".join(proc.stderr)
+            _throwIfBusy(cmd, proc.returncode, stdout.head, err)
+            raise GlusterXMLError(cmd, stdout.head)
+
+        if len(op) != 3:
+            raise GlusterXMLError(cmd, stdout.head)
+
+        proc.wait()
+        _throwIfBusy(cmd, proc.returncode, '', "".join(proc.stderr))
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            proc.wait()
+        # parsing and the consumer are part of this
+        instrument.add('wall', time.time() - start)
+        instrument.add('outBytes', stdout.bytes)
+
+
+def _cliPeerUUID():
     command = _getGlusterSystemCmd() + ["uuid", "get"]
     rc, out, err = _execGluster(command)
 
     o = out.strip()
     if o.startswith('UUID: '):
-        _peerUUID = o[6:]
+        return o[6:]
+    return ''
+
+
+_identity = identity.LocalIdentity(uuidFallback=_cliPeerUUID)
+
+
+def _getLocalPeerUUID():
+    host = currentRemoteHost()
+    if host is None:
+        return _identity.uuid()
+    if host not in _remotePeerUUIDs:
+        _remotePeerUUIDs[host] = _cliPeerUUID()
+    return _remotePeerUUIDs[host]
+
 
-    return _peerUUID
+_VOL_STATUS_NAME = 'volStatus/volumes/volume/volName'
+_VOL_STATUS_NODE = 'volStatus/volumes/volume/node'
+_volStatusName = xmlparser.Path(_VOL_STATUS_NAME)
+_volStatusNode = xmlparser.Path(_VOL_STATUS_NODE)
+_volStatusVolume = xmlparser.Path('volStatus/volumes/volume')
+_clientsStatusClient = xmlparser.Path('clientsStatus/client')
+_memStatusMallinfo = xmlparser.Path('memStatus/mallinfo')
+_memStatusPool = xmlparser.Path('memStatus/mempool/pool')
 
 
-def _parseVolumeStatus(tree):
-    status = {'name': tree.find('volStatus/volumes/volume/volName').text,
+def _parseVolumeStatusNode(el, hostname, typed=False):
+    value = {}
+
+    for ch in el:
+        value[ch.tag] = ch.text or ''
+
+    if value['path'] == 'localhost':
+        value['path'] = hostname
+
+    if value['status'] == '1':
+        value['status'] = 'ONLINE'
+    else:
+        value['status'] = 'OFFLINE'
+
+    if value['hostname'] == 'NFS Server':
+        if typed:
+            return 'nfs', records.NfsRecord(value['path'], value['peerid'],
+                                            value['port'], value['status'],
+                                            value['pid'])
+        return 'nfs', {'hostname': value['path'],
+                       'hostuuid': value['peerid'],
+                       'port': value['port'],
+                       'status': value['status'],
+                       'pid': value['pid']}
+    elif value['hostname'] == 'Self-heal Daemon':
+        if typed:
+            return 'shd', records.ShdRecord(value['path'], value['peerid'],
+                                            value['status'], value['pid'])
+        return 'shd', {'hostname': value['path'],
+                       'hostuuid': value['peerid'],
+                       'status': value['status'],
+                       'pid': value['pid']}
+    else:
+        brick = '%s:%s' % (value['hostname'], value['path'])
+        if typed:
+            return 'bricks', records.BrickRecord(brick, value['peerid'],
+                                                 value['port'],
+                                                 value['status'],
+                                                 value['pid'])
+        return 'bricks', {'brick': brick,
+                          'hostuuid': value['peerid'],
+                          'port': value['port'],
+                          'status': value['status'],
+                          'pid': value['pid']}
+
+
+def _parseVolumeStatus(tree, typed=False, hostname=None):
+    status = {'name': _volStatusName.find(tree).text,
               'bricks': [],
               'nfs': [],
               'shd': []}
-    hostname = _getLocalPeer()
-    for el in tree.findall('volStatus/volumes/volume/node'):
-        value = {}
-
-        for ch in el.getchildren():
-            value[ch.tag] = ch.text or ''
+    if hostname is None:
+        hostname = _getLocalPeer()
+    for el in _volStatusNode.findall(tree):
+        key, value = _parseVolumeStatusNode(el, hostname, typed)
+        status[key].append(value)
+    return status
 
-        if value['path'] == 'localhost':
-            value['path'] = hostname
 
-        if value['status'] == '1':
-            value['status'] = 'ONLINE'
-        else:
-            value['status'] = 'OFFLINE'
-
-        if value['hostname'] == 'NFS Server':
-            status['nfs'].append({'hostname': value['path'],
-                                  'hostuuid': value['peerid'],
-                                  'port': value['port'],
-                                  'status': value['status'],
-                                  'pid': value['pid']})
-        elif value['hostname'] == 'Self-heal Daemon':
-            status['shd'].append({'hostname': value['path'],
-                                  'hostuuid': value['peerid'],
-                                  'status': value['status'],
-                                  'pid': value['pid']})
-        else:
-            status['bricks'].append({'brick': '%s:%s' % (value['hostname'],
-                                                         value['path']),
-                                     'hostuuid': value['peerid'],
-                                     'port': value['port'],
-                                     'status': value['status'],
-                                     'pid': value['pid']})
+def _parseVolumeStatusDetailNode(el, typed=False):
+    value = {}
+
+    for ch in el:
+        value[ch.tag] = ch.text or ''
+
+    sizeTotal = int(value['sizeTotal'])
+    value['sizeTotal'] = sizeTotal / (1024.0 * 1024.0)
+    sizeFree = int(value['sizeFree'])
+    value['sizeFree'] = sizeFree / (1024.0 * 1024.0)
+    brick = '%s:%s' % (value['hostname'], value['path'])
+    if typed:
+        return records.BrickDetailRecord(brick, value['peerid'],
+                                         value['sizeTotal'],
+                                         value['sizeFree'], value['device'],
+                                         value['blockSize'],
+                                         value['mntOptions'],
+                                         value['fsName'])
+    return {'brick': brick,
+            'hostuuid': value['peerid'],
+            'sizeTotal': '%.3f' % (value['sizeTotal'],),
+            'sizeFree': '%.3f' % (value['sizeFree'],),
+            'device': value['device'],
+            'blockSize': value['blockSize'],
+            'mntOptions': value['mntOptions'],
+            'fsName': value['fsName']}
+
+
+def _parseVolumeStatusDetail(tree, typed=False):
+    status = {'name': _volStatusName.find(tree).text,
+              'bricks': []}
+    for el in _volStatusNode.findall(tree):
+        status['bricks'].append(_parseVolumeStatusDetailNode(el, typed))
     return status
 
 
-def _parseVolumeStatusDetail(tree):
-    status = {'name': tree.find('volStatus/volumes/volume/volName').text,
+def _parseVolumeStatusClientsNode(el, typed=False):
+    hostname = el.find('hostname').text
+    path = el.find('path').text
+    hostuuid = el.find('peerid').text
+
+    clientsStatus = []
+    for c in _clientsStatusClient.findall(el):
+        clientValue = {}
+        for ch in c:
+            clientValue[ch.tag] = ch.text or ''
+        if typed:
+            clientsStatus.append(records.ClientRecord(
+                clientValue['hostname'], clientValue['bytesRead'],
+                clientValue['bytesWrite']))
+            continue
+        clientsStatus.append({'hostname': clientValue['hostname'],
+                              'bytesRead': clientValue['bytesRead'],
+                              'bytesWrite': clientValue['bytesWrite']})
+
+    if typed:
+        return records.BrickClientsRecord('%s:%s' % (hostname, path),
+                                          hostuuid, clientsStatus)
+    return {'brick': '%s:%s' % (hostname, path),
+            'hostuuid': hostuuid,
+            'clientsStatus': clientsStatus}
+
+
+def _parseVolumeStatusClients(tree, typed=False):
+    status = {'name': _volStatusName.find(tree).text,
               'bricks': []}
-    for el in tree.findall('volStatus/volumes/volume/node'):
-        value = {}
-
-        for ch in el.getchildren():
-            value[ch.tag] = ch.text or ''
-
-        sizeTotal = int(value['sizeTotal'])
-        value['sizeTotal'] = sizeTotal / (1024.0 * 1024.0)
-        sizeFree = int(value['sizeFree'])
-        value['sizeFree'] = sizeFree / (1024.0 * 1024.0)
-        status['bricks'].append({'brick': '%s:%s' % (value['hostname'],
-                                                     value['path']),
-                                 'hostuuid': value['peerid'],
-                                 'sizeTotal': '%.3f' % (value['sizeTotal'],),
-                                 'sizeFree': '%.3f' % (value['sizeFree'],),
-                                 'device': value['device'],
-                                 'blockSize': value['blockSize'],
-                                 'mntOptions': value['mntOptions'],
-                                 'fsName': value['fsName']})
+    for el in _volStatusNode.findall(tree):
+        status['bricks'].append(_parseVolumeStatusClientsNode(el, typed))
     return status
 
 
-def _parseVolumeStatusClients(tree):
-    status = {'name': tree.find('volStatus/volumes/volume/volName').text,
+def _parseVolumeStatusMemNode(el, typed=False):
+    brick = {'brick': '%s:%s' % (el.find('hostname').text,
+                                 el.find('path').text),
+             'hostuuid': el.find('peerid').text,
+             'mallinfo': {},
+             'mempool': []}
+
+    for ch in _memStatusMallinfo.find(el):
+        brick['mallinfo'][ch.tag] = ch.text or ''
+
+    for c in _memStatusPool.findall(el):
+        mempool = {}
+        for ch in c:
+            mempool[ch.tag] = ch.text or ''
+        if typed:
+            # newer glusterfs may add tags the record has no slot for
+            mempool = records.MemPoolRecord(**dict(
+                (k, v) for k, v in mempool.items()
+                if k in records.MemPoolRecord.__slots__))
+        brick['mempool'].append(mempool)
+
+    if typed:
+        return records.BrickMemRecord(**brick)
+    return brick
+
+
+def _parseVolumeStatusMem(tree, typed=False):
+    status = {'name': _volStatusName.find(tree).text,
               'bricks': []}
-    for el in tree.findall('volStatus/volumes/volume/node'):
-        hostname = el.find('hostname').text
-        path = el.find('path').text
-        hostuuid = el.find('peerid').text
-
-        clientsStatus = []
-        for c in el.findall('clientsStatus/client'):
-            clientValue = {}
-            for ch in c.getchildren():
-                clientValue[ch.tag] = ch.text or ''
-            clientsStatus.append({'hostname': clientValue['hostname'],
-                                  'bytesRead': clientValue['bytesRead'],
-                                  'bytesWrite': clientValue['bytesWrite']})
-
-        status['bricks'].append({'brick': '%s:%s' % (hostname, path),
-                                 'hostuuid': hostuuid,
-                                 'clientsStatus': clientsStatus})
+    for el in _volStatusNode.findall(tree):
+        status['bricks'].append(_parseVolumeStatusMemNode(el, typed))
     return status
 
 
-def _parseVolumeStatusMem(tree):
-    status = {'name': tree.find('volStatus/volumes/volume/volName').text,
-              'bricks': []}
-    for el in tree.findall('volStatus/volumes/volume/node'):
-        brick = {'brick': '%s:%s' % (el.find('hostname').text,
-                                     el.find('path').text),
-                 'hostuuid': el.find('peerid').text,
-                 'mallinfo': {},
-                 'mempool': []}
-
-        for ch in el.find('memStatus/mallinfo').getchildren():
-            brick['mallinfo'][ch.tag] = ch.text or ''
-
-        for c in el.findall('memStatus/mempool/pool'):
-            mempool = {}
-            for ch in c.getchildren():
-                mempool[ch.tag] = ch.text or ''
-            brick['mempool'].append(mempool)
-
-        status['bricks'].append(brick)
+_volumeStatusNodeParsers = {'detail': _parseVolumeStatusDetailNode,
+                            'clients': _parseVolumeStatusClientsNode,
+                            'mem': _parseVolumeStatusMemNode}
+
+
+def _isTyped(format):
+    if format not in (ResultFormat.DICT, ResultFormat.TYPED):
+        raise ValueError("unsupported result format: %s" % format)
+    return format == ResultFormat.TYPED
+
+
+def _streamVolumeStatus(command, option, typed):
+    parseNode = _volumeStatusNodeParsers.get(option)
+    if parseNode is None:
+        status = {'name': None, 'bricks': [], 'nfs': [], 'shd': []}
+        hostname = _getLocalPeer()
+    else:
+        status = {'name': None, 'bricks': []}
+
+    for path, el in _iterGlusterXml(command, (_VOL_STATUS_NAME,
+                                              _VOL_STATUS_NODE)):
+        try:
+            if path == _VOL_STATUS_NAME:
+                status['name'] = el.text
+            elif parseNode is None:
+                key, value = _parseVolumeStatusNode(el, hostname, typed)
+                status[key].append(value)
+            else:
+                status['bricks'].append(parseNode(el, typed))
+        except _etreeExceptions:
+            raise GlusterXMLError(command, xmlparser.tostring(el))
+
+    if status['name'] is None:
+        raise GlusterXMLError(command, '')
     return status
 
 
-def volumeStatus(volumeName, brick=None, option=None):
+def _iterVolumeStatusNodes(volumeName, brick, option, format):
+    typed = _isTyped(format)
+    command = _getGlusterVolCmd() + ["status", volumeName]
+    if brick:
+        command.append(brick)
+    command.append(option)
+
+    parseNode = _volumeStatusNodeParsers[option]
+    for path, el in _iterGlusterXml(command, (_VOL_STATUS_NODE,)):
+        try:
+            value = parseNode(el, typed)
+        except _etreeExceptions:
+            raise GlusterXMLError(command, xmlparser.tostring(el))
+        yield value
+
+
+def iterVolumeStatusDetail(volumeName, brick=None, format=None):
+    """
+    Yields the bricks of volumeStatus(volumeName, brick, 'detail') one by
+    one while the reply is being parsed.  Closing the iterator early stops
+    the gluster command.
+    """
+    return _iterVolumeStatusNodes(volumeName, brick, 'detail',
+                                  format or ResultFormat.DICT)
+
+
+def iterVolumeStatusClients(volumeName, brick=None, format=None):
+    return _iterVolumeStatusNodes(volumeName, brick, 'clients',
+                                  format or ResultFormat.DICT)
+
+
+def iterVolumeStatusMem(volumeName, brick=None, format=None):
+    return _iterVolumeStatusNodes(volumeName, brick, 'mem',
+                                  format or ResultFormat.DICT)
+
+
+@instrument.instrumented
+def volumeStatus(volumeName, brick=None, option=None, stream=False,
+                 format=None):
+    """
+    With `stream` the XML reply is parsed while gluster is still writing
+    it and every brick is dropped from the tree once it has been
+    converted, so memory use stays flat with the number of bricks.
+
+    `format` selects how bricks are returned, see ResultFormat.
+    """
+    typed = _isTyped(format or ResultFormat.DICT)
     command = _getGlusterVolCmd() + ["status", volumeName]
     if brick:
         command.append(brick)
     if option:
         command.append(option)
 
+    if stream:
+        return _streamVolumeStatus(command, option, typed)
+
     xmltree = _execGlusterXml(command)
 
     try:
         if option == 'detail':
-            return _parseVolumeStatusDetail(xmltree)
+            return _parseVolumeStatusDetail(xmltree, typed)
         elif option == 'clients':
-            return _parseVolumeStatusClients(xmltree)
+            return _parseVolumeStatusClients(xmltree, typed)
         elif option == 'mem':
-            return _parseVolumeStatusMem(xmltree)
+            return _parseVolumeStatusMem(xmltree, typed)
         else:
-            return _parseVolumeStatus(xmltree)
+            return _parseVolumeStatus(xmltree, typed)
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
+
+
+def volumeStatusMany(volumeNames, brick=None, option=None, maxWorkers=8,
+                     timeout=None, format=None):
+    """
+    Runs volumeStatus() for all the given volumes concurrently and returns
+    a dict mapping each volume name to its status, or to the exception
+    raised for it.
+    """
+    return utils.execConcurrently(
+        _withCallerContext(lambda volumeName: volumeStatus(
+            volumeName, brick, option, format=format)),
+        volumeNames, maxWorkers, timeout)
 
 
 def _parseVolumeInfo(tree):
@@ -356,76 +1120,234 @@ def _parseVolumeInfo(tree):
     return volumes
 
 
-def _parseVolumeProfileInfo(tree, nfs):
-    bricks = []
+# cli_vol_type_str, the distributed ones are offset by GF_CLUSTER_TYPE_MAX - 1
+_VOLUME_TYPES = ('DISTRIBUTE', 'STRIPE', 'REPLICATE', 'STRIPED_REPLICATE',
+                 'DISPERSE', 'TIER', 'DISTRIBUTED_STRIPE',
+                 'DISTRIBUTED_REPLICATE', 'DISTRIBUTED_STRIPED_REPLICATE',
+                 'DISTRIBUTED_DISPERSE')
+_GLUSTERD_STATUS_STARTED = '1'
+
+
+def _volumeInfoFromDict(values):
+    """
+    Returns the _parseVolumeInfo() result of a glusterd get-volume dict.
+    The keys are the ones glusterd_add_volume_detail_to_dict() and
+    _build_option_key() set in the glusterfs 3.4 to 3.7 sources, an
+    option `name` being volumeN.option.name; not checked against a
+    running glusterd of every release.
+    """
+    options = {}
+    for key, optionValue in values.items():
+        volumeKey, sep, name = key.partition('.option.')
+        if sep:
+            options.setdefault(volumeKey, {})[name] = optionValue
+    volumes = {}
+    for i in range(int(values.get('count', 0))):
+        prefix = 'volume%d.' % i
+
+        def get(key):
+            return values[prefix + key]
+
+        value = {}
+        value['volumeName'] = get('name')
+        value['uuid'] = get('volume_id')
+        volumeType = int(get('type'))
+        if volumeType > 0 and int(get('dist_count')) < int(
+                get('brick_count')):
+            volumeType += 5
+        value['volumeType'] = _VOLUME_TYPES[volumeType]
+        if get('status') == _GLUSTERD_STATUS_STARTED:
+            value["volumeStatus"] = VolumeStatus.ONLINE
+        else:
+            value["volumeStatus"] = VolumeStatus.OFFLINE
+        value['brickCount'] = get('brick_count')
+        value['distCount'] = get('dist_count')
+        value['stripeCount'] = get('stripe_count')
+        value['replicaCount'] = get('replica_count')
+        transportType = get('transport')
+        if transportType == '0':
+            value['transportType'] = [TransportType.TCP]
+        elif transportType == '1':
+            value['transportType'] = [TransportType.RDMA]
+        else:
+            value['transportType'] = [TransportType.TCP, TransportType.RDMA]
+        value['bricks'] = []
+        value['options'] = options.get('volume%d' % i, {})
+        value['bricksInfo'] = []
+        for b in range(1, int(value['brickCount']) + 1):
+            brick = get('brick%d' % b)
+            value['bricks'].append(brick)
+            hostUuid = values.get(prefix + 'brick%d.uuid' % b)
+            # like the XML reply without uuids, see _parseVolumeInfo()
+            if hostUuid is not None and \
+                    len(value['bricksInfo']) == b - 1:
+                value['bricksInfo'].append({'name': brick,
+                                            'hostUuid': hostUuid})
+        if len(value['options']) != int(values.get(prefix + 'opt_count',
+                                                   0)):
+            raise ValueError("%sopt_count does not match the options" %
+                             prefix)
+        volumes[value['volumeName']] = value
+    return volumes
+
+
+_VOL_PROFILE_NAME = 'volProfile/volname'
+_VOL_PROFILE_BRICK = 'volProfile/brick'
+_volProfileName = xmlparser.Path(_VOL_PROFILE_NAME)
+_volProfileBrick = xmlparser.Path(_VOL_PROFILE_BRICK)
+_profileBlock = xmlparser.Path('blockStats/block')
+_profileFop = xmlparser.Path('fopStats/fop')
+
+
+def _getProfileKeys(nfs):
     if nfs:
-        brickKey = 'nfs'
-        bricksKey = 'nfsServers'
+        return 'nfs', 'nfsServers'
     else:
-        brickKey = 'brick'
-        bricksKey = 'bricks'
-    for brick in tree.findall('volProfile/brick'):
-        fopCumulative = []
-        blkCumulative = []
-        fopInterval = []
-        blkInterval = []
-        brickName = brick.find('brickName').text
-        if brickName == 'localhost':
-            brickName = _getLocalPeer()
-        for block in brick.findall('cumulativeStats/blockStats/block'):
-            blkCumulative.append({'size': block.find('size').text,
-                                  'read': block.find('reads').text,
-                                  'write': block.find('writes').text})
-        for fop in brick.findall('cumulativeStats/fopStats/fop'):
-            fopCumulative.append({'name': fop.find('name').text,
-                                  'hits': fop.find('hits').text,
-                                  'latencyAvg': fop.find('avgLatency').text,
-                                  'latencyMin': fop.find('minLatency').text,
-                                  'latencyMax': fop.find('maxLatency').text})
-        for block in brick.findall('intervalStats/blockStats/block'):
-            blkInterval.append({'size': block.find('size').text,
-                                'read': block.find('reads').text,
-                                'write': block.find('writes').text})
-        for fop in brick.findall('intervalStats/fopStats/fop'):
-            fopInterval.append({'name': fop.find('name').text,
-                                'hits': fop.find('hits').text,
-                                'latencyAvg': fop.find('avgLatency').text,
-                                'latencyMin': fop.find('minLatency').text,
-                                'latencyMax': fop.find('maxLatency').text})
-        bricks.append(
-            {brickKey: brickName,
-             'cumulativeStats': {
-                 'blockStats': blkCumulative,
-                 'fopStats': fopCumulative,
-                 'duration': brick.find('cumulativeStats/duration').text,
-                 'totalRead': brick.find('cumulativeStats/totalRead').text,
-                 'totalWrite': brick.find('cumulativeStats/totalWrite').text},
-             'intervalStats': {
-                 'blockStats': blkInterval,
-                 'fopStats': fopInterval,
-                 'duration': brick.find('intervalStats/duration').text,
-                 'totalRead': brick.find('intervalStats/totalRead').text,
-                 'totalWrite': brick.find('intervalStats/totalWrite').text}})
-    status = {'volumeName': tree.find("volProfile/volname").text,
+        return 'brick', 'bricks'
+
+
+def _parseVolumeProfileStats(stats, typed):
+    blkStats = []
+    fopStats = []
+    for block in _profileBlock.findall(stats):
+        value = xmlparser.childTexts(block)
+        if typed:
+            blkStats.append(records.BlockStatRecord(
+                value['size'], value['reads'], value['writes']))
+            continue
+        blkStats.append({'size': value['size'],
+                         'read': value['reads'],
+                         'write': value['writes']})
+    for fop in _profileFop.findall(stats):
+        value = xmlparser.childTexts(fop)
+        if typed:
+            fopStats.append(records.FopStatRecord(
+                value['name'], value['hits'], value['avgLatency'],
+                value['minLatency'], value['maxLatency']))
+            continue
+        fopStats.append({'name': value['name'],
+                         'hits': value['hits'],
+                         'latencyAvg': value['avgLatency'],
+                         'latencyMin': value['minLatency'],
+                         'latencyMax': value['maxLatency']})
+    value = xmlparser.childTexts(stats)
+    if typed:
+        return records.ProfileStatsRecord(blkStats, fopStats,
+                                          value['duration'],
+                                          value['totalRead'],
+                                          value['totalWrite'])
+    return {'blockStats': blkStats,
+            'fopStats': fopStats,
+            'duration': value['duration'],
+            'totalRead': value['totalRead'],
+            'totalWrite': value['totalWrite']}
+
+
+def _parseVolumeProfileBrick(brick, brickKey, typed=False):
+    brickName = brick.find('brickName').text
+    if brickName == 'localhost':
+        brickName = _getLocalPeer()
+    cumulativeStats = _parseVolumeProfileStats(
+        brick.find('cumulativeStats'), typed)
+    # profile info cumulative has no interval stats
+    interval = brick.find('intervalStats')
+    intervalStats = None
+    if interval is not None:
+        intervalStats = _parseVolumeProfileStats(interval, typed)
+    if typed:
+        if brickKey == 'nfs':
+            return records.NfsProfileRecord(brickName, cumulativeStats,
+                                            intervalStats)
+        return records.BrickProfileRecord(brickName, cumulativeStats,
+                                          intervalStats)
+    return {brickKey: brickName,
+            'cumulativeStats': cumulativeStats,
+            'intervalStats': intervalStats}
+
+
+def _parseVolumeProfileInfo(tree, nfs, typed=False):
+    brickKey, bricksKey = _getProfileKeys(nfs)
+    bricks = []
+    for brick in _volProfileBrick.findall(tree):
+        bricks.append(_parseVolumeProfileBrick(brick, brickKey, typed))
+    status = {'volumeName': _volProfileName.find(tree).text,
               bricksKey: bricks}
     return status
 
 
-def volumeInfo(volumeName=None, remoteServer=None):
+def _streamVolumeProfileInfo(command, nfs, typed):
+    brickKey, bricksKey = _getProfileKeys(nfs)
+    status = {'volumeName': None, bricksKey: []}
+
+    for path, el in _iterGlusterXml(command, (_VOL_PROFILE_NAME,
+                                              _VOL_PROFILE_BRICK)):
+        try:
+            if path == _VOL_PROFILE_NAME:
+                status['volumeName'] = el.text
+            else:
+                status[bricksKey].append(
+                    _parseVolumeProfileBrick(el, brickKey, typed))
+        except _etreeExceptions:
+            raise GlusterXMLError(command, xmlparser.tostring(el))
+
+    if status['volumeName'] is None:
+        raise GlusterXMLError(command, '')
+    return status
+
+
+def _volumeInfo(volumeName):
     command = _getGlusterVolCmd() + ["info"]
-    if remoteServer:
-        command += ['--remote-host=%s' % remoteServer]
     if volumeName:
         command.append(volumeName)
 
+    # the glusterd backend only talks to the local glusterd
+    if _glusterdClient is not None and currentRemoteHost() is None:
+        values = _execGlusterd(
+            command, lambda client: client.getVolume(volumeName))
+        if values is not None:
+            try:
+                return _volumeInfoFromDict(values)
+            except (KeyError, ValueError, IndexError) as e:
+                logger.warn("unexpected glusterd reply, running %s with the "
+                            "CLI: %r", command, e)
+
     xmltree = _execGlusterXml(command)
 
     try:
         return _parseVolumeInfo(xmltree)
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
+
+
+@instrument.instrumented
+@_cached
+def volumeInfo(volumeName=None, remoteServer=None):
+    if remoteServer:
+        with remoteHost(remoteServer):
+            return _volumeInfo(volumeName)
+    return _volumeInfo(volumeName)
+
+
+def volumeTopology(volumeName=None, index=None):
+    """
+    Returns a topology.Topology of volumeInfo(volumeName).  When an existing
+    `index` is given it is updated in place instead: only the queried
+    volume is re-indexed (and dropped when it no longer exists), or every
+    volume when volumeName is None.
+    """
+    volumes = volumeInfo(volumeName)
+    if index is None:
+        return topology.Topology(volumes)
+    if volumeName is None:
+        index.replace(volumes)
+    elif volumes:
+        index.update(volumes)
+    else:
+        index.remove(volumeName)
+    return index
 
 
+@_invalidates('volumeInfo')
 def volumeCreate(volumeName, brickList, replicaCount=0, stripeCount=0,
                  transportList=[], force=False):
     command = _getGlusterVolCmd() + ["create", volumeName]
@@ -445,9 +1367,10 @@ def volumeCreate(volumeName, brickList, replicaCount=0, stripeCount=0,
     try:
         return {'uuid': xmltree.find('volCreate/volume/id').text}
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
+@_invalidates('volumeInfo')
 def volumeStart(volumeName, force=False):
     command = _getGlusterVolCmd() + ["start", volumeName]
     if force:
@@ -457,6 +1380,7 @@ def volumeStart(volumeName, force=False):
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeStop(volumeName, force=False):
     command = _getGlusterVolCmd() + ["stop", volumeName]
     if force:
@@ -466,6 +1390,7 @@ def volumeStop(volumeName, force=False):
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeDelete(volumeName):
     command = _getGlusterVolCmd() + ["delete", volumeName]
 
@@ -473,6 +1398,7 @@ def volumeDelete(volumeName):
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeSet(volumeName, option, value):
     command = _getGlusterVolCmd() + ["set", volumeName, option, value]
 
@@ -480,22 +1406,90 @@ def volumeSet(volumeName, option, value):
     return True
 
 
+_BOOLEAN_VALUES = {'on': 'on', 'yes': 'on', 'true': 'on', 'enable': 'on',
+                   'off': 'off', 'no': 'off', 'false': 'off',
+                   'disable': 'off'}
+
+
+def _optionValue(value):
+    # only the boolean spellings are equivalent, any other value is
+    # compared as is
+    value = str(value)
+    return _BOOLEAN_VALUES.get(value.lower(), value)
+
+
+def _volumeOptions(volumeName):
+    # not through the cache, a stale entry would hide a needed change
+    command = _getGlusterVolCmd() + ["info", volumeName]
+    xmltree = _execGlusterXml(command)
+    try:
+        volumes = _parseVolumeInfo(xmltree)
+    except _etreeExceptions:
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
+    return volumes[volumeName]['options']
+
+
+@_invalidates('volumeInfo')
+def volumeSetMany(volumeName, options):
+    """
+    Sets the {option: value} of `options` which differ from the current
+    values of the volume in a single volume set transaction.  Boolean
+    spellings (on/yes/true/enable and off/no/false/disable, in any case)
+    are considered equal, other values only when identical.  Returns the
+    applied changes as {option: (oldValue, newValue)}, oldValue being None
+    for options which were not set.
+    """
+    current = _volumeOptions(volumeName)
+    changes = {}
+    for option, value in sorted(options.items()):
+        old = current.get(option)
+        if old is not None and _optionValue(old) == _optionValue(value):
+            continue
+        changes[option] = (old, str(value))
+    if not changes:
+        return changes
+
+    command = _getGlusterVolCmd() + ["set", volumeName]
+    for option, (old, value) in sorted(changes.items()):
+        command += [option, value]
+    _execGlusterXml(command)
+    return changes
+
+
+def volumeApplyProfile(volumeNames, options, maxWorkers=4, timeout=None):
+    """
+    Runs volumeSetMany(volumeName, options) for all the given volumes, at
+    most `maxWorkers` at a time, and returns a dict mapping each volume to
+    its changes or to the exception raised for it.  glusterd runs one
+    transaction at a time, combine with enableBusyRetry() or enableBroker()
+    when maxWorkers is more than 1.
+    """
+    def apply(volumeName):
+        return volumeSetMany(volumeName, options)
+
+    return utils.execConcurrently(_withCallerContext(apply), volumeNames,
+                                  maxWorkers, timeout)
+
+
 def _parseVolumeSetHelpXml(out):
     optionList = []
-    tree = etree.fromstring(out)
+    tree = xmlparser.fromstring(out)
     for el in tree.findall('option'):
         option = {}
-        for ch in el.getchildren():
+        for ch in el:
             option[ch.tag] = ch.text or ''
         optionList.append(option)
     return optionList
 
 
+@instrument.instrumented
+@_cached
 def volumeSetHelpXml():
     rc, out, err = _execGluster(_getGlusterVolCmd() + ["set", 'help-xml'])
     return _parseVolumeSetHelpXml(out)
 
 
+@_invalidates('volumeInfo')
 def volumeReset(volumeName, option='', force=False):
     command = _getGlusterVolCmd() + ['reset', volumeName]
     if option:
@@ -507,6 +1501,7 @@ def volumeReset(volumeName, option='', force=False):
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeBrickAdd(volumeName, brickList,
                    replicaCount=0, stripeCount=0, force=False):
     command = _getGlusterVolCmd() + ["add-brick", volumeName]
@@ -522,6 +1517,7 @@ def volumeBrickAdd(volumeName, brickList,
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeRebalanceStart(volumeName, rebalanceType="", force=False):
     command = _getGlusterVolCmd() + ["rebalance", volumeName]
     if rebalanceType:
@@ -535,9 +1531,10 @@ def volumeRebalanceStart(volumeName, rebalanceType="", force=False):
     try:
         return {'taskId': xmltree.find('volRebalance/task-id').text}
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
+@_invalidates('volumeInfo')
 def volumeRebalanceStop(volumeName, force=False):
     command = _getGlusterVolCmd() + ["rebalance", volumeName, "stop"]
     if force:
@@ -548,7 +1545,7 @@ def volumeRebalanceStop(volumeName, force=False):
     try:
         return _parseVolumeRebalanceRemoveBrickStatus(xmltree, 'rebalance')
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
 def _parseVolumeRebalanceRemoveBrickStatus(xmltree, mode):
@@ -588,6 +1585,7 @@ def _parseVolumeRebalanceRemoveBrickStatus(xmltree, mode):
     return status
 
 
+@instrument.instrumented
 def volumeRebalanceStatus(volumeName):
     command = _getGlusterVolCmd() + ["rebalance", volumeName, "status"]
 
@@ -596,9 +1594,15 @@ def volumeRebalanceStatus(volumeName):
     try:
         return _parseVolumeRebalanceRemoveBrickStatus(xmltree, 'rebalance')
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
+
 
+def volumeRebalanceStatusMany(volumeNames, maxWorkers=8, timeout=None):
+    return utils.execConcurrently(_withCallerContext(volumeRebalanceStatus),
+                                  volumeNames, maxWorkers, timeout)
 
+
+@_invalidates('volumeInfo')
 def volumeReplaceBrickStart(volumeName, existingBrick, newBrick):
     command = _getGlusterVolCmd() + ["replace-brick", volumeName,
                                      existingBrick, newBrick, "start"]
@@ -608,9 +1612,10 @@ def volumeReplaceBrickStart(volumeName, existingBrick, newBrick):
     try:
         return {'taskId': xmltree.find('volReplaceBrick/task-id').text}
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
+@_invalidates('volumeInfo')
 def volumeReplaceBrickAbort(volumeName, existingBrick, newBrick):
     command = _getGlusterVolCmd() + ["replace-brick", volumeName,
                                      existingBrick, newBrick, "abort"]
@@ -619,6 +1624,7 @@ def volumeReplaceBrickAbort(volumeName, existingBrick, newBrick):
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeReplaceBrickPause(volumeName, existingBrick, newBrick):
     command = _getGlusterVolCmd() + ["replace-brick", volumeName,
                                      existingBrick, newBrick, "pause"]
@@ -627,6 +1633,7 @@ def volumeReplaceBrickPause(volumeName, existingBrick, newBrick):
     return True
 
 
+@instrument.instrumented
 def volumeReplaceBrickStatus(volumeName, existingBrick, newBrick):
     rc, out, err = _execGluster(_getGlusterVolCmd() + ["replace-brick",
                                                        volumeName,
@@ -647,6 +1654,7 @@ def volumeReplaceBrickStatus(volumeName, existingBrick, newBrick):
         return BrickStatus.NA, message
 
 
+@_invalidates('volumeInfo')
 def volumeReplaceBrickCommit(volumeName, existingBrick, newBrick,
                              force=False):
     command = _getGlusterVolCmd() + ["replace-brick", volumeName,
@@ -658,6 +1666,7 @@ def volumeReplaceBrickCommit(volumeName, existingBrick, newBrick,
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeBrickRemoveStart(volumeName, brickList, replicaCount=0):
     command = _getGlusterVolCmd() + ["remove-brick", volumeName]
     if replicaCount:
@@ -669,9 +1678,10 @@ def volumeBrickRemoveStart(volumeName, brickList, replicaCount=0):
     try:
         return {'taskId': xmltree.find('volRemoveBrick/task-id').text}
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
+@_invalidates('volumeInfo')
 def volumeBrickRemoveStop(volumeName, brickList, replicaCount=0):
     command = _getGlusterVolCmd() + ["remove-brick", volumeName]
     if replicaCount:
@@ -683,9 +1693,10 @@ def volumeBrickRemoveStop(volumeName, brickList, replicaCount=0):
     try:
         return _parseVolumeRebalanceRemoveBrickStatus(xmltree, 'remove-brick')
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
+@instrument.instrumented
 def volumeBrickRemoveStatus(volumeName, brickList, replicaCount=0):
     command = _getGlusterVolCmd() + ["remove-brick", volumeName]
     if replicaCount:
@@ -697,9 +1708,10 @@ def volumeBrickRemoveStatus(volumeName, brickList, replicaCount=0):
     try:
         return _parseVolumeRebalanceRemoveBrickStatus(xmltree, 'remove-brick')
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
+@_invalidates('volumeInfo')
 def volumeBrickRemoveCommit(volumeName, brickList, replicaCount=0):
     command = _getGlusterVolCmd() + ["remove-brick", volumeName]
     if replicaCount:
@@ -710,6 +1722,7 @@ def volumeBrickRemoveCommit(volumeName, brickList, replicaCount=0):
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeBrickRemoveForce(volumeName, brickList, replicaCount=0):
     command = _getGlusterVolCmd() + ["remove-brick", volumeName]
     if replicaCount:
@@ -720,6 +1733,7 @@ def volumeBrickRemoveForce(volumeName, brickList, replicaCount=0):
     return True
 
 
+@_invalidates('peerStatus')
 def peerProbe(hostName):
     command = _getGlusterPeerCmd() + ["probe", hostName]
 
@@ -727,6 +1741,7 @@ def peerProbe(hostName):
     return True
 
 
+@_invalidates('peerStatus')
 def peerDetach(hostName, force=False):
     command = _getGlusterPeerCmd() + ["detach", hostName]
     if force:
@@ -760,9 +1775,49 @@ def _parsePeerStatus(tree, gHostName, gUuid, gStatus):
     return hostList
 
 
+_GLUSTERD_FRIEND_BEFRIENDED = '3'
+
+
+def _peerStatusFromDict(values, gHostName, gUuid, gStatus):
+    """
+    Returns the _parsePeerStatus() result of a glusterd friend list dict
+    """
+    hostList = [{'hostname': gHostName,
+                 'uuid': gUuid,
+                 'status': gStatus}]
+
+    for i in range(1, int(values.get('count', 0)) + 1):
+        prefix = 'friend%d.' % i
+        if values[prefix + 'stateId'] != _GLUSTERD_FRIEND_BEFRIENDED:
+            status = HostStatus.UNKNOWN
+        elif values[prefix + 'connected'] == '1':
+            status = HostStatus.CONNECTED
+        else:
+            status = HostStatus.DISCONNECTED
+        hostList.append({'hostname': values[prefix + 'hostname'],
+                         'uuid': values[prefix + 'uuid'],
+                         'status': status})
+
+    return hostList
+
+
+@instrument.instrumented
+@_cached
 def peerStatus():
     command = _getGlusterPeerCmd() + ["status"]
 
+    if _glusterdClient is not None and currentRemoteHost() is None:
+        values = _execGlusterd(command,
+                               lambda client: client.listFriends())
+        if values is not None:
+            try:
+                return _peerStatusFromDict(values, _getLocalPeer(),
+                                           _getLocalPeerUUID(),
+                                           HostStatus.CONNECTED)
+            except (KeyError, ValueError) as e:
+                logger.warn("unexpected glusterd reply, running %s with the "
+                            "CLI: %r", command, e)
+
     xmltree = _execGlusterXml(command)
 
     try:
@@ -770,9 +1825,12 @@ def peerStatus():
                                 _getLocalPeer(),
                                 _getLocalPeerUUID(), HostStatus.CONNECTED)
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
+# profile start and stop set diagnostics.latency-measurement and
+# diagnostics.count-fop-hits
+@_invalidates('volumeInfo')
 def volumeProfileStart(volumeName):
     command = _getGlusterVolCmd() + ["profile", volumeName, "start"]
 
@@ -780,6 +1838,7 @@ def volumeProfileStart(volumeName):
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeProfileStop(volumeName):
     command = _getGlusterVolCmd() + ["profile", volumeName, "stop"]
 
@@ -787,17 +1846,68 @@ def volumeProfileStop(volumeName):
     return True
 
 
-def volumeProfileInfo(volumeName, nfs=False):
+@instrument.instrumented
+def volumeProfileInfo(volumeName, nfs=False, stream=False, format=None,
+                      cumulative=False):
+    """
+    With `cumulative` only the cumulative stats are read and the interval
+    stats, which every plain profile info resets, are left alone; the
+    intervalStats of the bricks are None then.
+    """
+    if format == ResultFormat.COLUMNAR:
+        # columnar imports numpy, which takes longer than glustercli
+        import columnar
+
+        status = volumeProfileInfo(volumeName, nfs, stream,
+                                   ResultFormat.TYPED, cumulative)
+        brickKey, bricksKey = _getProfileKeys(nfs)
+        return columnar.profileColumns(status['volumeName'],
+                                       status[bricksKey])
+
+    typed = _isTyped(format or ResultFormat.DICT)
     command = _getGlusterVolCmd() + ["profile", volumeName, "info"]
+    if cumulative:
+        command += ["cumulative"]
     if nfs:
         command += ["nfs"]
 
+    if stream:
+        return _streamVolumeProfileInfo(command, nfs, typed)
+
     xmltree = _execGlusterXml(command)
 
     try:
-        return _parseVolumeProfileInfo(xmltree, nfs)
+        return _parseVolumeProfileInfo(xmltree, nfs, typed)
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
+
+
+def iterProfileBricks(volumeName, nfs=False, format=None):
+    """
+    Yields the bricks (or nfs servers) of volumeProfileInfo() one by one
+    while the reply is being parsed.  Closing the iterator early stops the
+    gluster command.
+    """
+    typed = _isTyped(format or ResultFormat.DICT)
+    command = _getGlusterVolCmd() + ["profile", volumeName, "info"]
+    if nfs:
+        command += ["nfs"]
+
+    brickKey, bricksKey = _getProfileKeys(nfs)
+    for path, el in _iterGlusterXml(command, (_VOL_PROFILE_BRICK,)):
+        try:
+            value = _parseVolumeProfileBrick(el, brickKey, typed)
+        except _etreeExceptions:
+            raise GlusterXMLError(command, xmlparser.tostring(el))
+        yield value
+
+
+def volumeProfileInfoMany(volumeNames, nfs=False, maxWorkers=8,
+                          timeout=None, format=None):
+    return utils.execConcurrently(
+        _withCallerContext(lambda volumeName: volumeProfileInfo(
+            volumeName, nfs, format=format)),
+        volumeNames, maxWorkers, timeout)
 
 
 def _parseVolumeTasks(tree):
@@ -829,6 +1939,7 @@ def _parseVolumeTasks(tree):
     return tasks
 
 
+@instrument.instrumented
 def volumeTasks(volumeName="all"):
     command = _getGlusterVolCmd() + ["status", volumeName, "tasks"]
 
@@ -836,9 +1947,142 @@ def volumeTasks(volumeName="all"):
     try:
         return _parseVolumeTasks(xmltree)
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
+
 
+def _parseVolumeStatusAll(tree, typed=False):
+    hostname = _getLocalPeer()
+    volumes = {}
+    for vol in _volStatusVolume.findall(tree):
+        status = {'name': vol.find('volName').text,
+                  'bricks': [],
+                  'nfs': [],
+                  'shd': []}
+        for el in vol.findall('node'):
+            key, value = _parseVolumeStatusNode(el, hostname, typed)
+            status[key].append(value)
+        volumes[status['name']] = status
+    return volumes
+
+
+def _parseVolumeStatusDetailAll(tree, typed=False):
+    volumes = {}
+    for vol in _volStatusVolume.findall(tree):
+        volumes[vol.find('volName').text] = [
+            _parseVolumeStatusDetailNode(el, typed)
+            for el in vol.findall('node')]
+    return volumes
 
+
+SNAPSHOT_SECTIONS = ('volumeInfo', 'volumeStatus', 'volumeStatusDetail',
+                     'peerStatus')
+# the sections glusterd takes the volume locks for
+_SNAPSHOT_STATUS_SECTIONS = ('volumeStatus', 'volumeStatusDetail')
+
+
+def _snapshotVolume():
+    return {'info': None, 'status': None, 'detail': None, 'tasks': {}}
+
+
+@instrument.instrumented
+def clusterSnapshot(maxWorkers=4, timeout=None, format=None, sections=None):
+    """
+    Returns volume info, status, brick details, tasks and peers of the
+    whole cluster from four gluster commands run concurrently, except the
+    two volume status ones, which glusterd locks the volumes for and so
+    run one after the other:
+
+      {'volumes': {volumeName: {'info': volumeInfo() entry,
+                                'status': volumeStatus() result,
+                                'detail': volumeStatus(detail) bricks,
+                                'tasks': volumeTasks() entries}},
+       'peers': peerStatus() result,
+       'age': {section: seconds since its command returned},
+       'errors': {section: exception}}
+
+    The sections are volumeInfo, volumeStatus (which also gives the tasks),
+    volumeStatusDetail and peerStatus, `sections` limits the snapshot to
+    some of them.  A failed section is reported in 'errors' and left out of
+    the merged data; stopped volumes have no status.
+    """
+    typed = _isTyped(format or ResultFormat.DICT)
+
+    def parsePeers(tree):
+        return _parsePeerStatus(tree, _getLocalPeer(), _getLocalPeerUUID(),
+                                HostStatus.CONNECTED)
+
+    def parseStatus(tree):
+        return _parseVolumeStatusAll(tree, typed), _parseVolumeTasks(tree)
+
+    commands = {
+        'volumeInfo': (_getGlusterVolCmd() + ["info"], _parseVolumeInfo),
+        'volumeStatus': (_getGlusterVolCmd() + ["status", "all"],
+                         parseStatus),
+        'volumeStatusDetail': (_getGlusterVolCmd() + ["status", "all",
+                                                      "detail"],
+                               lambda tree: _parseVolumeStatusDetailAll(
+                                   tree, typed)),
+        'peerStatus': (_getGlusterPeerCmd() + ["status"], parsePeers)}
+
+    def fetch(section):
+        command, parse = commands[section]
+        xmltree = _execGlusterXml(command)
+        fetched = time.time()
+        try:
+            return fetched, parse(xmltree)
+        except _etreeExceptions:
+            raise GlusterXMLError(command, xmlparser.tostring(xmltree))
+
+    def fetchGroup(group):
+        results = {}
+        for section in group:
+            try:
+                results[section] = fetch(section)
+            except Exception as e:
+                results[section] = e
+        return results
+
+    if sections is None:
+        sections = SNAPSHOT_SECTIONS
+    groups = [(section,) for section in sorted(sections)
+              if section not in _SNAPSHOT_STATUS_SECTIONS]
+    statusGroup = tuple(section for section in _SNAPSHOT_STATUS_SECTIONS
+                        if section in sections)
+    if statusGroup:
+        groups.append(statusGroup)
+    results = {}
+    for group, result in utils.execConcurrently(
+            _withCallerContext(fetchGroup), groups, maxWorkers,
+            timeout).items():
+        if isinstance(result, Exception):
+            result = dict((section, result) for section in group)
+        results.update(result)
+    now = time.time()
+    snapshot = {'volumes': {}, 'peers': [], 'age': {}, 'errors': {}}
+    data = {}
+    for section, result in results.items():
+        if isinstance(result, Exception):
+            snapshot['errors'][section] = result
+            continue
+        fetched, data[section] = result
+        snapshot['age'][section] = now - fetched
+
+    volumes = snapshot['volumes']
+    for volumeName, info in data.get('volumeInfo', {}).items():
+        volumes.setdefault(volumeName, _snapshotVolume())['info'] = info
+    status, tasks = data.get('volumeStatus', ({}, {}))
+    for volumeName, value in status.items():
+        volumes.setdefault(volumeName, _snapshotVolume())['status'] = value
+    for taskId, task in tasks.items():
+        volumes.setdefault(task['volumeName'],
+                           _snapshotVolume())['tasks'][taskId] = task
+    for volumeName, bricks in data.get('volumeStatusDetail', {}).items():
+        volumes.setdefault(volumeName, _snapshotVolume())['detail'] = bricks
+    snapshot['peers'] = data.get('peerStatus', [])
+    return snapshot
+
+
+@_invalidates('volumeInfo')
 def volumeGeoRepSessionStart(volumeName, remoteHost, remoteVolumeName,
                              force=False):
     command = _getGlusterVolGeoRepCmd() + [volumeName, "%s::%s" % (
@@ -850,6 +2094,7 @@ def volumeGeoRepSessionStart(volumeName, remoteHost, remoteVolumeName,
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeGeoRepSessionStop(volumeName, remoteHost, remoteVolumeName,
                             force=False):
     command = _getGlusterVolGeoRepCmd() + [volumeName, "%s::%s" % (
@@ -861,39 +2106,37 @@ def volumeGeoRepSessionStop(volumeName, remoteHost, remoteVolumeName,
     return True
 
 
+_geoRepVolume = xmlparser.Path('geoRep/volume')
+_geoRepSession = xmlparser.Path('sessions/session')
+
+
 def _parseGeoRepStatus(tree, detail=False):
     status = {}
-    for volume in tree.findall('geoRep/volume'):
+    for volume in _geoRepVolume.findall(tree):
         sessions = []
         volumeDetail = {}
-        for session in volume.findall('sessions/session'):
+        for session in _geoRepSession.findall(volume):
             pairs = []
             sessionDetail = {}
             sessionDetail['sessionKey'] = session.find('session_slave').text
             sessionDetail['remoteVolumeName'] = sessionDetail[
                 'sessionKey'].split("::")[-1]
             for pair in session.findall('pair'):
+                value = xmlparser.childTexts(pair)
                 pairDetail = {}
-                pairDetail['host'] = pair.find('master_node').text
-                pairDetail['hostUuid'] = pair.find(
-                    'master_node_uuid').text
-                pairDetail['brickName'] = pair.find('master_brick').text
-                pairDetail['remoteHost'] = pair.find(
-                    'slave').text.split("::")[0]
-                pairDetail['status'] = pair.find('status').text
-                pairDetail['checkpointStatus'] = pair.find(
-                    'checkpoint_status').text
-                pairDetail['crawlStatus'] = pair.find('crawl_status').text
+                pairDetail['host'] = value['master_node']
+                pairDetail['hostUuid'] = value['master_node_uuid']
+                pairDetail['brickName'] = value['master_brick']
+                pairDetail['remoteHost'] = value['slave'].split("::")[0]
+                pairDetail['status'] = value['status']
+                pairDetail['checkpointStatus'] = value['checkpoint_status']
+                pairDetail['crawlStatus'] = value['crawl_status']
                 if detail:
-                    pairDetail['filesSynced'] = pair.find('files_syncd').text
-                    pairDetail['filesPending'] = pair.find(
-                        'files_pending').text
-                    pairDetail['bytesPending'] = pair.find(
-                        'bytes_pending').text
-                    pairDetail['deletesPending'] = pair.find(
-                        'deletes_pending').text
-                    pairDetail['filesSkipped'] = pair.find(
-                        'files_skipped').text
+                    pairDetail['filesSynced'] = value['files_syncd']
+                    pairDetail['filesPending'] = value['files_pending']
+                    pairDetail['bytesPending'] = value['bytes_pending']
+                    pairDetail['deletesPending'] = value['deletes_pending']
+                    pairDetail['filesSkipped'] = value['files_skipped']
                 pairs.append(pairDetail)
             sessionDetail['bricks'] = pairs
             sessions.append(sessionDetail)
@@ -902,6 +2145,7 @@ def _parseGeoRepStatus(tree, detail=False):
     return status
 
 
+@instrument.instrumented
 def volumeGeoRepStatus(volumeName=None, remoteHost=None,
                        remoteVolumeName=None, detail=False):
     command = _getGlusterVolGeoRepCmd()
@@ -918,9 +2162,10 @@ def volumeGeoRepStatus(volumeName=None, remoteHost=None,
     try:
         return _parseGeoRepStatus(xmltree, detail)
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
+@_invalidates('volumeInfo')
 def volumeGeoRepSessionPause(volumeName, remoteHost, remoteVolumeName,
                              force=False):
     command = _getGlusterVolGeoRepCmd() + [volumeName, "%s::%s" % (
@@ -932,6 +2177,7 @@ def volumeGeoRepSessionPause(volumeName, remoteHost, remoteVolumeName,
     return True
 
 
+@_invalidates('volumeInfo')
 def volumeGeoRepSessionResume(volumeName, remoteHost, remoteVolumeName,
                               force=False):
     command = _getGlusterVolGeoRepCmd() + [volumeName, "%s::%s" % (
@@ -946,11 +2192,12 @@ def volumeGeoRepSessionResume(volumeName, remoteHost, remoteVolumeName,
 def _parseVolumeGeoRepConfig(tree):
     conf = tree.find('geoRep/config')
     config = {}
-    for child in conf.getchildren():
+    for child in conf:
         config[child.tag] = child.text
     return {'geoRepConfig': config}
 
 
+@instrument.instrumented
 def volumeGeoRepConfig(volumeName, remoteHost,
                        remoteVolumeName, optionName=None,
                        optionValue=None):
@@ -961,14 +2208,19 @@ def volumeGeoRepConfig(volumeName, remoteHost,
     elif optionName:
         command += ["!%s" % optionName]
 
-    xmltree = _execGlusterXml(command)
+    try:
+        xmltree = _execGlusterXml(command)
+    finally:
+        if optionName:
+            # some geo-replication settings are volume options
+            _invalidate(['volumeInfo'], volumeName)
     if optionName:
         return True
 
     try:
         return _parseVolumeGeoRepConfig(xmltree)
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
 def snapshotCreate(volumeName, snapName,
@@ -986,7 +2238,7 @@ def snapshotCreate(volumeName, snapName,
     try:
         return {'uuid': xmltree.find('snapCreate/snapshot/uuid').text}
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
 
 
 def snapshotDelete(volumeName=None, snapName=None):
@@ -1029,6 +2281,7 @@ def _parseRestoredSnapshot(tree):
     return snapshotRestore
 
 
+@_invalidates('volumeInfo')
 def snapshotRestore(snapName):
     command = _getGlusterSnapshotCmd() + ["restore", snapName]
 
@@ -1037,4 +2290,4 @@ def snapshotRestore(snapName):
     try:
         return _parseRestoredSnapshot(xmltree)
     except _etreeExceptions:
-        raise GlusterXMLError(command, etree.tostring(xmltree))
+        raise GlusterXMLError(command, xmlparser.tostring(xmltree))
@@ -0,0 +1,138 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Trusted pools queried from this node with --remote-host: a Cluster runs
+# the functions of glustercli.cli against one of the peers of its pool and
+# moves to the next one when glusterd cannot be reached, a ClusterScheduler
+# runs a query on many pools at once.
+
+import functools
+import logging
+import threading
+import types
+
+import cli
+import utils
+
+logger = logging.getLogger('glustercli')
+
+
+class Cluster(object):
+    """
+    A trusted pool reached through `hosts`, some of its peers:
+
+      pool = Cluster(['node1', 'node2'], name='pool1')
+      pool.volumeStatus('vol0')
+      pool.call(cli.volumeInfo, 'vol0')
+
+    Calls go to the last host which answered, then to the others in order
+    when the gluster CLI cannot connect to its glusterd or a query times
+    out (see cli.isUnreachable() and cli.enableCommandTimeout()), even if
+    func reported the error in its result; the error of the last host is
+    raised when none answers.  At most `maxPerHost` calls run at once
+    against a host, the others wait for their turn.
+    """
+    def __init__(self, hosts, name=None, maxPerHost=2):
+        if not hosts:
+            raise ValueError("a cluster needs at least one host")
+        self.hosts = list(hosts)
+        self.name = name or self.hosts[0]
+        self.failovers = 0
+        self._current = self.hosts[0]
+        self._lock = threading.Lock()
+        self._slots = dict((host, threading.BoundedSemaphore(maxPerHost))
+                           for host in self.hosts)
+
+    def __repr__(self):
+        return 'Cluster(%r, name=%r)' % (self.hosts, self.name)
+
+    def currentHost(self):
+        return self._current
+
+    def _candidates(self):
+        current = self._current
+        return [current] + [h for h in self.hosts if h != current]
+
+    def _callOn(self, host, func, args, kwargs):
+        with self._slots[host]:
+            with cli.remoteHost(host) as remote:
+                result = func(*args, **kwargs)
+        if remote.unreachable is not None:
+            # a partial result, like a clusterSnapshot() with errors
+            raise remote.unreachable
+        return result
+
+    def call(self, func, *args, **kwargs):
+        """
+        Returns func(*args, **kwargs) run against a host of the pool
+        """
+        error = None
+        for host in self._candidates():
+            try:
+                result = self._callOn(host, func, args, kwargs)
+            except Exception as e:
+                if not cli.isUnreachable(e):
+                    raise
+                logger.warn("glusterd of %s in %s unreachable", host,
+                            self.name)
+                error = e
+                continue
+            with self._lock:
+                if self._current != host:
+                    self.failovers += 1
+                    self._current = host
+            return result
+        raise error
+
+    def __getattr__(self, name):
+        func = getattr(cli, name, None)
+        if name.startswith('_') or not isinstance(func, types.FunctionType):
+            raise AttributeError(name)
+        return functools.partial(self.call, func)
+
+
+class ClusterScheduler(object):
+    """
+    Runs a query on many clusters from at most `maxWorkers` threads, see
+    utils.execConcurrently() for `timeout`:
+
+      scheduler = ClusterScheduler([Cluster(['a1', 'a2']),
+                                    Cluster(['b1', 'b2'])])
+      scheduler.call(cli.clusterSnapshot)
+
+    The per host limits are the ones of the clusters.  Results are keyed
+    by cluster name, so the names must be unique.
+    """
+    def __init__(self, clusters, maxWorkers=8, timeout=None):
+        self.clusters = list(clusters)
+        names = set()
+        for cluster in self.clusters:
+            if cluster.name in names:
+                raise ValueError("duplicate cluster name %r" % cluster.name)
+            names.add(cluster.name)
+        self.maxWorkers = maxWorkers
+        self.timeout = timeout
+
+    def call(self, func, *args, **kwargs):
+        """
+        Returns a dict mapping each cluster name to the result of
+        func(*args, **kwargs) on that cluster, or to the exception it
+        raised
+        """
+        results = utils.execConcurrently(
+            lambda cluster: cluster.call(func, *args, **kwargs),
+            self.clusters, self.maxWorkers, self.timeout)
+        return dict((cluster.name, result)
+                    for cluster, result in results.items())
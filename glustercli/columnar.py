@@ -0,0 +1,125 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Column oriented layout of volume profile results, one table per kind of
+# statistic where every column is a contiguous array of the same length.
+# The arrays are numpy arrays when numpy is installed and array.array (or
+# lists for text) otherwise.  A number gluster did not report is -1 in
+# an INT column, as counts and sizes are never negative, and NaN in a
+# FLOAT column.
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INT = 'l'
+FLOAT = 'd'
+TEXT = None
+
+_numpyTypes = {INT: 'int64', FLOAT: 'float64'}
+_missing = {INT: -1, FLOAT: float('nan')}
+
+FOP_COLUMNS = (('volume', TEXT), ('brick', TEXT), ('name', TEXT),
+               ('hits', INT), ('latencyAvg', FLOAT), ('latencyMin', FLOAT),
+               ('latencyMax', FLOAT))
+BLOCK_COLUMNS = (('volume', TEXT), ('brick', TEXT), ('size', INT),
+                 ('read', INT), ('write', INT))
+BRICK_COLUMNS = (('volume', TEXT), ('brick', TEXT), ('duration', INT),
+                 ('totalRead', INT), ('totalWrite', INT))
+
+
+def _column(values, kind):
+    if kind is not TEXT:
+        values = [_missing[kind] if v is None else v for v in values]
+    if numpy is not None:
+        return numpy.array(values, dtype=_numpyTypes.get(kind, object))
+    if kind is TEXT:
+        return values
+    return array.array(kind, values)
+
+
+def _table(rows, columns):
+    table = {}
+    for i, (name, kind) in enumerate(columns):
+        table[name] = _column([row[i] for row in rows], kind)
+    return table
+
+
+def _statsTables(volumeName, bricks, section):
+    fopRows = []
+    blockRows = []
+    brickRows = []
+    for brick in bricks:
+        stats = getattr(brick, section)
+        if stats is None:
+            continue
+        brickRows.append((volumeName, brick.brick, stats.duration,
+                          stats.totalRead, stats.totalWrite))
+        for fop in stats.fopStats:
+            fopRows.append((volumeName, brick.brick, fop.name, fop.hits,
+                            fop.latencyAvg, fop.latencyMin, fop.latencyMax))
+        for block in stats.blockStats:
+            blockRows.append((volumeName, brick.brick, block.size,
+                              block.read, block.write))
+    return {'fopStats': _table(fopRows, FOP_COLUMNS),
+            'blockStats': _table(blockRows, BLOCK_COLUMNS),
+            'bricks': _table(brickRows, BRICK_COLUMNS)}
+
+
+def profileColumns(volumeName, bricks):
+    """
+    Converts the typed brick records of volumeProfileInfo() into
+    {'volumeName': ..., 'cumulativeStats': tables, 'intervalStats': tables}
+    where tables holds the 'fopStats', 'blockStats' and 'bricks' tables,
+    the intervalStats ones being empty for a cumulative profile info.
+    """
+    return {'volumeName': volumeName,
+            'cumulativeStats': _statsTables(volumeName, bricks,
+                                            'cumulativeStats'),
+            'intervalStats': _statsTables(volumeName, bricks,
+                                          'intervalStats')}
+
+
+def _concatColumn(parts, kind):
+    if not parts:
+        return _column([], kind)
+    if numpy is not None:
+        return numpy.concatenate(parts)
+    result = parts[0][:]
+    for part in parts[1:]:
+        result.extend(part)
+    return result
+
+
+def concatenate(results):
+    """
+    Merges the profileColumns() of several volumes into the same layout,
+    the 'volume' column telling the rows apart.
+    """
+    results = list(results)
+    merged = {'volumeName': [r['volumeName'] for r in results]}
+    for section in ('cumulativeStats', 'intervalStats'):
+        merged[section] = {}
+        for table, columns in (('fopStats', FOP_COLUMNS),
+                               ('blockStats', BLOCK_COLUMNS),
+                               ('bricks', BRICK_COLUMNS)):
+            merged[section][table] = dict(
+                (name, _concatColumn([r[section][table][name]
+                                      for r in results], kind))
+                for name, kind in columns)
+    return merged
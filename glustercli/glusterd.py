@@ -0,0 +1,248 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A client of the management program glusterd serves to the gluster CLI:
+# ONC RPC calls with record marking over the glusterd Unix socket or TCP
+# port, arguments and replies being gluster dicts in XDR opaques.  Program,
+# procedure numbers and dict keys are the ones of glusterfs 3.x
+# (rpc/rpc-lib/src/protocol-common.h, rpc/xdr/src/cli1-xdr.x).
+
+import os
+import struct
+import threading
+import xdrlib
+
+DEFAULT_SOCKET = '/var/run/glusterd.socket'
+DEFAULT_PORT = 24007
+
+GLUSTER_CLI_PROGRAM = 1238463
+GLUSTER_CLI_VERSION = 2
+
+# enum gluster_cli_procnum
+PROC_NULL = 0
+PROC_LIST_FRIENDS = 3
+PROC_GET_VOLUME = 5
+
+# enum gf1_cli_get_volume
+GET_VOLUME_ALL = 1
+GET_VOLUME = 2
+
+# enum gf1_cli_friends_list
+LIST_PEERS = 1
+
+_RPC_VERSION = 2
+_CALL = 0
+_REPLY = 1
+_MSG_ACCEPTED = 0
+_SUCCESS = 0
+_AUTH_NULL = 0
+_AUTH_GLUSTERFS_V2 = 390039
+_LAST_FRAGMENT = 0x80000000
+
+_ACCEPT_ERRORS = {1: 'program unavailable',
+                  2: 'program version mismatch',
+                  3: 'procedure unavailable',
+                  4: 'garbage arguments',
+                  5: 'system error'}
+
+
+class RpcError(Exception):
+    """
+    glusterd could not be reached or did not run the call
+    """
+
+
+def packDict(values):
+    """
+    Serializes {key: value} like dict_serialize(): the count, then the
+    key and value lengths, the key and the value of every pair, strings
+    being NUL terminated.
+    """
+    chunks = [struct.pack('>I', len(values))]
+    for key, value in values.items():
+        value = str(value) + '\0'
+        chunks.append(struct.pack('>II', len(key), len(value)))
+        chunks.append(key + '\0')
+        chunks.append(value)
+    return ''.join(chunks)
+
+
+def unpackDict(data):
+    """
+    The reverse of packDict(), values are returned as strings
+    """
+    values = {}
+    if not data:
+        return values
+    try:
+        count, = struct.unpack_from('>I', data)
+        offset = 4
+        for i in range(count):
+            keyLen, valueLen = struct.unpack_from('>II', data, offset)
+            offset += 8
+            key = data[offset:offset + keyLen]
+            offset += keyLen + 1
+            value = data[offset:offset + valueLen]
+            offset += valueLen
+            values[key] = value.rstrip('\0')
+    except struct.error as e:
+        raise RpcError("bad dict: %s" % e)
+    if offset > len(data):
+        raise RpcError("truncated dict")
+    return values
+
+
+def _recvExactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+def readRecord(sock):
+    """
+    Returns the next record marked message read from sock
+    """
+    fragments = []
+    while True:
+        header, = struct.unpack('>I', _recvExactly(sock, 4))
+        fragments.append(_recvExactly(sock, header & ~_LAST_FRAGMENT))
+        if header & _LAST_FRAGMENT:
+            return ''.join(fragments)
+
+
+def writeRecord(sock, message):
+    sock.sendall(struct.pack('>I', _LAST_FRAGMENT | len(message)) + message)
+
+
+def _credentials():
+    p = xdrlib.Packer()
+    p.pack_int(os.getpid())
+    p.pack_uint(os.getuid())
+    p.pack_uint(os.getgid())
+    p.pack_array(os.getgroups(), p.pack_uint)
+    p.pack_opaque('')
+    return p.get_buffer()
+
+
+class GlusterdClient(object):
+    """
+    Calls the gluster CLI program of glusterd at `address`, a Unix socket
+    path or a (host, port) tuple.  One call at a time goes over the
+    connection, which is opened on the first call and again after a
+    failure.  Transport and protocol errors raise RpcError.
+    """
+    def __init__(self, address=DEFAULT_SOCKET, timeout=30):
+        self.address = address
+        self.timeout = timeout
+        self._sock = None
+        self._xid = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import socket
+
+        if isinstance(self.address, tuple):
+            sock = socket.create_connection(self.address, self.timeout)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.address)
+            except Exception:
+                sock.close()
+                raise
+        return sock
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def _call(self, proc, args):
+        with self._lock:
+            self._xid = (self._xid + 1) & 0xffffffff
+            xid = self._xid
+            p = xdrlib.Packer()
+            for value in (xid, _CALL, _RPC_VERSION, GLUSTER_CLI_PROGRAM,
+                          GLUSTER_CLI_VERSION, proc):
+                p.pack_uint(value)
+            p.pack_uint(_AUTH_GLUSTERFS_V2)
+            p.pack_opaque(_credentials())
+            p.pack_uint(_AUTH_NULL)
+            p.pack_opaque('')
+            try:
+                if self._sock is None:
+                    self._sock = self._connect()
+                writeRecord(self._sock, p.get_buffer() + args)
+                reply = readRecord(self._sock)
+            except (EnvironmentError, EOFError) as e:
+                # includes socket errors and timeouts
+                if self._sock is not None:
+                    self._sock.close()
+                    self._sock = None
+                raise RpcError("glusterd at %s: %s" % (self.address, e))
+
+        u = xdrlib.Unpacker(reply)
+        try:
+            if u.unpack_uint() != xid or u.unpack_uint() != _REPLY:
+                raise RpcError("unexpected reply")
+            if u.unpack_uint() != _MSG_ACCEPTED:
+                raise RpcError("call rejected by glusterd")
+            u.unpack_uint()
+            u.unpack_opaque()
+            status = u.unpack_uint()
+        except (EOFError, xdrlib.Error):
+            raise RpcError("truncated reply")
+        if status != _SUCCESS:
+            raise RpcError(_ACCEPT_ERRORS.get(status, 'error %d' % status))
+        return u
+
+    def getVolume(self, volumeName=None):
+        """
+        Returns (opRet, opErrno, opErrstr, dict) of the volume info of
+        volumeName, of all the volumes when it is None
+        """
+        request = {'flags': GET_VOLUME if volumeName else GET_VOLUME_ALL}
+        if volumeName:
+            request['volname'] = volumeName
+        p = xdrlib.Packer()
+        p.pack_opaque(packDict(request))
+        u = self._call(PROC_GET_VOLUME, p.get_buffer())
+        try:
+            return (u.unpack_int(), u.unpack_int(), u.unpack_string(),
+                    unpackDict(u.unpack_opaque()))
+        except (EOFError, xdrlib.Error):
+            raise RpcError("truncated reply")
+
+    def listFriends(self):
+        """
+        Returns (opRet, opErrno, opErrstr, dict) of the peers
+        """
+        p = xdrlib.Packer()
+        p.pack_int(LIST_PEERS)
+        p.pack_opaque('')
+        u = self._call(PROC_LIST_FRIENDS, p.get_buffer())
+        try:
+            # gf1_cli_peer_list_rsp has no error string
+            return (u.unpack_int(), u.unpack_int(), '',
+                    unpackDict(u.unpack_opaque()))
+        except (EOFError, xdrlib.Error):
+            raise RpcError("truncated reply")
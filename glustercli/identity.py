@@ -0,0 +1,245 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The address and uuid gluster knows the local node by.  The address is
+# resolved in a background thread so that a slow DNS only delays the
+# callers up to a timeout, the uuid is read from glusterd.info.
+
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+logger = logging.getLogger('glustercli')
+
+GLUSTERD_INFO = '/var/lib/glusterd/glusterd.info'
+
+# linux/rtnetlink.h
+_NETLINK_ROUTE = 0
+_RTMGRP_IPV4_IFADDR = 0x10
+_RTMGRP_IPV6_IFADDR = 0x100
+
+
+def resolvePeer():
+    """
+    Returns the first non loopback address of the node, its fqdn when it
+    has none
+    """
+    # imported on first use, they weigh on the import time of glustercli
+    import ethtool
+    import socket
+
+    fqdn = socket.getfqdn()
+    ip = socket.gethostbyname(fqdn)
+    if not ip.startswith('127.'):
+        return ip
+
+    for dev in ethtool.get_active_devices():
+        try:
+            ip = ethtool.get_ipaddr(dev)
+            if not ip.startswith('127.'):
+                return ip
+        except IOError as e:
+            logger.warn('failed to get ipaddr for device %s: %s' % (dev, e))
+
+    return fqdn
+
+
+def readUUID(path=GLUSTERD_INFO):
+    """
+    Returns the UUID= value of glusterd.info, '' when it cannot be read
+    """
+    try:
+        with open(path) as f:
+            for line in f:
+                key, sep, value = line.partition('=')
+                if key.strip() == 'UUID':
+                    return value.strip()
+    except IOError as e:
+        logger.debug('failed to read %s: %s', path, e)
+    return ''
+
+
+def _addressMonitor():
+    """
+    Returns a netlink socket readable on local address changes, None where
+    netlink is not available
+    """
+    import socket
+
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW,
+                             _NETLINK_ROUTE)
+    except (AttributeError, socket.error) as e:
+        logger.debug('address changes not monitored: %s', e)
+        return None
+    try:
+        sock.bind((0, _RTMGRP_IPV4_IFADDR | _RTMGRP_IPV6_IFADDR))
+    except socket.error as e:
+        logger.debug('address changes not monitored: %s', e)
+        sock.close()
+        return None
+    return sock
+
+
+def _isAddressMessage(data):
+    # RTM_NEWADDR and RTM_DELADDR
+    while len(data) >= 16:
+        length, msgType = struct.unpack('=IH', data[:6])
+        if msgType in (20, 21):
+            return True
+        if length < 16:
+            break
+        data = data[(length + 3) & ~3:]
+    return False
+
+
+class LocalIdentity(object):
+    """
+    peer() waits at most `resolveTimeout` seconds after its first call for
+    the first resolution and answers the fqdn of the node when it is not
+    done by then; later calls never wait nor resolve again, they get the
+    last resolved address or the fqdn.  uuid() reads `infoPath` and calls
+    `uuidFallback` when it has no UUID.  Pinned `peer` or `uuid` values are
+    never resolved.
+    """
+    def __init__(self, resolveTimeout=5, infoPath=GLUSTERD_INFO,
+                 uuidFallback=None, peer=None, uuid=None):
+        self.resolveTimeout = resolveTimeout
+        self.infoPath = infoPath
+        self.uuidFallback = uuidFallback
+        self._pinnedPeer = peer
+        self._peer = peer
+        self._uuid = uuid or ''
+        self._pinnedUUID = bool(uuid)
+        self._lock = threading.Lock()
+        self._resolved = threading.Event()
+        self._resolver = None
+        self._deadline = None
+        self._fqdn = None
+        self._stopped = threading.Event()
+        self._refresher = None
+        self._wakeup = None
+        self.refreshes = 0
+
+    def _resolve(self):
+        try:
+            peer = resolvePeer()
+        except Exception as e:
+            logger.warn('failed to resolve the local peer: %s', e)
+        else:
+            with self._lock:
+                self._peer = peer
+        finally:
+            with self._lock:
+                self._resolver = None
+                self.refreshes += 1
+            self._resolved.set()
+
+    def resolve(self):
+        """
+        Starts resolving the address in the background unless it already
+        is being resolved, returns immediately
+        """
+        if self._pinnedPeer:
+            return
+        with self._lock:
+            if self._resolver is not None:
+                return
+            self._resolver = threading.Thread(target=self._resolve)
+            self._resolver.daemon = True
+            self._resolver.start()
+
+    def peer(self):
+        peer = self._peer
+        if peer:
+            return peer
+        with self._lock:
+            first = self._deadline is None
+            if first:
+                self._deadline = time.time() + self.resolveTimeout
+        if first:
+            self.resolve()
+        # the callers racing the first one share its deadline
+        remaining = self._deadline - time.time()
+        if remaining > 0 and self._resolved.wait(remaining) and self._peer:
+            return self._peer
+        if self._fqdn is None:
+            import socket
+
+            logger.warn('local peer not resolved within %ss, using the '
+                        'fqdn', self.resolveTimeout)
+            self._fqdn = socket.getfqdn()
+        return self._fqdn
+
+    def uuid(self):
+        uuid = self._uuid
+        if uuid:
+            return uuid
+        uuid = readUUID(self.infoPath)
+        if not uuid and self.uuidFallback is not None:
+            uuid = self.uuidFallback()
+        if uuid:
+            self._uuid = uuid
+        return uuid
+
+    def refresh(self):
+        """
+        Re-reads the uuid and re-resolves the address in the background,
+        the previous address is answered until then
+        """
+        if not self._pinnedUUID:
+            self._uuid = ''
+        self.resolve()
+
+    def _run(self, interval, monitor, wakeup):
+        try:
+            while not self._stopped.is_set():
+                sockets = [wakeup] if monitor is None else [monitor, wakeup]
+                readable = select.select(sockets, [], [], interval)[0]
+                if self._stopped.is_set():
+                    break
+                if monitor in readable and not _isAddressMessage(
+                        monitor.recv(65536)):
+                    continue
+                self.refresh()
+        finally:
+            if monitor is not None:
+                monitor.close()
+            os.close(wakeup)
+
+    def start(self, interval=300, netlink=True):
+        """
+        Refreshes every `interval` seconds and, with `netlink`, whenever a
+        local address is added or removed
+        """
+        self.resolve()
+        monitor = _addressMonitor() if netlink else None
+        wakeup, self._wakeup = os.pipe()
+        self._stopped.clear()
+        self._refresher = threading.Thread(target=self._run,
+                                           args=(interval, monitor, wakeup))
+        self._refresher.daemon = True
+        self._refresher.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._refresher is not None:
+            os.write(self._wakeup, 'x')
+            self._refresher.join()
+            self._refresher = None
+            os.close(self._wakeup)
@@ -0,0 +1,245 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Timing of the gluster commands run by cli.py.  Every call produces a
+# Sample which is handed to the registered hooks:
+#
+#   spawn     seconds spent starting the gluster process
+#   wall      seconds from the start of the process until its output was
+#             collected (or until the pooled session answered)
+#   outBytes  bytes of output
+#   parse     seconds spent building the element tree
+#   post      the rest of the call, mostly the _parse* functions
+#
+# For streamed replies parsing happens while the output is read, so it is
+# part of `wall`.  Nothing is measured while no hook is registered.
+
+import bisect
+import collections
+import functools
+import logging
+import threading
+import time
+
+_hooks = []
+_hooksLock = threading.Lock()
+_local = threading.local()
+
+
+class Sample(object):
+    __slots__ = ('name', 'command', 'spawn', 'wall', 'outBytes', 'parse',
+                 'post', 'failed')
+
+    def __init__(self, name, command=None):
+        self.name = name
+        self.command = command
+        self.spawn = 0.0
+        self.wall = 0.0
+        self.outBytes = 0
+        self.parse = 0.0
+        self.post = 0.0
+        self.failed = False
+
+    def __repr__(self):
+        return ('Sample(%r, spawn=%.6f, wall=%.6f, outBytes=%d, '
+                'parse=%.6f, post=%.6f, failed=%r)' %
+                (self.name, self.spawn, self.wall, self.outBytes,
+                 self.parse, self.post, self.failed))
+
+
+def addHook(hook):
+    """
+    Registers `hook`, a callable taking a Sample, called after every
+    instrumented call in the thread which made it.
+    """
+    global _hooks
+    with _hooksLock:
+        _hooks = _hooks + [hook]
+
+
+def removeHook(hook):
+    global _hooks
+    with _hooksLock:
+        _hooks = [h for h in _hooks if h != hook]
+
+
+def add(field, value):
+    """
+    Adds `value` to `field` of the sample being measured in this thread,
+    if any.
+    """
+    sample = getattr(_local, 'sample', None)
+    if sample is not None:
+        setattr(sample, field, getattr(sample, field) + value)
+
+
+class _Measure(object):
+    def __init__(self, name, command, nested):
+        self._name = name
+        self._command = command
+        self._nested = nested
+        self._sample = None
+
+    def __enter__(self):
+        if not _hooks:
+            return None
+        self._previous = getattr(_local, 'sample', None)
+        if self._previous is not None and \
+                (not self._nested or self._previous.name == self._name):
+            if self._previous.command is None:
+                self._previous.command = self._command
+            return self._previous
+        self._sample = Sample(self._name, self._command)
+        _local.sample = self._sample
+        self._start = time.time()
+        return self._sample
+
+    def __exit__(self, excType, excValue, tb):
+        sample = self._sample
+        if sample is None:
+            return
+        _local.sample = self._previous
+        sample.post = max(time.time() - self._start - sample.spawn -
+                          sample.wall - sample.parse, 0.0)
+        sample.failed = excType is not None
+        for hook in _hooks:
+            try:
+                hook(sample)
+            except Exception:
+                logging.getLogger('glustercli').exception(
+                    "instrumentation hook %r failed", hook)
+
+
+def measure(name, command=None):
+    """
+    Context manager measuring a call named `name`.  A call made while
+    another one is being measured in the same thread gets its own Sample,
+    unless it has the same name (a function calling itself).
+    """
+    return _Measure(name, command, True)
+
+
+def measureCommand(name, command=None):
+    """
+    Like measure() but joins the call being measured in this thread, if any.
+    """
+    return _Measure(name, command, False)
+
+
+def instrumented(func):
+    """
+    Decorator measuring every call of `func` under its name
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _hooks:
+            return func(*args, **kwargs)
+        with _Measure(name, None, True):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+_PHASES = ('spawn', 'wall', 'parse', 'post')
+
+
+class _Histogram(object):
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class PrometheusCollector(object):
+    """
+    A hook aggregating samples into counters and histograms, rendered in
+    the Prometheus text exposition format by render():
+
+      glustercli_calls_total{call, status}
+      glustercli_output_bytes_total{call}
+      glustercli_phase_seconds{call, phase}    (histogram)
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='glustercli'):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._calls = collections.defaultdict(int)
+        self._bytes = collections.defaultdict(int)
+        self._histograms = {}
+
+    def __call__(self, sample):
+        status = 'error' if sample.failed else 'ok'
+        with self._lock:
+            self._calls[(sample.name, status)] += 1
+            self._bytes[sample.name] += sample.outBytes
+            for phase in _PHASES:
+                value = getattr(sample, phase)
+                key = (sample.name, phase)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = _Histogram(len(self.buckets))
+                    self._histograms[key] = histogram
+                i = bisect.bisect_left(self.buckets, value)
+                if i < len(self.buckets):
+                    histogram.counts[i] += 1
+                histogram.sum += value
+                histogram.count += 1
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._bytes.clear()
+            self._histograms.clear()
+
+    def render(self):
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines.append('# HELP %s_calls_total Instrumented calls.' % p)
+            lines.append('# TYPE %s_calls_total counter' % p)
+            for (name, status), n in sorted(self._calls.items()):
+                lines.append('%s_calls_total{call="%s",status="%s"} %d' %
+                             (p, name, status, n))
+
+            lines.append('# HELP %s_output_bytes_total Bytes of gluster '
+                         'output.' % p)
+            lines.append('# TYPE %s_output_bytes_total counter' % p)
+            for name, n in sorted(self._bytes.items()):
+                lines.append('%s_output_bytes_total{call="%s"} %d' %
+                             (p, name, n))
+
+            lines.append('# HELP %s_phase_seconds Time spent per phase of '
+                         'a call.' % p)
+            lines.append('# TYPE %s_phase_seconds histogram' % p)
+            for (name, phase), h in sorted(self._histograms.items()):
+                labels = 'call="%s",phase="%s"' % (name, phase)
+                cumulative = 0
+                for bound, n in zip(self.buckets, h.counts):
+                    cumulative += n
+                    lines.append('%s_phase_seconds_bucket{%s,le="%r"} %d' %
+                                 (p, labels, bound, cumulative))
+                lines.append('%s_phase_seconds_bucket{%s,le="+Inf"} %d' %
+                             (p, labels, h.count))
+                lines.append('%s_phase_seconds_sum{%s} %r' %
+                             (p, labels, h.sum))
+                lines.append('%s_phase_seconds_count{%s} %d' %
+                             (p, labels, h.count))
+        return '\n'.join(lines) + '\n'
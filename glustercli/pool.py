@@ -0,0 +1,198 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import Queue
+import errno
+import logging
+import os
+import re
+import select
+import threading
+import time
+
+import instrument
+import utils
+
+logger = logging.getLogger('glustercli')
+
+PROMPT = "gluster> "
+# global options the sessions are already started with
+_SESSION_OPTIONS = ('--mode=script', '--xml')
+_OP_RET = re.compile(r'<opRet>\s*(-?\d+)\s*</opRet>')
+
+
+class SessionError(Exception):
+    pass
+
+
+def replyStatus(out, err):
+    """
+    Returns the exit status the one-shot CLI would have had for an XML
+    reply of the interactive shell, which does not report one: 1 when the
+    operation failed or when there is no reply but errors, 0 otherwise
+    """
+    match = _OP_RET.search(out)
+    if match is not None:
+        return 0 if int(match.group(1)) == 0 else 1
+    return 1 if err.strip() else 0
+
+
+class GlusterSession(object):
+    """
+    A gluster CLI process running in interactive XML mode.  Commands are
+    written to its stdin one per line and the reply is everything written
+    to stdout until the next prompt.
+    """
+    def __init__(self, cmdPath, timeout):
+        from cpopen import CPopen
+
+        self.calls = 0
+        self._timeout = timeout
+        self._proc = CPopen([cmdPath, '--xml'], close_fds=True)
+        self._fdin = self._proc.stdin.fileno()
+        self._fdout = self._proc.stdout.fileno()
+        self._fderr = self._proc.stderr.fileno()
+        self._poller = select.epoll()
+        self._poller.register(self._fdout, select.EPOLLIN | select.EPOLLPRI)
+        self._poller.register(self._fderr, select.EPOLLIN | select.EPOLLPRI)
+        try:
+            self._readReply()
+        except SessionError:
+            self.close()
+            raise
+
+    @property
+    def alive(self):
+        return self._proc.poll() is None
+
+    def _readReply(self):
+        out = []
+        err = []
+        tail = ''
+        endTime = time.time() + self._timeout
+        while True:
+            timeout = endTime - time.time()
+            if timeout <= 0:
+                raise SessionError("timed out waiting for gluster prompt")
+            for fd, event in utils.NoIntrPoll(self._poller.poll, timeout):
+                data = os.read(fd, utils.BUFFSIZE)
+                if not data:
+                    raise SessionError("gluster session exited")
+                if fd == self._fderr:
+                    err.append(data)
+                    continue
+                out.append(data)
+                tail = (tail + data)[-len(PROMPT):]
+            if tail == PROMPT:
+                out = ''.join(out)
+                return out[:-len(PROMPT)], ''.join(err)
+
+    def execute(self, line):
+        data = line + '\n'
+        try:
+            while data:
+                data = data[os.write(self._fdin, data):]
+        except OSError as e:
+            if e.errno != errno.EPIPE:
+                raise
+            raise SessionError("gluster session exited")
+        out, err = self._readReply()
+        self.calls += 1
+        return out, err
+
+    def close(self):
+        self._poller.close()
+        try:
+            self._proc.kill()
+        except OSError:
+            pass
+        self._proc.wait()
+
+
+class GlusterSessionPool(object):
+    """
+    Keeps up to `size` warm gluster CLI processes and runs commands
+    through them instead of spawning a new one per call.  Sessions are
+    replaced after `maxCalls` commands or as soon as they misbehave, in
+    which case the command falls back to a regular one-shot execution.
+    Like utils.execCmd(), execCmd() raises CmdExecFailed when the status
+    of the reply (see replyStatus()) is not 0.
+    """
+    def __init__(self, cmdPath, size=4, maxCalls=1000, timeout=120):
+        self._cmdPath = cmdPath
+        self._maxCalls = maxCalls
+        self._timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = Queue.LifoQueue()
+        self._closed = False
+
+    def _line(self, cmd):
+        args = [a for a in cmd[1:] if a not in _SESSION_OPTIONS]
+        for arg in args:
+            # interactive mode splits lines on white space and does not
+            # know about global options
+            if not arg or arg.startswith('--') or len(arg.split()) != 1:
+                return None
+        return ' '.join(args)
+
+    def _getSession(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except Queue.Empty:
+                start = time.time()
+                session = GlusterSession(self._cmdPath, self._timeout)
+                instrument.add('spawn', time.time() - start)
+                return session
+            if session.alive:
+                return session
+            session.close()
+
+    def execCmd(self, cmd):
+        line = self._line(cmd)
+        if line is None or self._closed:
+            return utils.execCmd(cmd)
+
+        with self._slots:
+            session = None
+            try:
+                session = self._getSession()
+                start = time.time()
+                out, err = session.execute(line)
+                instrument.add('wall', time.time() - start)
+                instrument.add('outBytes', len(out))
+            except SessionError as e:
+                logger.warn("gluster session failed, recycling it: %s", e)
+                if session is not None:
+                    session.close()
+                return utils.execCmd(cmd)
+
+            if self._closed or session.calls >= self._maxCalls:
+                session.close()
+            else:
+                self._idle.put(session)
+
+        rc = replyStatus(out, err)
+        if rc:
+            raise utils.CmdExecFailed(cmd, rc, out, err)
+        return rc, out, err
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Queue.Empty:
+                break
@@ -0,0 +1,171 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+
+import cli
+
+logger = logging.getLogger('glustercli')
+
+
+class _BrickSample(object):
+    __slots__ = ('duration', 'totalRead', 'totalWrite', 'fops', 'blocks')
+
+    def __init__(self, stats=None):
+        self.duration = 0
+        self.totalRead = 0
+        self.totalWrite = 0
+        self.fops = {}
+        self.blocks = {}
+        if stats is None:
+            return
+        self.duration = stats.duration or 0
+        self.totalRead = stats.totalRead or 0
+        self.totalWrite = stats.totalWrite or 0
+        self.fops = dict((f.name, (f.hits or 0, f.latencyAvg or 0.0))
+                         for f in stats.fopStats)
+        self.blocks = dict((b.size, (b.read or 0, b.write or 0))
+                           for b in stats.blockStats)
+
+
+_empty = _BrickSample()
+
+
+def _rate(value, seconds):
+    if seconds <= 0:
+        return 0.0
+    return value / float(seconds)
+
+
+def _brickDelta(old, new):
+    if new.duration < old.duration:
+        # the brick was restarted or its profile reset, count from zero
+        old = _empty
+    seconds = new.duration - old.duration
+    fops = {}
+    for name, (hits, latencyAvg) in new.fops.items():
+        oldHits, oldLatencyAvg = old.fops.get(name, (0, 0.0))
+        if hits < oldHits:
+            oldHits, oldLatencyAvg = 0, 0.0
+        deltaHits = hits - oldHits
+        if deltaHits:
+            # average latency of the calls made during the interval
+            latency = ((latencyAvg * hits - oldLatencyAvg * oldHits) /
+                       deltaHits)
+        else:
+            latency = 0.0
+        fops[name] = {'hits': deltaHits,
+                      'rate': _rate(deltaHits, seconds),
+                      'latencyAvg': latency}
+    blocks = {}
+    for size, (read, write) in new.blocks.items():
+        oldRead, oldWrite = old.blocks.get(size, (0, 0))
+        blocks[size] = {'read': max(read - oldRead, 0),
+                        'write': max(write - oldWrite, 0)}
+    totalRead = max(new.totalRead - old.totalRead, 0)
+    totalWrite = max(new.totalWrite - old.totalWrite, 0)
+    return {'duration': seconds,
+            'totalRead': totalRead,
+            'totalWrite': totalWrite,
+            'readRate': _rate(totalRead, seconds),
+            'writeRate': _rate(totalWrite, seconds),
+            'fopStats': fops,
+            'blockStats': blocks}
+
+
+class ProfileSubscription(object):
+    """
+    An independent interval view over the samples of a VolumeProfiler
+    """
+    def __init__(self, profiler):
+        self._profiler = profiler
+        self._last = profiler.samples()
+
+    def delta(self):
+        """
+        Returns the activity of every brick since the previous call (or
+        since subscribing) as {brick: stats}.  Counters are differences of
+        the cumulative stats and rates are per second.
+        """
+        current = self._profiler.samples()
+        bricks = {}
+        for brick, sample in current.items():
+            bricks[brick] = _brickDelta(self._last.get(brick, _empty),
+                                        sample)
+        self._last = current
+        return bricks
+
+
+class VolumeProfiler(object):
+    """
+    Polls the cumulative counters of each brick every `interval` seconds
+    with profile info cumulative, which leaves the interval stats of other
+    readers on the cluster alone, and keeps the latest ones.  Any number
+    of subscribers can compute their own deltas from them without running
+    gluster again.
+    """
+    def __init__(self, volumeName, interval=10, nfs=False):
+        self.volumeName = volumeName
+        self.interval = interval
+        self.nfs = nfs
+        self.lastError = None
+        self.lastPoll = None
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        status = cli.volumeProfileInfo(self.volumeName, self.nfs,
+                                       format=cli.ResultFormat.TYPED,
+                                       cumulative=True)
+        brickKey, bricksKey = cli._getProfileKeys(self.nfs)
+        samples = dict((b.brick, _BrickSample(b.cumulativeStats))
+                       for b in status[bricksKey])
+        with self._lock:
+            self._samples = samples
+            self.lastPoll = time.time()
+
+    def samples(self):
+        with self._lock:
+            return self._samples
+
+    def subscribe(self):
+        return ProfileSubscription(self)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+                self.lastError = None
+            except Exception as e:
+                logger.warn("profile poll of %s failed: %s",
+                            self.volumeName, e)
+                self.lastError = e
+            self._stopped.wait(self.interval)
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
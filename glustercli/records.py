@@ -0,0 +1,310 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Compact record types returned by the status and profile functions of cli
+# when called with format=ResultFormat.TYPED.  Numbers are kept as int or
+# float instead of strings.  toDict() converts any result back to the
+# plain dict shape, formatting the numbers the way gluster prints them.
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _str(value):
+    if value is None:
+        return 'N/A'
+    return str(value)
+
+
+def _latencyStr(value):
+    # gluster prints latencies with %f
+    if value is None:
+        return 'N/A'
+    return '%f' % value
+
+
+class _Record(object):
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                all(getattr(self, name) == getattr(other, name)
+                    for name in self._fields()))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__,
+                           ', '.join('%s=%r' % (name, getattr(self, name))
+                                     for name in self._fields()))
+
+    def _fields(self):
+        return [name for name in self.__slots__ if not name.startswith('_')]
+
+
+class BrickRecord(_Record):
+    __slots__ = ('brick', 'hostuuid', 'port', 'status', 'pid')
+
+    def __init__(self, brick, hostuuid, port, status, pid):
+        self.brick = brick
+        self.hostuuid = hostuuid
+        self.port = _int(port)
+        self.status = status
+        self.pid = _int(pid)
+
+    def toDict(self):
+        return {'brick': self.brick,
+                'hostuuid': self.hostuuid,
+                'port': _str(self.port),
+                'status': self.status,
+                'pid': _str(self.pid)}
+
+
+class NfsRecord(_Record):
+    __slots__ = ('hostname', 'hostuuid', 'port', 'status', 'pid')
+
+    def __init__(self, hostname, hostuuid, port, status, pid):
+        self.hostname = hostname
+        self.hostuuid = hostuuid
+        self.port = _int(port)
+        self.status = status
+        self.pid = _int(pid)
+
+    def toDict(self):
+        return {'hostname': self.hostname,
+                'hostuuid': self.hostuuid,
+                'port': _str(self.port),
+                'status': self.status,
+                'pid': _str(self.pid)}
+
+
+class ShdRecord(_Record):
+    __slots__ = ('hostname', 'hostuuid', 'status', 'pid')
+
+    def __init__(self, hostname, hostuuid, status, pid):
+        self.hostname = hostname
+        self.hostuuid = hostuuid
+        self.status = status
+        self.pid = _int(pid)
+
+    def toDict(self):
+        return {'hostname': self.hostname,
+                'hostuuid': self.hostuuid,
+                'status': self.status,
+                'pid': _str(self.pid)}
+
+
+class BrickDetailRecord(_Record):
+    # sizes are in MiB
+    __slots__ = ('brick', 'hostuuid', 'sizeTotal', 'sizeFree', 'device',
+                 'blockSize', 'mntOptions', 'fsName')
+
+    def __init__(self, brick, hostuuid, sizeTotal, sizeFree, device,
+                 blockSize, mntOptions, fsName):
+        self.brick = brick
+        self.hostuuid = hostuuid
+        self.sizeTotal = sizeTotal
+        self.sizeFree = sizeFree
+        self.device = device
+        self.blockSize = _int(blockSize)
+        self.mntOptions = mntOptions
+        self.fsName = fsName
+
+    def toDict(self):
+        return {'brick': self.brick,
+                'hostuuid': self.hostuuid,
+                'sizeTotal': '%.3f' % (self.sizeTotal,),
+                'sizeFree': '%.3f' % (self.sizeFree,),
+                'device': self.device,
+                'blockSize': _str(self.blockSize),
+                'mntOptions': self.mntOptions,
+                'fsName': self.fsName}
+
+
+class ClientRecord(_Record):
+    __slots__ = ('hostname', 'bytesRead', 'bytesWrite')
+
+    def __init__(self, hostname, bytesRead, bytesWrite):
+        self.hostname = hostname
+        self.bytesRead = _int(bytesRead)
+        self.bytesWrite = _int(bytesWrite)
+
+    def toDict(self):
+        return {'hostname': self.hostname,
+                'bytesRead': _str(self.bytesRead),
+                'bytesWrite': _str(self.bytesWrite)}
+
+
+class BrickClientsRecord(_Record):
+    __slots__ = ('brick', 'hostuuid', 'clientsStatus')
+
+    def __init__(self, brick, hostuuid, clientsStatus):
+        self.brick = brick
+        self.hostuuid = hostuuid
+        self.clientsStatus = clientsStatus
+
+    def toDict(self):
+        return {'brick': self.brick,
+                'hostuuid': self.hostuuid,
+                'clientsStatus': [c.toDict() for c in self.clientsStatus]}
+
+
+class MemPoolRecord(_Record):
+    __slots__ = ('name', 'hotCount', 'coldCount', 'padddedSizeOf',
+                 'allocCount', 'maxAlloc', 'poolMisses', 'maxStdAlloc')
+
+    def __init__(self, name, hotCount=None, coldCount=None,
+                 padddedSizeOf=None, allocCount=None, maxAlloc=None,
+                 poolMisses=None, maxStdAlloc=None):
+        self.name = name
+        self.hotCount = _int(hotCount)
+        self.coldCount = _int(coldCount)
+        self.padddedSizeOf = _int(padddedSizeOf)
+        self.allocCount = _int(allocCount)
+        self.maxAlloc = _int(maxAlloc)
+        self.poolMisses = _int(poolMisses)
+        self.maxStdAlloc = _int(maxStdAlloc)
+
+    def toDict(self):
+        d = {'name': self.name}
+        for name in self.__slots__[1:]:
+            value = getattr(self, name)
+            if value is not None:
+                d[name] = _str(value)
+        return d
+
+
+class BrickMemRecord(_Record):
+    __slots__ = ('brick', 'hostuuid', 'mallinfo', 'mempool')
+
+    def __init__(self, brick, hostuuid, mallinfo, mempool):
+        self.brick = brick
+        self.hostuuid = hostuuid
+        self.mallinfo = dict((k, _int(v)) for k, v in mallinfo.items())
+        self.mempool = mempool
+
+    def toDict(self):
+        return {'brick': self.brick,
+                'hostuuid': self.hostuuid,
+                'mallinfo': dict((k, _str(v))
+                                 for k, v in self.mallinfo.items()),
+                'mempool': [p.toDict() for p in self.mempool]}
+
+
+class BlockStatRecord(_Record):
+    __slots__ = ('size', 'read', 'write')
+
+    def __init__(self, size, read, write):
+        self.size = _int(size)
+        self.read = _int(read)
+        self.write = _int(write)
+
+    def toDict(self):
+        return {'size': _str(self.size),
+                'read': _str(self.read),
+                'write': _str(self.write)}
+
+
+class FopStatRecord(_Record):
+    # the latency texts, only when they do not format back from the numbers
+    __slots__ = ('name', 'hits', 'latencyAvg', 'latencyMin', 'latencyMax',
+                 '_latencyText')
+
+    def __init__(self, name, hits, latencyAvg, latencyMin, latencyMax):
+        self.name = name
+        self.hits = _int(hits)
+        self.latencyAvg = _float(latencyAvg)
+        self.latencyMin = _float(latencyMin)
+        self.latencyMax = _float(latencyMax)
+        text = (latencyAvg, latencyMin, latencyMax)
+        self._latencyText = None if text == self._latencies() else text
+
+    def _latencies(self):
+        return (_latencyStr(self.latencyAvg), _latencyStr(self.latencyMin),
+                _latencyStr(self.latencyMax))
+
+    def toDict(self):
+        latencyAvg, latencyMin, latencyMax = (self._latencyText or
+                                              self._latencies())
+        return {'name': self.name,
+                'hits': _str(self.hits),
+                'latencyAvg': latencyAvg,
+                'latencyMin': latencyMin,
+                'latencyMax': latencyMax}
+
+
+class ProfileStatsRecord(_Record):
+    __slots__ = ('blockStats', 'fopStats', 'duration', 'totalRead',
+                 'totalWrite')
+
+    def __init__(self, blockStats, fopStats, duration, totalRead,
+                 totalWrite):
+        self.blockStats = blockStats
+        self.fopStats = fopStats
+        self.duration = _int(duration)
+        self.totalRead = _int(totalRead)
+        self.totalWrite = _int(totalWrite)
+
+    def toDict(self):
+        return {'blockStats': [b.toDict() for b in self.blockStats],
+                'fopStats': [f.toDict() for f in self.fopStats],
+                'duration': _str(self.duration),
+                'totalRead': _str(self.totalRead),
+                'totalWrite': _str(self.totalWrite)}
+
+
+class BrickProfileRecord(_Record):
+    __slots__ = ('brick', 'cumulativeStats', 'intervalStats')
+    _key = 'brick'
+
+    def __init__(self, brick, cumulativeStats, intervalStats):
+        self.brick = brick
+        self.cumulativeStats = cumulativeStats
+        self.intervalStats = intervalStats
+
+    def toDict(self):
+        return {self._key: self.brick,
+                'cumulativeStats': self.cumulativeStats.toDict(),
+                'intervalStats': toDict(self.intervalStats)}
+
+
+class NfsProfileRecord(BrickProfileRecord):
+    __slots__ = ()
+    _key = 'nfs'
+
+
+def toDict(result):
+    """
+    Converts a result holding records into the plain dict shape
+    """
+    if isinstance(result, _Record):
+        return result.toDict()
+    if isinstance(result, dict):
+        return dict((k, toDict(v)) for k, v in result.items())
+    if isinstance(result, list):
+        return [toDict(v) for v in result]
+    return result
@@ -0,0 +1,164 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    message = "deadline exceeded while waiting for the command queue"
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+
+    def __str__(self):
+        return "%s (%ss)" % (self.message, self.deadline)
+
+
+class FifoLock(object):
+    """
+    A lock granted in the order it was requested
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._next = 0
+        self._serving = 0
+        self._abandoned = set()
+
+    def waiting(self):
+        """
+        Returns the number of holders and waiters
+        """
+        with self._cond:
+            return self._next - self._serving - len(self._abandoned)
+
+    def acquire(self, timeout=None):
+        with self._cond:
+            ticket = self._next
+            self._next += 1
+            end = None if timeout is None else time.time() + timeout
+            while ticket != self._serving:
+                if end is None:
+                    self._cond.wait()
+                    continue
+                remaining = end - time.time()
+                if remaining <= 0:
+                    # give the ticket up, release() will skip it
+                    self._abandoned.add(ticket)
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def release(self):
+        with self._cond:
+            self._serving += 1
+            while self._serving in self._abandoned:
+                self._abandoned.discard(self._serving)
+                self._serving += 1
+            self._cond.notify_all()
+
+
+class BusyRetry(object):
+    """
+    Runs calls again while they fail with a retryable error, sleeping an
+    exponentially growing, jittered delay between attempts, until the call
+    deadline.  Mutating calls are serialized through a process wide FIFO so
+    that our own commands do not compete for the glusterd lock; the time
+    spent in that queue counts against the deadline.
+    """
+    def __init__(self, isRetryable, deadline=60, initialDelay=0.5,
+                 maxDelay=10, multiplier=2, jitter=0.5):
+        self.isRetryable = isRetryable
+        self.deadline = deadline
+        self.initialDelay = initialDelay
+        self.maxDelay = maxDelay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self._queue = FifoLock()
+        self._local = threading.local()
+        self._statsLock = threading.Lock()
+        self._stats = {'calls': 0,
+                       'retries': 0,
+                       'succeededAfterRetry': 0,
+                       'gaveUp': 0,
+                       'queueTimeouts': 0,
+                       'backoffSeconds': 0.0,
+                       'queueWaitSeconds': 0.0}
+
+    def _count(self, **values):
+        with self._statsLock:
+            for name, value in values.items():
+                self._stats[name] += value
+
+    def stats(self):
+        with self._statsLock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.waiting()
+        return stats
+
+    def currentDeadline(self):
+        return getattr(self._local, 'deadline', self.deadline)
+
+    def setDeadline(self, deadline):
+        """
+        Sets the deadline of the calls of this thread, None restores the
+        default one.  Returns the previous value.
+        """
+        previous = getattr(self._local, 'deadline', None)
+        if deadline is None:
+            self._local.__dict__.pop('deadline', None)
+        else:
+            self._local.deadline = deadline
+        return previous
+
+    def delay(self, attempt):
+        delay = min(self.initialDelay * self.multiplier ** attempt,
+                    self.maxDelay)
+        return delay * random.uniform(1 - self.jitter, 1)
+
+    def call(self, func, mutating=False):
+        deadline = self.currentDeadline()
+        end = time.time() + deadline
+        self._count(calls=1)
+        if mutating:
+            start = time.time()
+            acquired = self._queue.acquire(deadline)
+            self._count(queueWaitSeconds=time.time() - start)
+            if not acquired:
+                self._count(queueTimeouts=1)
+                raise DeadlineExceeded(deadline)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    result = func()
+                except Exception as e:
+                    if not self.isRetryable(e):
+                        raise
+                    delay = self.delay(attempt)
+                    if time.time() + delay > end:
+                        self._count(gaveUp=1)
+                        raise
+                    self._count(retries=1, backoffSeconds=delay)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                if attempt:
+                    self._count(succeededAfterRetry=1)
+                return result
+        finally:
+            if mutating:
+                self._queue.release()
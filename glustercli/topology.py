@@ -0,0 +1,151 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+
+
+def brickHost(brick):
+    return brick.split(':', 1)[0]
+
+
+def _replicaSets(info):
+    try:
+        size = int(info.get('replicaCount') or 1)
+    except ValueError:
+        size = 1
+    bricks = info['bricks']
+    if size <= 1:
+        return [(brick,) for brick in bricks]
+    return [tuple(bricks[i:i + size]) for i in range(0, len(bricks), size)]
+
+
+class Topology(object):
+    """
+    Indexes over a volumeInfo() result answering brick, host and uuid
+    lookups without scanning the volumes.  update() re-indexes only the
+    volumes it is given, replace() resyncs with a full volumeInfo().
+    """
+    def __init__(self, volumes=None):
+        self._lock = threading.RLock()
+        self._volumes = {}
+        self._brickVolume = {}
+        self._brickSet = {}
+        self._hostBricks = collections.defaultdict(set)
+        self._hostVolumes = collections.defaultdict(
+            lambda: collections.defaultdict(int))
+        self._uuidHost = {}
+        self._hostUuid = {}
+        self._replicaSets = {}
+        if volumes:
+            self.update(volumes)
+
+    def _add(self, volumeName, info):
+        self._volumes[volumeName] = info
+        sets = _replicaSets(info)
+        self._replicaSets[volumeName] = sets
+        for replicaSet in sets:
+            for brick in replicaSet:
+                host = brickHost(brick)
+                self._brickVolume[brick] = volumeName
+                self._brickSet[brick] = replicaSet
+                self._hostBricks[host].add(brick)
+                self._hostVolumes[host][volumeName] += 1
+        for brickInfo in info.get('bricksInfo', []):
+            host = brickHost(brickInfo['name'])
+            self._uuidHost[brickInfo['hostUuid']] = host
+            self._hostUuid[host] = brickInfo['hostUuid']
+
+    def _remove(self, volumeName):
+        info = self._volumes.pop(volumeName, None)
+        if info is None:
+            return
+        del self._replicaSets[volumeName]
+        for brick in info['bricks']:
+            host = brickHost(brick)
+            self._brickVolume.pop(brick, None)
+            self._brickSet.pop(brick, None)
+            self._hostBricks[host].discard(brick)
+            if not self._hostBricks[host]:
+                del self._hostBricks[host]
+            volumes = self._hostVolumes[host]
+            volumes[volumeName] -= 1
+            if volumes[volumeName] <= 0:
+                del volumes[volumeName]
+            if not volumes:
+                del self._hostVolumes[host]
+        # uuid<->host mappings are kept, they do not depend on the volume
+
+    def update(self, volumes):
+        """
+        Indexes the volumes of a volumeInfo() result, replacing the ones
+        already known under the same names
+        """
+        with self._lock:
+            for volumeName, info in volumes.items():
+                self._remove(volumeName)
+                self._add(volumeName, info)
+
+    def remove(self, volumeName):
+        with self._lock:
+            self._remove(volumeName)
+
+    def replace(self, volumes):
+        """
+        Makes the index match a full volumeInfo() result
+        """
+        with self._lock:
+            for volumeName in set(self._volumes) - set(volumes):
+                self._remove(volumeName)
+            self.update(volumes)
+
+    def volumeNames(self):
+        with self._lock:
+            return list(self._volumes)
+
+    def volume(self, volumeName):
+        return self._volumes.get(volumeName)
+
+    def volumeOfBrick(self, brick):
+        return self._brickVolume.get(brick)
+
+    def bricksOnHost(self, host):
+        with self._lock:
+            return sorted(self._hostBricks.get(host, ()))
+
+    def volumesOnHost(self, host):
+        with self._lock:
+            return sorted(self._hostVolumes.get(host, ()))
+
+    def hosts(self):
+        with self._lock:
+            return sorted(self._hostBricks)
+
+    def hostOfUuid(self, uuid):
+        return self._uuidHost.get(uuid)
+
+    def uuidOfHost(self, host):
+        return self._hostUuid.get(host)
+
+    def replicaSets(self, volumeName):
+        """
+        Returns the bricks of the volume grouped in replica sets, in brick
+        order.  Each brick is its own set in a non replicated volume.
+        """
+        with self._lock:
+            return list(self._replicaSets.get(volumeName, ()))
+
+    def replicaSetOfBrick(self, brick):
+        return self._brickSet.get(brick)
@@ -15,19 +15,20 @@
 
 # most of the code is copied from VDSM project
 
+import collections
 import logging
-import subprocess
-from cpopen import CPopen
 import io
 import select
 import threading
-from StringIO import StringIO
 from weakref import proxy
 import time
 import os
 import errno
+import fcntl
 import signal
 
+import instrument
+
 
 class CommandPath(object):
     def __init__(self, name, *args):
@@ -72,11 +73,51 @@ setsidCmdPath = CommandPath("setsid",
 sudoCmdPath = CommandPath("sudo",
                           "/usr/bin/sudo",
                           )
-# Buffsize is 1K because I tested it on some use cases and 1K was fastest. If
-# you find this number to be a bottleneck in any way you are welcome to change
-# it
+# Reads from the child pipes start with BUFFSIZE bytes and double each time a
+# read fills its buffer, up to the capacity of the pipe.  Small outputs stay
+# cheap while large ones are drained in a few poll/read cycles.
 BUFFSIZE = 1024
+PIPE_CAPACITY = 65536
+_F_GETPIPE_SZ = 1032
+# Consumed data is dropped from the front of a stream buffer once it is
+# bigger than this and than what is left to read
+COMPACT_THRESHOLD = 1024 * 1024
 SUDO_NON_INTERACTIVE_FLAG = "-n"
+# AsyncProc.wait() sleeps in epoll until something happens to the child.
+# Without a pidfd the exit of a child which closed its pipes early cannot be
+# waited for, so these bound how long such an exit may go unnoticed.
+EXIT_POLL_INTERVAL = 1.0
+EXIT_POLL_MIN_DELAY = 0.001
+EXIT_POLL_MAX_DELAY = 0.1
+# How often wait() re-evaluates its cond() callback
+COND_POLL_INTERVAL = 0.1
+# Seconds a timed out or cancelled command gets to exit after SIGTERM,
+# before SIGKILL
+KILL_DELAY = 5.0
+_NR_pidfd_open = 434
+
+
+def pidfdOpen(pid):
+    """
+    Returns a file descriptor which becomes readable when process `pid`
+    exits, or None if the running kernel or python cannot provide one.
+    """
+    pidfd_open = getattr(os, 'pidfd_open', None)
+    if pidfd_open is not None:
+        try:
+            return pidfd_open(pid)
+        except OSError:
+            return None
+
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.syscall(_NR_pidfd_open, pid, 0)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    return fd
 
 
 # NOTE: it would be best to try and unify NoIntrCall and NoIntrPoll.
@@ -105,6 +146,51 @@ def NoIntrPoll(pollfun, timeout=-1):
             timeout = max(0, endtime - time.time())
 
 
+def pipeCapacity(fd):
+    try:
+        return fcntl.fcntl(fd, _F_GETPIPE_SZ)
+    except IOError:
+        return PIPE_CAPACITY
+
+
+class StreamBuffer(object):
+    """
+    Bytes read from, or waiting to be written to, a pipe.  Data is
+    accumulated in a bytearray and consumed by moving `pos` forward.
+    """
+    def __init__(self):
+        self.data = bytearray()
+        self.pos = 0
+
+    def __len__(self):
+        return len(self.data) - self.pos
+
+    def append(self, data):
+        self.data.extend(data)
+
+    def view(self, length):
+        return memoryview(self.data)[self.pos:self.pos + length]
+
+    def consume(self, length):
+        self.pos = min(self.pos + length, len(self.data))
+        if self.pos == len(self.data):
+            del self.data[:]
+            self.pos = 0
+        elif self.pos > COMPACT_THRESHOLD and self.pos * 2 > len(self.data):
+            del self.data[:self.pos]
+            self.pos = 0
+
+    def read(self, length):
+        data = self.view(length).tobytes()
+        self.consume(len(data))
+        return data
+
+    def getvalue(self):
+        if self.pos:
+            return self.view(len(self)).tobytes()
+        return bytes(self.data)
+
+
 class AsyncProc(object):
     """
     AsyncProc is a funky class. It wraps a standard subprocess.Popen
@@ -121,12 +207,19 @@ class AsyncProc(object):
             self._parent = proxy(parent)
             self._fd = fd
             self._closed = False
+            self.used = False
 
         def close(self):
             if not self._closed:
                 self._closed = True
                 while not self._streamClosed:
-                    self._parent._processStreams()
+                    timeout = 1
+                    if self._fd == self._parent._fdin and \
+                            len(self._stream) == 0:
+                        # nothing left to write, stdin is closed at the
+                        # end of the next pass, no event is needed for it
+                        timeout = 0
+                    self._parent._processStreams(timeout)
 
         @property
         def closed(self):
@@ -149,14 +242,12 @@ class AsyncProc(object):
             return True
 
         def _readNonBlock(self, length):
-            hasNewData = (self._stream.len - self._stream.pos)
-            if hasNewData < length and not self._streamClosed:
+            self.used = True
+            if len(self._stream) < length and not self._streamClosed:
                 self._parent._processStreams()
 
             with self._parent._streamLock:
                 res = self._stream.read(length)
-                if self._stream.pos == self._stream.len:
-                    self._stream.truncate(0)
 
             if res == "" and not self._streamClosed:
                 return None
@@ -187,18 +278,15 @@ class AsyncProc(object):
             if hasattr(data, "tobytes"):
                 data = data.tobytes()
             with self._parent._streamLock:
-                oldPos = self._stream.pos
-                self._stream.pos = self._stream.len
-                self._stream.write(data)
-                self._stream.pos = oldPos
+                self._stream.append(data)
 
-            while self._stream.len > 0 and not self._streamClosed:
+            while len(self._stream) > 0 and not self._streamClosed:
                 self._parent._processStreams()
 
             if self._streamClosed:
                 self._closed = True
 
-            if self._stream.len != 0:
+            if len(self._stream) != 0:
                 raise IOError(errno.EPIPE,
                               "Could not write all data to stream")
 
@@ -208,9 +296,9 @@ class AsyncProc(object):
         self._streamLock = threading.Lock()
         self._proc = popenToWrap
 
-        self._stdout = StringIO()
-        self._stderr = StringIO()
-        self._stdin = StringIO()
+        self._stdout = StreamBuffer()
+        self._stderr = StreamBuffer()
+        self._stdin = StreamBuffer()
 
         fdout = self._proc.stdout.fileno()
         fderr = self._proc.stderr.fileno()
@@ -225,22 +313,44 @@ class AsyncProc(object):
         self._fdMap = {fdout: self._stdout,
                        fderr: self._stderr,
                        self._fdin: self._stdin}
+        self._pipeCapacity = pipeCapacity(fdout)
+        self._readSizes = {fdout: BUFFSIZE, fderr: BUFFSIZE}
 
-        self.stdout = io.BufferedReader(self._streamWrapper(self,
-                                        self._stdout, fdout), BUFFSIZE)
+        self._stdoutWrapper = self._streamWrapper(self, self._stdout, fdout)
+        self.stdout = io.BufferedReader(self._stdoutWrapper,
+                                        io.DEFAULT_BUFFER_SIZE)
 
-        self.stderr = io.BufferedReader(self._streamWrapper(self,
-                                        self._stderr, fderr), BUFFSIZE)
+        self._stderrWrapper = self._streamWrapper(self, self._stderr, fderr)
+        self.stderr = io.BufferedReader(self._stderrWrapper,
+                                        io.DEFAULT_BUFFER_SIZE)
 
         self.stdin = io.BufferedWriter(self._streamWrapper(self,
-                                       self._stdin, self._fdin), BUFFSIZE)
+                                       self._stdin, self._fdin),
+                                       io.DEFAULT_BUFFER_SIZE)
 
         self._returncode = None
 
         self.blocking = False
 
-    def _processStreams(self):
+        self._exitPollDelay = EXIT_POLL_MIN_DELAY
+        self._pidfd = pidfdOpen(self._proc.pid)
+        if self._pidfd is not None:
+            self._poller.register(self._pidfd, select.EPOLLIN)
+
+    def _waitChild(self, timeout):
+        # All the pipes are closed, the only thing left is the child exit
+        if self._pidfd is not None:
+            NoIntrPoll(self._poller.poll, timeout)
+        elif timeout < 0:
+            self._returncode = self._proc.wait()
+        else:
+            time.sleep(min(timeout, self._exitPollDelay))
+            self._exitPollDelay = min(self._exitPollDelay * 2,
+                                      EXIT_POLL_MAX_DELAY)
+
+    def _processStreams(self, timeout=1):
         if len(self._closedfds) == 3:
+            self._waitChild(timeout)
             return
 
         if not self._streamLock.acquire(False):
@@ -248,29 +358,40 @@ class AsyncProc(object):
             self._streamLock.release()
             return
         try:
-            if self._stdin.len > 0 and self._stdin.pos == 0:
+            if len(self._stdin) > 0 and self._fdin not in self._closedfds:
                 # Polling stdin is redundant if there is nothing to write
                 # turn on only if data is waiting to be pushed
                 self._poller.modify(self._fdin, select.EPOLLOUT)
 
-            pollres = NoIntrPoll(self._poller.poll, 1)
+            if self._pidfd is None and timeout < 0:
+                # the exit of the child is only seen through its pipes which
+                # might be held open by one of its own children
+                timeout = EXIT_POLL_INTERVAL
+
+            pollres = NoIntrPoll(self._poller.poll, timeout)
 
             for fd, event in pollres:
+                if fd == self._pidfd:
+                    # the child is gone, returncode will reap it
+                    self._poller.unregister(fd)
+                    os.close(fd)
+                    self._pidfd = None
+                    continue
+
                 stream = self._fdMap[fd]
-                if event & select.EPOLLOUT and self._stdin.len > 0:
-                    buff = self._stdin.read(BUFFSIZE)
-                    written = os.write(fd, buff)
-                    stream.pos -= len(buff) - written
-                    if stream.pos == stream.len:
-                        stream.truncate(0)
+                if event & select.EPOLLOUT and len(self._stdin) > 0:
+                    written = os.write(fd, stream.view(self._pipeCapacity))
+                    stream.consume(written)
+                    if len(stream) == 0:
                         self._poller.modify(fd, 0)
 
                 elif event & (select.EPOLLIN | select.EPOLLPRI):
-                    data = os.read(fd, BUFFSIZE)
-                    oldpos = stream.pos
-                    stream.pos = stream.len
-                    stream.write(data)
-                    stream.pos = oldpos
+                    size = self._readSizes[fd]
+                    data = os.read(fd, size)
+                    if len(data) == size and size < self._pipeCapacity:
+                        self._readSizes[fd] = min(size * 2,
+                                                  self._pipeCapacity)
+                    stream.append(data)
 
                 elif event & (select.EPOLLHUP | select.EPOLLERR):
                     self._poller.unregister(fd)
@@ -305,14 +426,44 @@ class AsyncProc(object):
             execCmd([killCmdPath.cmd, "-%d" % (signal.SIGTERM,),
                     str(self.pid)], sudo=True)
 
+    def terminate(self):
+        try:
+            self._proc.terminate()
+        except OSError as ex:
+            if ex.errno != errno.EPERM:
+                raise
+            execCmd([killCmdPath.cmd, "-%d" % (signal.SIGTERM,),
+                    str(self.pid)], sudo=True)
+
+    def stop(self, delay=None):
+        """
+        Sends SIGTERM to the child, then SIGKILL if it is still running
+        `delay` seconds later (KILL_DELAY by default), and reaps it.
+        Returns True when SIGKILL was needed.
+        """
+        if self.returncode is not None:
+            return False
+        self.terminate()
+        if self.wait(KILL_DELAY if delay is None else delay):
+            return False
+        self.kill()
+        self.wait()
+        return True
+
     def wait(self, timeout=None, cond=None):
-        startTime = time.time()
+        endTime = None if timeout is None else time.time() + timeout
         while self.returncode is None:
-            if timeout is not None and (time.time() - startTime) > timeout:
-                return False
-            if cond is not None and cond():
-                return False
-            self._processStreams()
+            pollTimeout = -1
+            if endTime is not None:
+                pollTimeout = endTime - time.time()
+                if pollTimeout <= 0:
+                    return False
+            if cond is not None:
+                if cond():
+                    return False
+                if pollTimeout < 0 or pollTimeout > COND_POLL_INTERVAL:
+                    pollTimeout = COND_POLL_INTERVAL
+            self._processStreams(pollTimeout)
         return True
 
     def communicate(self, data=None):
@@ -322,10 +473,26 @@ class AsyncProc(object):
         self.stdin.close()
 
         self.wait()
-        return "".join(self.stdout), "".join(self.stderr)
+        return self._drain(self._stdoutWrapper, self.stdout), \
+            self._drain(self._stderrWrapper, self.stderr)
+
+    def _collected(self):
+        # what was read so far, without waiting for the pipes to close
+        return self._stdout.getvalue(), self._stderr.getvalue()
+
+    def _drain(self, wrapper, reader):
+        if wrapper.used:
+            # the reader may hold buffered data, go through it
+            return "".join(reader)
+        while not wrapper._streamClosed:
+            self._processStreams()
+        # hand over the collected data in a single copy
+        return wrapper._stream.getvalue()
 
     def __del__(self):
         self._poller.close()
+        if self._pidfd is not None:
+            os.close(self._pidfd)
 
 
 class CmdExecFailed(Exception):
@@ -342,13 +509,176 @@ class CmdExecFailed(Exception):
         return s % (self.message, self.cmd, self.rc, self.err, self.out)
 
 
+class CmdTimeout(CmdExecFailed):
+    message = "command timed out"
+
+    def __init__(self, cmd, rc, out=(), err=(), timeout=None, killed=False):
+        CmdExecFailed.__init__(self, cmd, rc, out, err)
+        self.timeout = timeout
+        # SIGTERM was not enough
+        self.killed = killed
+
+    def __str__(self):
+        return "%stimeout: %s\nkilled: %s\n" % (
+            CmdExecFailed.__str__(self), self.timeout, self.killed)
+
+
+class CmdCancelled(CmdExecFailed):
+    message = "command cancelled"
+
+    def __init__(self, cmd, rc, out=(), err=(), killed=False):
+        CmdExecFailed.__init__(self, cmd, rc, out, err)
+        self.killed = killed
+
+
+class CancelToken(object):
+    """
+    Cancels, from any thread, the commands run by execCmd() with this
+    token, or within cancelOn(token): their children are stopped and
+    CmdCancelled is raised.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def cancelled(self):
+        return self._event.is_set()
+
+
+_local = threading.local()
+
+
+def _cancelTokens():
+    return getattr(_local, 'cancelTokens', ())
+
+
+class cancelOn(object):
+    """
+    Context manager cancelling the commands the current thread runs in its
+    block when `token` is cancelled:
+
+      with utils.cancelOn(token):
+          cli.volumeStatus(...)
+    """
+    def __init__(self, token):
+        self.token = token
+
+    def __enter__(self):
+        self._previous = _cancelTokens()
+        _local.cancelTokens = self._previous + (self.token,)
+        return self.token
+
+    def __exit__(self, excType, excValue, tb):
+        _local.cancelTokens = self._previous
+
+
+class TaskTimeout(Exception):
+    message = "task timed out"
+
+    def __init__(self, item, timeout):
+        self.item = item
+        self.timeout = timeout
+
+    def __str__(self):
+        return "%s\nitem: %s\ntimeout: %s" % (self.message, self.item,
+                                              self.timeout)
+
+
+def execConcurrently(func, items, maxWorkers=8, timeout=None):
+    """
+    Calls func(item) for every item from at most `maxWorkers` threads and
+    returns a dict mapping each item to its result, or to the exception it
+    raised.  An item still running `timeout` seconds after it was started
+    is reported as TaskTimeout and a new thread takes its place; the
+    commands the item runs through execCmd() are cancelled, so that its
+    thread does not stay blocked on them.  Commands of the workers are also
+    cancelled with the tokens of the calling thread, see cancelOn().
+    """
+    callerTokens = _cancelTokens()
+    pending = collections.deque(items)
+    total = len(set(pending))
+    results = {}
+    started = {}
+    workers = []
+    abandoned = set()
+    cond = threading.Condition()
+
+    def worker():
+        while True:
+            with cond:
+                if not pending:
+                    return
+                item = pending.popleft()
+                if item in results or item in started:
+                    continue
+                token = CancelToken()
+                started[item] = (time.time(), threading.current_thread(),
+                                 token)
+                cond.notify()
+            _local.cancelTokens = callerTokens + (token,)
+            try:
+                res = func(item)
+            except Exception as e:
+                res = e
+            finally:
+                _local.cancelTokens = ()
+            with cond:
+                if item not in started:
+                    # timed out and replaced by another worker
+                    return
+                del started[item]
+                results[item] = res
+                cond.notify()
+
+    def startWorker():
+        t = threading.Thread(target=worker)
+        t.daemon = True
+        t.start()
+        workers.append(t)
+
+    with cond:
+        for i in range(min(maxWorkers, total)):
+            startWorker()
+
+        while len(results) < total:
+            waitTime = None
+            if timeout is not None and started:
+                now = time.time()
+                for item, (startTime, thread, token) in started.items():
+                    if now - startTime >= timeout:
+                        del started[item]
+                        abandoned.add(thread)
+                        token.cancel()
+                        results[item] = TaskTimeout(item, timeout)
+                        startWorker()
+                if started:
+                    waitTime = min(startTime for startTime, thread, token
+                                   in started.values()) + timeout - now
+            if len(results) < total:
+                cond.wait(waitTime)
+
+    for t in workers:
+        if t not in abandoned:
+            t.join()
+
+    return results
+
+
 def _execCmd(command, sudo=False, cwd=None, data=None, raw=True, logErr=True,
              printable=None, env=None, sync=True, nice=None, ioclass=None,
              ioclassdata=None, setsid=False, execCmdLogger=logging.root,
-             deathSignal=0, childUmask=None, throwException=True):
+             deathSignal=0, childUmask=None, throwException=True,
+             timeout=None, cancel=None):
     """
     Executes an external command, optionally via sudo.
 
+    With sync=True, a command still running after `timeout` seconds, or
+    once `cancel` or a token of cancelOn() is cancelled, is stopped with
+    SIGTERM then SIGKILL (see AsyncProc.stop()) and CmdTimeout or
+    CmdCancelled is raised, whatever `throwException` is.
+
     IMPORTANT NOTE: the new process would receive `deathSignal` when the
     controlling thread dies, which may not be what you intended: if you create
     a temporary thread, spawn a sync=False sub-process, and have the thread
@@ -374,11 +704,29 @@ def _execCmd(command, sudo=False, cwd=None, data=None, raw=True, logErr=True,
     if not printable:
         printable = command
 
+    # imported here, scripts which never run a command do not pay for them
+    import subprocess
+    from cpopen import CPopen
+
+    tokens = _cancelTokens()
+    if cancel is not None:
+        tokens += (cancel,)
+    cond = None
+    if tokens:
+        def cond():
+            return any(token.cancelled() for token in tokens)
+
+        if cond():
+            raise CmdCancelled(command, None)
+
     cmdline = repr(subprocess.list2cmdline(printable))
     execCmdLogger.debug("%s (cwd %s)", cmdline, cwd)
 
+    start = time.time()
     p = CPopen(command, close_fds=True, cwd=cwd, env=env,
                deathSignal=deathSignal, childUmask=childUmask)
+    spawned = time.time()
+    instrument.add('spawn', spawned - start)
     p = AsyncProc(p)
     if not sync:
         if data is not None:
@@ -387,12 +735,32 @@ def _execCmd(command, sudo=False, cwd=None, data=None, raw=True, logErr=True,
 
         return p
 
-    (out, err) = p.communicate(data)
+    if data is not None:
+        p.stdin.write(data)
+        p.stdin.flush()
+    p.stdin.close()
+
+    if not p.wait(timeout, cond):
+        killed = p.stop()
+        out, err = p._collected()
+        instrument.add('wall', time.time() - spawned)
+        if cond is not None and cond():
+            execCmdLogger.warning("%s: cancelled, killed: %s", cmdline,
+                                  killed)
+            raise CmdCancelled(command, p.returncode, out, err, killed)
+        execCmdLogger.warning("%s: timed out after %ss, killed: %s",
+                              cmdline, timeout, killed)
+        raise CmdTimeout(command, p.returncode, out, err, timeout, killed)
+
+    (out, err) = p.communicate()
 
     if out is None:
         # Prevent splitlines() from barfing later on
         out = ""
 
+    instrument.add('wall', time.time() - spawned)
+    instrument.add('outBytes', len(out))
+
     execCmdLogger.debug("%s: <err> = %s; <rc> = %d",
                         {True: "SUCCESS", False: "FAILED"}[p.returncode == 0],
                         repr(err), p.returncode)
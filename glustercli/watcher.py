@@ -0,0 +1,221 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import random
+import threading
+import time
+
+import cli
+
+logger = logging.getLogger('glustercli')
+
+
+class EventKind:
+    BRICK = 'brick'
+    NFS = 'nfs'
+    SHD = 'shd'
+    PEER = 'peer'
+    TASK = 'task'
+
+
+# fields compared for every kind, in the order they are kept in the state
+_FIELDS = {EventKind.BRICK: ('status', 'pid', 'port', 'hostuuid'),
+           EventKind.NFS: ('status', 'pid', 'port', 'hostuuid'),
+           EventKind.SHD: ('status', 'pid', 'hostuuid'),
+           EventKind.PEER: ('status', 'uuid'),
+           EventKind.TASK: ('status', 'taskType')}
+
+
+class Event(object):
+    """
+    A change between two polls.  `key` identifies the object:
+    (volumeName, brick) for bricks, (volumeName, hostname) for nfs and shd,
+    (hostname,) for peers and (volumeName, taskId) for tasks.  `field` is
+    None when the object appeared (old is None) or disappeared (new is
+    None), old and new are then the tuples of its _FIELDS values.
+    """
+    __slots__ = ('kind', 'key', 'field', 'old', 'new', 'time')
+
+    def __init__(self, kind, key, field, old, new, time):
+        self.kind = kind
+        self.key = key
+        self.field = field
+        self.old = old
+        self.new = new
+        self.time = time
+
+    def __repr__(self):
+        return 'Event(%r, %r, %r, %r -> %r)' % (self.kind, self.key,
+                                                self.field, self.old,
+                                                self.new)
+
+
+def _statusState(volumes, volumeNames):
+    state = {}
+    for volumeName, volume in volumes.items():
+        if volumeNames is not None and volumeName not in volumeNames:
+            continue
+        status = volume['status']
+        if status is not None:
+            for b in status['bricks']:
+                state[(EventKind.BRICK, (volumeName, b.brick))] = (
+                    b.status, b.pid, b.port, b.hostuuid)
+            for n in status['nfs']:
+                state[(EventKind.NFS, (volumeName, n.hostname))] = (
+                    n.status, n.pid, n.port, n.hostuuid)
+            for n in status['shd']:
+                state[(EventKind.SHD, (volumeName, n.hostname))] = (
+                    n.status, n.pid, n.hostuuid)
+        for taskId, task in volume['tasks'].items():
+            state[(EventKind.TASK, (volumeName, taskId))] = (
+                task['status'], task['taskType'])
+    return state
+
+
+def _peerState(peers):
+    return dict(((EventKind.PEER, (peer['hostname'],)),
+                 (peer['status'], peer['uuid'])) for peer in peers)
+
+
+def diff(old, new, now=None):
+    """
+    Returns the events turning the `old` state into `new`.  States map
+    (kind, key) to the tuple of the _FIELDS values of the object.
+    """
+    if now is None:
+        now = time.time()
+    events = []
+    for ident, values in new.items():
+        oldValues = old.get(ident)
+        if oldValues == values:
+            continue
+        kind, key = ident
+        if oldValues is None:
+            events.append(Event(kind, key, None, None, values, now))
+            continue
+        for field, a, b in zip(_FIELDS[kind], oldValues, values):
+            if a != b:
+                events.append(Event(kind, key, field, a, b, now))
+    for ident, values in old.items():
+        if ident not in new:
+            kind, key = ident
+            events.append(Event(kind, key, None, values, None, now))
+    return events
+
+
+class Watcher(object):
+    """
+    Polls the status of the volumes (bricks, nfs, shd and tasks) and of the
+    peers every `interval` seconds, with `jitter` as a fraction of the
+    interval, and passes the list of changes to the subscribed callbacks.
+    Only the volumes in `volumeNames` are watched; None or an empty list
+    watches all of them.
+    Nothing is emitted for the first poll nor when nothing changed.  After
+    a failed poll the interval doubles up to `maxBackoff`; a failed section
+    keeps its previous state so no spurious events are emitted for it.
+    """
+    def __init__(self, volumeNames=None, interval=10, jitter=0.1,
+                 maxBackoff=300, peers=True, timeout=None):
+        self.volumeNames = set(volumeNames) if volumeNames else None
+        self.interval = interval
+        self.jitter = jitter
+        self.maxBackoff = maxBackoff
+        self.timeout = timeout
+        self.lastError = None
+        self.lastPoll = None
+        self.failures = 0
+        self._sections = ['volumeStatus']
+        if peers:
+            self._sections.append('peerStatus')
+        self._states = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """
+        Registers callback(events), called from the polling thread
+        """
+        with self._lock:
+            self._callbacks = self._callbacks + [callback]
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._callbacks = [c for c in self._callbacks if c != callback]
+
+    def poll(self):
+        """
+        Polls once, notifies the subscribers and returns the events
+        """
+        snapshot = cli.clusterSnapshot(timeout=self.timeout,
+                                       format=cli.ResultFormat.TYPED,
+                                       sections=self._sections)
+        now = time.time()
+        events = []
+        for section in self._sections:
+            if section in snapshot['errors']:
+                continue
+            if section == 'peerStatus':
+                state = _peerState(snapshot['peers'])
+            else:
+                state = _statusState(snapshot['volumes'], self.volumeNames)
+            # the first successful poll of a section is the baseline
+            if section in self._states:
+                events.extend(diff(self._states[section], state, now))
+            self._states[section] = state
+        self.lastPoll = now
+
+        if events:
+            for callback in self._callbacks:
+                try:
+                    callback(events)
+                except Exception:
+                    logger.exception("watcher callback %r failed", callback)
+
+        if snapshot['errors']:
+            raise list(snapshot['errors'].values())[0]
+        return events
+
+    def nextDelay(self):
+        delay = self.interval
+        if self.failures:
+            delay = min(self.interval * 2 ** self.failures, self.maxBackoff)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+                self.failures = 0
+                self.lastError = None
+            except Exception as e:
+                logger.warn("status poll failed: %s", e)
+                self.failures += 1
+                self.lastError = e
+            self._stopped.wait(self.nextDelay())
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,183 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The XML parser used for gluster replies: lxml when it is installed,
+# cElementTree otherwise.  Both build trees with the same element API, so
+# the parsers only go through fromstring(), iterparse(), tostring() and
+# Path objects for the multi-step lookups of their hot loops.  Backends
+# are imported on first use, which keeps them out of the import time of
+# glustercli.
+
+
+class _ElementTreeBackend(object):
+    name = 'etree'
+
+    def __init__(self):
+        import xml.etree.cElementTree as module
+        self.module = module
+
+    def fromstring(self, text):
+        return self.module.fromstring(text)
+
+    def iterparse(self, source, events):
+        return self.module.iterparse(source, events)
+
+    def tostring(self, el):
+        return self.module.tostring(el)
+
+    def compile(self, expr):
+        # ElementPath keeps the compiled expression in its own cache
+        return lambda el: el.findall(expr)
+
+
+class _LxmlBackend(object):
+    name = 'lxml'
+
+    def __init__(self):
+        from lxml import etree as module
+        self.module = module
+
+    def fromstring(self, text):
+        return self.module.fromstring(text)
+
+    def iterparse(self, source, events):
+        return self.module.iterparse(source, events)
+
+    def tostring(self, el):
+        return self.module.tostring(el)
+
+    def compile(self, expr):
+        return self.module.XPath(expr)
+
+
+# in order of preference
+_BACKEND_TYPES = (_LxmlBackend, _ElementTreeBackend)
+_backends = {}
+_backend = None
+
+# the parse errors of both backends derive from it
+ParseError = (SyntaxError,)
+
+
+def _load(backendType):
+    backend = _backends.get(backendType.name)
+    if backend is None:
+        backend = _backends[backendType.name] = backendType()
+    return backend
+
+
+def _current():
+    global _backend
+
+    if _backend is None:
+        for backendType in _BACKEND_TYPES:
+            try:
+                _backend = _load(backendType)
+                break
+            except ImportError:
+                continue
+    return _backend
+
+
+def available():
+    """
+    Returns the names of the backends which can be imported
+    """
+    names = []
+    for backendType in _BACKEND_TYPES:
+        try:
+            _load(backendType)
+        except ImportError:
+            continue
+        names.append(backendType.name)
+    return names
+
+
+def backend():
+    return _current().name
+
+
+def use(name):
+    """
+    Selects the backend by name, 'lxml' or 'etree'.  Trees of one backend
+    must not be handed to the other.
+    """
+    global _backend
+
+    for backendType in _BACKEND_TYPES:
+        if backendType.name == name:
+            try:
+                _backend = _load(backendType)
+            except ImportError as e:
+                raise ValueError("unavailable XML backend %s: %s" % (name, e))
+            return
+    raise ValueError("unknown XML backend: %s" % name)
+
+
+def fromstring(text):
+    return _current().fromstring(text)
+
+
+def iterparse(source, events=('end',)):
+    return _current().iterparse(source, events)
+
+
+def tostring(el):
+    return _current().tostring(el)
+
+
+class Path(object):
+    """
+    A relative path like 'volStatus/volumes/volume/node', compiled once per
+    backend: an XPath expression with lxml, ElementPath otherwise.
+    """
+    __slots__ = ('expr', '_backend', '_findall')
+
+    def __init__(self, expr):
+        self.expr = expr
+        self._backend = None
+        self._findall = None
+
+    def findall(self, el):
+        backend = _current()
+        if self._backend is not backend:
+            self._findall = backend.compile(self.expr)
+            self._backend = backend
+        if el is None:
+            # what ElementTree raises, lxml raises TypeError
+            raise AttributeError("no element to find %s in" % self.expr)
+        return self._findall(el)
+
+    def find(self, el):
+        found = self.findall(el)
+        if found:
+            return found[0]
+        return None
+
+
+class _Texts(dict):
+    __slots__ = ()
+
+    def __missing__(self, tag):
+        # like el.find(tag).text on a missing child
+        raise AttributeError("no %s element" % tag)
+
+
+def childTexts(el):
+    """
+    Returns {tag: text} of the children of el, text being None when empty.
+    A missing tag raises AttributeError.
+    """
+    return _Texts((ch.tag, ch.text) for ch in el)
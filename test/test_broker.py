@@ -0,0 +1,132 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import logging
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import unittest
+
+from glustercli import broker
+from glustercli import utils
+
+FAKE_GLUSTER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            '..', 'benchmarks', 'fakegluster.py')
+
+# the client warns when it runs commands directly
+logging.getLogger('glustercli').addHandler(logging.NullHandler())
+
+# gluster refusing the value of bad.key, whatever else is set with it
+_GLUSTER = """#!/bin/sh
+case " $* " in
+*" bad.key "*) echo "volume set: failed: bad.key" >&2; exit 1;;
+esac
+exec %s "$@"
+"""
+
+
+def _volumeSet(*pairs):
+    return ['gluster', '--mode=script', 'volume', 'set', 'vol0'] + \
+        list(pairs) + ['--xml']
+
+
+class BrokerTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socketPath = os.path.join(self.tmpdir, 'broker.sock')
+        gluster = os.path.join(self.tmpdir, 'gluster')
+        with open(gluster, 'w') as f:
+            f.write(_GLUSTER % FAKE_GLUSTER)
+        os.chmod(gluster, stat.S_IRWXU)
+        self.broker = broker.Broker(self.socketPath, gluster,
+                                    mergeWindow=0.3)
+        self.broker.start()
+        self.client = broker.BrokerClient(self.socketPath, timeout=10)
+
+    def tearDown(self):
+        self.broker.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def _concurrently(self, cmds):
+        results = {}
+
+        def run(cmd):
+            try:
+                results[cmd[-3]] = self.client.execCmd(cmd)
+            except utils.CmdExecFailed as e:
+                results[cmd[-3]] = e
+
+        threads = [threading.Thread(target=run, args=(cmd,))
+                   for cmd in cmds]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def testVolumeSetsAreMerged(self):
+        results = self._concurrently([_volumeSet('k%d' % i, 'v')
+                                      for i in range(3)])
+        self.assertEqual(sorted(results), ['k0', 'k1', 'k2'])
+        for rc, out, err in results.values():
+            self.assertEqual(rc, 0)
+        self.assertEqual(self.broker.stats['transactions'], 1)
+        self.assertEqual(self.broker.stats['merged'], 2)
+
+    def testFailedMergeIsRerunPerRequest(self):
+        results = self._concurrently([_volumeSet('k0', 'v'),
+                                      _volumeSet('bad.key', 'v'),
+                                      _volumeSet('k1', 'v')])
+        self.assertEqual(results['k0'][0], 0)
+        self.assertEqual(results['k1'][0], 0)
+        self.assertTrue(isinstance(results['bad.key'], utils.CmdExecFailed))
+        self.assertEqual(results['bad.key'].err,
+                         "volume set: failed: bad.key\n")
+        # the merged one and then one per request
+        self.assertEqual(self.broker.stats['transactions'], 4)
+        self.assertEqual(self.broker.stats['merged'], 0)
+
+    def testMalformedRequest(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(10)
+        sock.connect(self.socketPath)
+        f = sock.makefile('rb')
+        try:
+            for line in ('not json', '[]', '{"args": "volume info"}',
+                         '{"args": ["volume", "info"], "timeout": "x"}'):
+                sock.sendall(line + '\n')
+                reply = json.loads(f.readline())
+                self.assertTrue(reply['error'].startswith('bad request'),
+                                reply)
+            # the connection is still usable
+            sock.sendall(json.dumps({'args': ['--mode=script', 'volume',
+                                              'info', '--xml']}) + '\n')
+            self.assertEqual(json.loads(f.readline())['rc'], 0)
+        finally:
+            sock.close()
+        self.assertEqual(self.broker.stats['requests'], 1)
+
+    def testMissingSocketRunsDirectly(self):
+        client = broker.BrokerClient(os.path.join(self.tmpdir, 'missing'))
+        rc, out, err = client.execCmd([FAKE_GLUSTER, '--mode=script',
+                                       'volume', 'info', '--xml'])
+        self.assertEqual(rc, 0)
+        self.assertTrue('<name>vol0</name>' in out)
+        self.assertEqual(self.broker.stats['requests'], 0)
@@ -0,0 +1,81 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from glustercli import cache
+from glustercli import cli
+
+
+class TTLCacheTests(unittest.TestCase):
+    def testInvalidateMatching(self):
+        c = cache.TTLCache()
+        c.put(('volumeInfo', (('volumeName', 'vol0'),)), 0)
+        c.put(('volumeInfo', (('volumeName', 'vol1'),)), 1)
+        c.invalidate('volumeInfo',
+                     lambda args: dict(args)['volumeName'] == 'vol0')
+        self.assertEqual(c.get(('volumeInfo', (('volumeName', 'vol0'),))),
+                         (False, None))
+        self.assertEqual(c.get(('volumeInfo', (('volumeName', 'vol1'),))),
+                         (True, 1))
+
+    def testExpired(self):
+        c = cache.TTLCache()
+        c.put(('peerStatus', ()), 'old', ttl=-1)
+        self.assertEqual(c.get(('peerStatus', ())), (False, None))
+
+    def testStaleGenerationIsNotStored(self):
+        c = cache.TTLCache()
+        generation = c.generation('volumeInfo')
+        c.invalidate('volumeInfo')
+        c.put(('volumeInfo', ()), 'stale', generation=generation)
+        self.assertEqual(c.get(('volumeInfo', ()))[0], False)
+        c.put(('volumeInfo', ()), 'fresh',
+              generation=c.generation('volumeInfo'))
+        self.assertEqual(c.get(('volumeInfo', ())), (True, 'fresh'))
+
+
+class CachedTests(unittest.TestCase):
+    def setUp(self):
+        self._volumeInfo = cli._volumeInfo
+        self.calls = 0
+        cli.enableCache()
+
+    def tearDown(self):
+        cli.disableCache()
+        cli._volumeInfo = self._volumeInfo
+
+    def testHit(self):
+        def volumeInfo(volumeName):
+            self.calls += 1
+            return {'vol0': {'options': {}}}
+
+        cli._volumeInfo = volumeInfo
+        cli.volumeInfo('vol0')
+        cli.volumeInfo('vol0')['vol0']['options']['changed'] = 'by caller'
+        self.assertEqual(cli.volumeInfo('vol0'), {'vol0': {'options': {}}})
+        self.assertEqual(self.calls, 1)
+
+    def testInvalidatedWhileReading(self):
+        def volumeInfo(volumeName):
+            self.calls += 1
+            # a mutating call of another thread completes meanwhile
+            cli._invalidate(['volumeInfo'], 'vol0')
+            return {'vol0': 'before the change'}
+
+        cli._volumeInfo = volumeInfo
+        cli.volumeInfo('vol0')
+        cli.volumeInfo('vol0')
+        self.assertEqual(self.calls, 2)
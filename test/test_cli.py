@@ -0,0 +1,140 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fcntl
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from glustercli import cli
+from glustercli import utils
+
+FAKE_GLUSTER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            '..', 'benchmarks', 'fakegluster.py')
+
+_REPLY = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+          '<cliOutput><opRet>-1</opRet><opErrno>0</opErrno>%s'
+          '</cliOutput>\n')
+
+
+class BusyRetryTests(unittest.TestCase):
+    def setUp(self):
+        self.replies = []
+        self.calls = 0
+        self._glusterCommandPath = cli._glusterCommandPath
+        self._execMutatingCmd = cli._execMutatingCmd
+        # never run, _execCmd answers instead
+        cli._glusterCommandPath = utils.CommandPath('gluster',
+                                                    sys.executable)
+        cli._execMutatingCmd = self._execCmd
+        cli.enableBusyRetry(deadline=5, initialDelay=0.01, maxDelay=0.01)
+
+    def tearDown(self):
+        cli.disableBusyRetry()
+        cli._execMutatingCmd = self._execMutatingCmd
+        cli._glusterCommandPath = self._glusterCommandPath
+
+    def _execCmd(self, cmd):
+        self.calls += 1
+        return 0, self.replies.pop(0), ''
+
+    def testFailedReplyIsNotRetried(self):
+        self.replies = [_REPLY % '<opErrstr>Volume vol0 does not exist'
+                                 '</opErrstr>']
+        self.assertRaises(cli.GlusterCmdFailed, cli.volumeInfo, 'vol0')
+        self.assertEqual(self.calls, 1)
+
+    def testFailedReplyWithoutErrstr(self):
+        self.replies = [_REPLY % '<opErrstr/>']
+        self.assertRaises(cli.GlusterCmdFailed, cli.volumeInfo, 'vol0')
+        self.assertEqual(self.calls, 1)
+
+    def testBusyReplyIsRetried(self):
+        self.replies = [_REPLY % ('<opErrstr>Another transaction is in '
+                                  'progress for vol0.</opErrstr>'),
+                        _REPLY % '<opErrstr>failed</opErrstr>']
+        self.assertRaises(cli.GlusterCmdFailed, cli.volumeInfo, 'vol0')
+        self.assertEqual(self.calls, 2)
+
+
+class IsUnreachableTests(unittest.TestCase):
+    def testFailedReplyWithoutOutput(self):
+        e = cli.GlusterCmdFailed(['gluster'], 2, err=None)
+        self.assertFalse(cli.isUnreachable(e))
+
+    def testConnectionFailed(self):
+        e = cli.GlusterCmdFailed(['gluster'], 1, err='Connection failed. '
+                                 'Please check if gluster daemon is '
+                                 'operational.')
+        self.assertTrue(cli.isUnreachable(e))
+
+
+class IsReadOnlyCmdTests(unittest.TestCase):
+    def _isReadOnly(self, cmd):
+        return cli._isReadOnlyCmd(['gluster', '--mode=script'] +
+                                  cmd.split() + ['--xml'])
+
+    def testQueries(self):
+        for cmd in ('volume info', 'volume status all detail',
+                    'peer status', 'volume set help-xml',
+                    'system:: uuid get', 'snapshot list',
+                    'snapshot info snap0', 'snapshot status',
+                    'volume replace-brick vol0 h1:/b0 h2:/b0 status',
+                    'volume rebalance vol0 status',
+                    'volume profile vol0 info cumulative'):
+            self.assertTrue(self._isReadOnly(cmd), cmd)
+
+    def testMutations(self):
+        for cmd in ('volume set vol0 nfs.disable on', 'system:: uuid reset',
+                    'snapshot create snap0 vol0', 'snapshot delete snap0',
+                    'volume replace-brick vol0 h1:/b0 h2:/b0 commit force',
+                    'volume profile vol0 start', 'peer probe h2'):
+            self.assertFalse(self._isReadOnly(cmd), cmd)
+
+
+class ClusterSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._glusterCommandPath = cli._glusterCommandPath
+        cli._glusterCommandPath = utils.CommandPath('gluster', FAKE_GLUSTER)
+        os.environ['FAKE_GLUSTER_TXN_LOCK'] = os.path.join(self.tmpdir,
+                                                           'txn.lock')
+        os.environ['FAKE_GLUSTER_TXN_TIME'] = '0.3'
+
+    def tearDown(self):
+        os.environ.pop('FAKE_GLUSTER_TXN_LOCK')
+        os.environ.pop('FAKE_GLUSTER_TXN_TIME')
+        cli._glusterCommandPath = self._glusterCommandPath
+        shutil.rmtree(self.tmpdir)
+
+    def testStatusSectionsDoNotCollide(self):
+        snapshot = cli.clusterSnapshot()
+        self.assertEqual(snapshot['errors'], {})
+        volume = snapshot['volumes']['vol0']
+        self.assertTrue(volume['status'] is not None)
+        self.assertTrue(volume['detail'])
+
+    def testFailedSection(self):
+        os.environ['FAKE_GLUSTER_TXN_TIME'] = '0'
+        # another transaction holds the volume locks
+        with open(os.environ['FAKE_GLUSTER_TXN_LOCK'], 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            snapshot = cli.clusterSnapshot()
+        self.assertEqual(sorted(snapshot['errors']),
+                         ['volumeStatus', 'volumeStatusDetail'])
+        self.assertTrue(snapshot['volumes']['vol0']['info'])
+        self.assertEqual(snapshot['volumes']['vol0']['status'], None)
@@ -0,0 +1,37 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from glustercli import cluster
+
+
+class ClusterSchedulerTests(unittest.TestCase):
+    def testResultsByName(self):
+        scheduler = cluster.ClusterScheduler([
+            cluster.Cluster(['a1', 'a2'], name='a'),
+            cluster.Cluster(['b1'])])
+        self.assertEqual(scheduler.call(lambda x: x * 2, 21),
+                         {'a': 42, 'b1': 42})
+
+    def testDuplicateNames(self):
+        self.assertRaises(ValueError, cluster.ClusterScheduler,
+                          [cluster.Cluster(['a1'], name='pool'),
+                           cluster.Cluster(['b1'], name='pool')])
+        # named after their first host
+        self.assertRaises(ValueError, cluster.ClusterScheduler,
+                          [cluster.Cluster(['a1', 'a2']),
+                           cluster.Cluster(['a1', 'a3'])])
@@ -0,0 +1,80 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import struct
+import unittest
+
+from glustercli import cli
+from glustercli import glusterd
+
+
+class PackDictTests(unittest.TestCase):
+    def testRoundTrip(self):
+        values = {'count': '2', 'volume0.name': 'vol0', 'empty': '',
+                  'volume0.option.nfs.disable': 'on'}
+        self.assertEqual(glusterd.unpackDict(glusterd.packDict(values)),
+                         values)
+
+    def testValuesAreStrings(self):
+        data = glusterd.packDict({'count': 2})
+        self.assertEqual(glusterd.unpackDict(data), {'count': '2'})
+
+    def testEmpty(self):
+        self.assertEqual(glusterd.unpackDict(''), {})
+        self.assertEqual(glusterd.unpackDict(glusterd.packDict({})), {})
+
+    def testTruncated(self):
+        data = glusterd.packDict({'volume0.name': 'vol0'})
+        for size in (2, 6, len(data) - 3):
+            self.assertRaises(glusterd.RpcError, glusterd.unpackDict,
+                              data[:size])
+
+    def testLayout(self):
+        self.assertEqual(glusterd.packDict({'k': 'v'}),
+                         struct.pack('>III', 1, 1, 2) + 'k\0v\0')
+
+
+class VolumeInfoFromDictTests(unittest.TestCase):
+    def testVolume(self):
+        values = {'count': '1', 'volume0.name': 'vol0',
+                  'volume0.volume_id': 'uuid0', 'volume0.type': '2',
+                  'volume0.status': '1', 'volume0.brick_count': '4',
+                  'volume0.dist_count': '2', 'volume0.stripe_count': '1',
+                  'volume0.replica_count': '2', 'volume0.transport': '0',
+                  'volume0.opt_count': '1',
+                  'volume0.option.nfs.disable': 'on'}
+        for b in range(1, 5):
+            values['volume0.brick%d' % b] = 'h%d:/b' % b
+            values['volume0.brick%d.uuid' % b] = 'uuid-h%d' % b
+        values = glusterd.unpackDict(glusterd.packDict(values))
+        volume = cli._volumeInfoFromDict(values)['vol0']
+        self.assertEqual(volume['volumeType'], 'DISTRIBUTED_REPLICATE')
+        self.assertEqual(volume['volumeStatus'], cli.VolumeStatus.ONLINE)
+        self.assertEqual(volume['transportType'], [cli.TransportType.TCP])
+        self.assertEqual(volume['bricks'],
+                         ['h1:/b', 'h2:/b', 'h3:/b', 'h4:/b'])
+        self.assertEqual(volume['bricksInfo'][3],
+                         {'name': 'h4:/b', 'hostUuid': 'uuid-h4'})
+        self.assertEqual(volume['options'], {'nfs.disable': 'on'})
+
+    def testOptionCountMismatch(self):
+        values = {'count': '1', 'volume0.name': 'vol0',
+                  'volume0.volume_id': 'uuid0', 'volume0.type': '0',
+                  'volume0.status': '2', 'volume0.brick_count': '0',
+                  'volume0.dist_count': '1', 'volume0.stripe_count': '1',
+                  'volume0.replica_count': '1', 'volume0.transport': '0',
+                  'volume0.opt_count': '1'}
+        self.assertRaises(ValueError, cli._volumeInfoFromDict, values)
@@ -0,0 +1,81 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from glustercli import pool
+from glustercli import utils
+
+FAKE_GLUSTER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            '..', 'benchmarks', 'fakegluster.py')
+
+_FAILED = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+           '<cliOutput><opRet>-1</opRet><opErrno>2</opErrno>'
+           '<opErrstr>Volume vol0 does not exist</opErrstr></cliOutput>\n')
+
+
+class ReplyStatusTests(unittest.TestCase):
+    def testSucceeded(self):
+        self.assertEqual(pool.replyStatus(
+            '<cliOutput><opRet>0</opRet></cliOutput>', ''), 0)
+
+    def testFailed(self):
+        self.assertEqual(pool.replyStatus(
+            '<cliOutput><opRet>-1</opRet></cliOutput>', ''), 1)
+        self.assertEqual(pool.replyStatus(
+            '<cliOutput><opRet> 2 </opRet></cliOutput>', ''), 1)
+
+    def testNoReply(self):
+        self.assertEqual(pool.replyStatus('', 'Connection failed\n'), 1)
+        self.assertEqual(pool.replyStatus('', ' \n'), 0)
+
+    def testWarningsOfSucceededReply(self):
+        self.assertEqual(pool.replyStatus(
+            '<cliOutput><opRet>0</opRet></cliOutput>', 'warning\n'), 0)
+
+
+class SessionPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.fixtures = tempfile.mkdtemp()
+        with open(os.path.join(self.fixtures, 'volume_info.xml'), 'w') as f:
+            f.write(_FAILED)
+        self.pool = pool.GlusterSessionPool(FAKE_GLUSTER, size=1)
+
+    def tearDown(self):
+        self.pool.close()
+        os.environ.pop('FAKE_GLUSTER_FIXTURES', None)
+        shutil.rmtree(self.fixtures)
+
+    def testSucceeded(self):
+        rc, out, err = self.pool.execCmd(
+            [FAKE_GLUSTER, '--mode=script', 'volume', 'info', '--xml'])
+        self.assertEqual(rc, 0)
+        self.assertTrue('<name>vol0</name>' in out)
+
+    def testFailedReplyRaises(self):
+        # sessions inherit the environment when they are started
+        os.environ['FAKE_GLUSTER_FIXTURES'] = self.fixtures
+        cmd = [FAKE_GLUSTER, '--mode=script', 'volume', 'info', 'vol0',
+               '--xml']
+        try:
+            self.pool.execCmd(cmd)
+        except utils.CmdExecFailed as e:
+            self.assertEqual(e.rc, 1)
+            self.assertEqual(e.out, _FAILED)
+        else:
+            self.fail("no CmdExecFailed")
@@ -0,0 +1,76 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from glustercli import profiler
+from glustercli import records
+
+
+def _sample(duration, hits, latencyAvg, read, totalRead):
+    return profiler._BrickSample(records.ProfileStatsRecord(
+        [records.BlockStatRecord('4096', str(read), '0')],
+        [records.FopStatRecord('READ', str(hits), latencyAvg, '0.0', '0.0')],
+        str(duration), str(totalRead), '0'))
+
+
+class BrickDeltaTests(unittest.TestCase):
+    def testDelta(self):
+        delta = profiler._brickDelta(_sample(10, 10, '2.0', 5, 1000),
+                                     _sample(20, 30, '4.0', 8, 3000))
+        self.assertEqual(delta['duration'], 10)
+        self.assertEqual(delta['totalRead'], 2000)
+        self.assertEqual(delta['readRate'], 200.0)
+        self.assertEqual(delta['blockStats'], {4096: {'read': 3, 'write': 0}})
+        fop = delta['fopStats']['READ']
+        self.assertEqual((fop['hits'], fop['rate']), (20, 2.0))
+        # (4.0 * 30 - 2.0 * 10) / 20
+        self.assertEqual(fop['latencyAvg'], 5.0)
+
+    def testBrickRestarted(self):
+        delta = profiler._brickDelta(_sample(100, 50, '2.0', 9, 5000),
+                                     _sample(10, 20, '3.0', 4, 1000))
+        self.assertEqual(delta['duration'], 10)
+        self.assertEqual(delta['totalRead'], 1000)
+        self.assertEqual(delta['blockStats'][4096]['read'], 4)
+        self.assertEqual(delta['fopStats']['READ']['hits'], 20)
+        self.assertEqual(delta['fopStats']['READ']['latencyAvg'], 3.0)
+
+    def testFopCounterReset(self):
+        delta = profiler._brickDelta(_sample(10, 50, '2.0', 0, 0),
+                                     _sample(20, 5, '3.0', 0, 0))
+        self.assertEqual(delta['fopStats']['READ']['hits'], 5)
+        self.assertEqual(delta['fopStats']['READ']['latencyAvg'], 3.0)
+
+    def testIdle(self):
+        sample = _sample(10, 10, '2.0', 5, 1000)
+        delta = profiler._brickDelta(sample, sample)
+        self.assertEqual(delta['readRate'], 0.0)
+        self.assertEqual(delta['fopStats']['READ'],
+                         {'hits': 0, 'rate': 0.0, 'latencyAvg': 0.0})
+
+
+class ProfileSubscriptionTests(unittest.TestCase):
+    def testIndependentDeltas(self):
+        volumeProfiler = profiler.VolumeProfiler('vol0')
+        volumeProfiler._samples = {'b0': _sample(10, 10, '1.0', 0, 100)}
+        first = volumeProfiler.subscribe()
+        volumeProfiler._samples = {'b0': _sample(20, 20, '1.0', 0, 300)}
+        second = volumeProfiler.subscribe()
+        self.assertEqual(first.delta()['b0']['totalRead'], 200)
+        volumeProfiler._samples = {'b0': _sample(30, 30, '1.0', 0, 600)}
+        self.assertEqual(first.delta()['b0']['totalRead'], 300)
+        self.assertEqual(second.delta()['b0']['totalRead'], 300)
@@ -0,0 +1,66 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from glustercli import topology
+
+
+def _volume(bricks, replicaCount='1'):
+    return {'replicaCount': replicaCount, 'bricks': bricks,
+            'bricksInfo': [{'name': brick,
+                            'hostUuid': 'uuid-' + topology.brickHost(brick)}
+                           for brick in bricks]}
+
+
+class TopologyTests(unittest.TestCase):
+    def setUp(self):
+        self.topology = topology.Topology({
+            'vol0': _volume(['h1:/b0', 'h2:/b0', 'h1:/b1', 'h2:/b1'], '2'),
+            'vol1': _volume(['h2:/b2', 'h3:/b2'])})
+
+    def testLookups(self):
+        self.assertEqual(self.topology.volumeOfBrick('h2:/b1'), 'vol0')
+        self.assertEqual(self.topology.bricksOnHost('h2'),
+                         ['h2:/b0', 'h2:/b1', 'h2:/b2'])
+        self.assertEqual(self.topology.volumesOnHost('h2'), ['vol0', 'vol1'])
+        self.assertEqual(self.topology.hostOfUuid('uuid-h3'), 'h3')
+        self.assertEqual(self.topology.replicaSets('vol0'),
+                         [('h1:/b0', 'h2:/b0'), ('h1:/b1', 'h2:/b1')])
+        self.assertEqual(self.topology.replicaSetOfBrick('h3:/b2'),
+                         ('h3:/b2',))
+
+    def testUpdateReplacesVolume(self):
+        self.topology.update({'vol1': _volume(['h4:/b2'])})
+        self.assertEqual(self.topology.volumeOfBrick('h2:/b2'), None)
+        self.assertEqual(self.topology.volumeOfBrick('h4:/b2'), 'vol1')
+        self.assertEqual(self.topology.volumesOnHost('h2'), ['vol0'])
+        self.assertEqual(self.topology.hosts(), ['h1', 'h2', 'h4'])
+
+    def testRemove(self):
+        self.topology.remove('vol0')
+        self.assertEqual(self.topology.volumeNames(), ['vol1'])
+        self.assertEqual(self.topology.bricksOnHost('h1'), [])
+        self.assertEqual(self.topology.bricksOnHost('h2'), ['h2:/b2'])
+        self.assertEqual(self.topology.replicaSets('vol0'), [])
+        self.assertEqual(self.topology.replicaSetOfBrick('h1:/b0'), None)
+        self.topology.remove('vol0')
+
+    def testReplace(self):
+        self.topology.replace({'vol2': _volume(['h5:/b5'])})
+        self.assertEqual(self.topology.volumeNames(), ['vol2'])
+        self.assertEqual(self.topology.hosts(), ['h5'])
+        self.assertEqual(self.topology.volumesOnHost('h1'), [])
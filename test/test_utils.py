@@ -0,0 +1,208 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+import unittest
+
+from glustercli import utils
+
+_SH = '/bin/sh'
+# execCmd warns about every stopped command
+_logger = logging.getLogger('glustercli.test')
+_logger.addHandler(logging.NullHandler())
+_logger.propagate = False
+
+
+def _sh(script, **kwargs):
+    return utils.execCmd([_SH, '-c', script], execCmdLogger=_logger,
+                         **kwargs)
+
+
+class ExecCmdTests(unittest.TestCase):
+    def setUp(self):
+        self._killDelay = utils.KILL_DELAY
+        utils.KILL_DELAY = 0.2
+
+    def tearDown(self):
+        utils.KILL_DELAY = self._killDelay
+
+    def testOutput(self):
+        self.assertEqual(_sh('echo out; echo err >&2'),
+                         (0, 'out\n', 'err\n'))
+
+    def testFailure(self):
+        self.assertRaises(utils.CmdExecFailed, _sh, 'exit 3')
+        self.assertEqual(_sh('exit 3', throwException=False)[0], 3)
+
+    def testLargeOutput(self):
+        # several times the pipe buffer, on both pipes at once
+        script = ('i=0; while [ $i -lt 4000 ]; do '
+                  'echo "line $i of the output of the child"; '
+                  'echo "line $i" >&2; i=$((i+1)); done')
+        expected = ''.join('line %d of the output of the child\n' % i
+                           for i in range(4000))
+        rc, out, err = _sh(script)
+        self.assertEqual(out, expected)
+        self.assertEqual(err, ''.join('line %d\n' % i for i in range(4000)))
+
+    def testTimeoutStopsChild(self):
+        start = time.time()
+        try:
+            _sh('sleep 10', timeout=0.2)
+        except utils.CmdTimeout as e:
+            self.assertEqual(e.timeout, 0.2)
+            self.assertFalse(e.killed)
+        else:
+            self.fail("no CmdTimeout")
+        self.assertTrue(time.time() - start < 5)
+
+    def testTimeoutKillsChildIgnoringTerm(self):
+        try:
+            _sh('trap "" TERM; sleep 10', timeout=0.2)
+        except utils.CmdTimeout as e:
+            self.assertTrue(e.killed)
+        else:
+            self.fail("no CmdTimeout")
+
+    def testTimeoutKeepsPartialOutput(self):
+        try:
+            _sh('echo started; sleep 10', timeout=0.5)
+        except utils.CmdTimeout as e:
+            self.assertEqual(e.out, 'started\n')
+        else:
+            self.fail("no CmdTimeout")
+
+    def testCancel(self):
+        token = utils.CancelToken()
+        timer = threading.Timer(0.2, token.cancel)
+        timer.start()
+        start = time.time()
+        self.assertRaises(utils.CmdCancelled, _sh, 'sleep 10', cancel=token)
+        self.assertTrue(time.time() - start < 5)
+
+    def testCancelledBeforeStart(self):
+        token = utils.CancelToken()
+        token.cancel()
+        with utils.cancelOn(token):
+            self.assertRaises(utils.CmdCancelled, _sh, 'echo never')
+
+    def testCancelOnOnlyCoversItsBlock(self):
+        token = utils.CancelToken()
+        with utils.cancelOn(token):
+            pass
+        token.cancel()
+        self.assertEqual(_sh('echo ok')[1], 'ok\n')
+
+
+class NoPidfdTests(ExecCmdTests):
+    """
+    The same, waiting for the children without a pidfd
+    """
+    def setUp(self):
+        ExecCmdTests.setUp(self)
+        self._pidfdOpen = utils.pidfdOpen
+        utils.pidfdOpen = lambda pid: None
+
+    def tearDown(self):
+        utils.pidfdOpen = self._pidfdOpen
+        ExecCmdTests.tearDown(self)
+
+    def testChildClosingItsPipesEarly(self):
+        start = time.time()
+        rc, out, err = _sh('echo done; exec >&- 2>&-; sleep 0.3; exit 4',
+                           throwException=False)
+        self.assertEqual((rc, out), (4, 'done\n'))
+        self.assertTrue(time.time() - start >= 0.3)
+
+
+class ExecConcurrentlyTests(unittest.TestCase):
+    def setUp(self):
+        self._killDelay = utils.KILL_DELAY
+        utils.KILL_DELAY = 0.2
+
+    def tearDown(self):
+        utils.KILL_DELAY = self._killDelay
+
+    def testResults(self):
+        def func(item):
+            if item == 3:
+                raise ValueError(item)
+            return item * 2
+
+        results = utils.execConcurrently(func, range(5), maxWorkers=2)
+        self.assertEqual(sorted(results), range(5))
+        self.assertEqual(results[4], 8)
+        self.assertTrue(isinstance(results[3], ValueError))
+
+    def testTimeoutReleasesWorkers(self):
+        threads = threading.active_count()
+
+        def func(item):
+            if item == 'slow':
+                return _sh('sleep 10')
+            return item
+
+        start = time.time()
+        results = utils.execConcurrently(func, ['slow', 'a', 'b'],
+                                         maxWorkers=2, timeout=0.3)
+        self.assertTrue(time.time() - start < 5)
+        self.assertTrue(isinstance(results['slow'], utils.TaskTimeout))
+        self.assertEqual((results['a'], results['b']), ('a', 'b'))
+        # the timed out worker got CmdCancelled and exited
+        end = time.time() + 5
+        while threading.active_count() > threads and time.time() < end:
+            time.sleep(0.05)
+        self.assertEqual(threading.active_count(), threads)
+
+    def testCallerTokenCancelsWorkers(self):
+        token = utils.CancelToken()
+        threading.Timer(0.2, token.cancel).start()
+        with utils.cancelOn(token):
+            results = utils.execConcurrently(lambda item: _sh('sleep 10'),
+                                             range(3), maxWorkers=3)
+        for result in results.values():
+            self.assertTrue(isinstance(result, utils.CmdCancelled))
+
+
+class StreamBufferTests(unittest.TestCase):
+    def setUp(self):
+        self._threshold = utils.COMPACT_THRESHOLD
+        utils.COMPACT_THRESHOLD = 8
+
+    def tearDown(self):
+        utils.COMPACT_THRESHOLD = self._threshold
+
+    def testReadInPieces(self):
+        buf = utils.StreamBuffer()
+        data = ''.join(chr(i % 256) for i in range(1000))
+        for i in range(0, len(data), 100):
+            buf.append(data[i:i + 100])
+        pieces = []
+        while len(buf):
+            pieces.append(buf.read(37))
+        self.assertEqual(''.join(pieces), data)
+        self.assertEqual(buf.getvalue(), '')
+
+    def testCompaction(self):
+        buf = utils.StreamBuffer()
+        buf.append('0123456789abcdefghij')
+        buf.consume(15)
+        self.assertEqual(buf.pos, 0)
+        self.assertEqual(buf.getvalue(), 'fghij')
+        buf.append('klm')
+        self.assertEqual(buf.read(100), 'fghijklm')
+        self.assertEqual(len(buf), 0)
@@ -0,0 +1,93 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from glustercli import cli
+from glustercli import utils
+from glustercli import watcher
+
+_BRICK = (watcher.EventKind.BRICK, ('vol0', 'h1:/b0'))
+_PEER = (watcher.EventKind.PEER, ('h2',))
+
+
+def _events(events):
+    return sorted((e.kind, e.key, e.field, e.old, e.new) for e in events)
+
+
+class DiffTests(unittest.TestCase):
+    def testUnchanged(self):
+        state = {_BRICK: ('1', 10, 49152, 'uuid1')}
+        self.assertEqual(watcher.diff(state, dict(state)), [])
+
+    def testAdded(self):
+        events = watcher.diff({}, {_PEER: ('Connected', 'uuid2')}, now=5)
+        self.assertEqual(_events(events),
+                         [('peer', ('h2',), None, None,
+                           ('Connected', 'uuid2'))])
+        self.assertEqual(events[0].time, 5)
+
+    def testRemoved(self):
+        events = watcher.diff({_PEER: ('Connected', 'uuid2')}, {})
+        self.assertEqual(_events(events),
+                         [('peer', ('h2',), None, ('Connected', 'uuid2'),
+                           None)])
+
+    def testChangedFields(self):
+        events = watcher.diff({_BRICK: ('1', 10, 49152, 'uuid1')},
+                              {_BRICK: ('0', None, 49152, 'uuid1')})
+        self.assertEqual(_events(events),
+                         [('brick', ('vol0', 'h1:/b0'), 'pid', 10, None),
+                          ('brick', ('vol0', 'h1:/b0'), 'status', '1', '0')])
+
+
+class WatcherTests(unittest.TestCase):
+    def setUp(self):
+        self._clusterSnapshot = cli.clusterSnapshot
+        self.snapshots = []
+        cli.clusterSnapshot = lambda **kwargs: self.snapshots.pop(0)
+
+    def tearDown(self):
+        cli.clusterSnapshot = self._clusterSnapshot
+
+    def _snapshot(self, peerStatus, errors=None):
+        return {'volumes': {},
+                'peers': [{'hostname': 'h2', 'status': peerStatus,
+                           'uuid': 'uuid2'}],
+                'errors': errors or {}}
+
+    def testFirstPollIsBaseline(self):
+        w = watcher.Watcher(peers=True)
+        received = []
+        w.subscribe(received.append)
+        self.snapshots = [self._snapshot('Connected'),
+                          self._snapshot('Disconnected')]
+        self.assertEqual(w.poll(), [])
+        events = w.poll()
+        self.assertEqual(_events(events),
+                         [('peer', ('h2',), 'status', 'Connected',
+                           'Disconnected')])
+        self.assertEqual(received, [events])
+
+    def testFailedSectionKeepsItsState(self):
+        w = watcher.Watcher(peers=True)
+        error = utils.CmdExecFailed(['gluster'], 1)
+        self.snapshots = [self._snapshot('Connected'),
+                          self._snapshot(None, {'peerStatus': error}),
+                          self._snapshot('Connected')]
+        w.poll()
+        self.assertRaises(utils.CmdExecFailed, w.poll)
+        self.assertEqual(w.poll(), [])